@@ -1,6 +1,8 @@
+import uuid
+import asyncio
 import ghostcoder
 from ghostcoder.utils import *
-from ghostcoder.graph import create_ghostcoder_agent
+from ghostcoder.graph import create_ghostcoder_agent, get_compiled_graph
 from ghostcoder.config import *
 
 
@@ -25,6 +27,7 @@ class GhostCoder:
         self,
         chat_model: LanguageModelLike,
         code_model: LanguageModelLike,
+        reason_model: Optional[LanguageModelLike] = None,
         *,
         max_retry = 3,
         name: Optional[str] = "ghostcoder",
@@ -41,12 +44,15 @@ class GhostCoder:
         """
 
         # Pass parameters 
-        self.chat_model = chat_model
-        self.code_model = code_model
+        # Calls of every model count against the process-wide LLM call limit
+        self.chat_model = limit_llm_calls(chat_model)
+        self.code_model = limit_llm_calls(code_model)
+        self.reason_model = limit_llm_calls(reason_model) if reason_model is not None else self.chat_model
         self.max_try = max_retry
         self.name = name
         self.config_schema = config_schema
-        self.checkpointer = checkpointer
+        # Durable checkpoints by default, so failed runs can be resumed
+        self.checkpointer = checkpointer if checkpointer is not None else get_checkpointer()
         self.store = store
         self.interrupt_before = interrupt_before
         self.interrupt_after = interrupt_after
@@ -60,10 +66,12 @@ class GhostCoder:
         except Exception as e:
             print(f'Tavily search failed to initiate due to:\n{e}')
 
-        # Initial agent graph
+        # Initial agent graph, compiled once and shared by agents with the same models and options
         try:
-            self.graph = create_ghostcoder_agent(
+            self.graph = get_compiled_graph(
+                create_ghostcoder_agent,
                 chat_model = self.chat_model,
+                reason_model = self.reason_model,
                 code_model = self.code_model,
                 max_retry = self.max_try,
                 name = self.name,
@@ -93,7 +101,6 @@ class GhostCoder:
         # Pass parameters
         self.task = task
         self.task_id = task_id
-        ghostcoder.config.TASK_ID = self.task_id
         self.inputvar_names = input_wrap['var_names']
         self.persis_add = input_wrap['persis_add']
         self.data_perception = input_wrap['perception']
@@ -112,8 +119,10 @@ class GhostCoder:
             "use_reg": self.use_reg,
             }
         
-        # Run agent
-        output_state = self.graph.invoke(agent_input)
+        # Run agent, task settings travel in the run context instead of the global config
+        context = RunContext.from_config(task_id = self.task_id)
+        self._clear_thread(context)
+        output_state = self.graph.invoke(agent_input, config = self._run_config(context))
 
         # Parse result
         codeblock = output_state['generated_codeblock']
@@ -121,6 +130,204 @@ class GhostCoder:
 
         return codeblock, exe_out
     
+    async def arun(
+        self,
+        task: str,
+        input_wrap: dict,
+        task_id: str = "test",
+        session_id: Optional[str] = None,
+        task_home: Optional[str] = None,
+        update_to: str = "Global", # or local
+        previous_codeblock: str = "",
+        use_reg: bool = True,
+        ):
+        """
+        Run one task asynchronously, without touching the agent's or the global task settings.
+
+        Args:
+            task (str): Task description.
+            input_wrap (dict): Input variables wrap, with 'var_names', 'persis_add' and 'perception'.
+            task_id (str, optional): Task id. Defaults to "test".
+            session_id (str, optional): Session id. Defaults to ghostcoder_config.SESSION_ID.
+            task_home (str, optional): Task dir. Defaults to
+                                       <WORK_HOME or cwd>/<session_id>/<task_id>.
+            update_to (str, optional): "Global" or "local". Defaults to "Global".
+            previous_codeblock (str, optional): Code of the previous step. Defaults to "".
+            use_reg (bool, optional): Defaults to True.
+
+        Returns:
+            tuple: Generated code block and its execution output.
+        """
+        # Per-run settings, passed with the graph config so concurrent runs can't overwrite them
+        context = RunContext.from_config(session_id = session_id, task_id = task_id, task_home = task_home)
+
+        # Pass agent input
+        agent_input = {
+            "task_description": task,
+            "inputvar_names": input_wrap['var_names'],
+            "presis_add": input_wrap['persis_add'],
+            "data_perception": input_wrap['perception'],
+            "previous_codeblock": previous_codeblock,
+            "update_to": update_to,
+            "use_reg": use_reg,
+            }
+
+        # Run agent, one checkpoint thread per task, started over on a new run
+        await asyncio.to_thread(self._clear_thread, context)
+        output_state = await self.graph.ainvoke(agent_input, config = self._run_config(context))
+
+        # Parse result
+        return output_state['generated_codeblock'], output_state['execution_outstr']
+
+    def _run_config(self, context: RunContext) -> dict:
+        # Task dir and execution mode are kept in the checkpoint metadata, for resume
+        return context.as_config(task_home = context.task_home, execution_mode = context.execution_mode)
+
+    def _clear_thread(self, context: RunContext) -> None:
+        # Drop the checkpoints of an earlier run of the same task, whose state would leak into the new one
+        if self.checkpointer is not None:
+            try:
+                self.checkpointer.delete_thread(context.thread_id())
+            except NotImplementedError:
+                pass
+
+    def resume(
+        self,
+        task_id: str = "test",
+        session_id: Optional[str] = None,
+        task_home: Optional[str] = None,
+        ):
+        """
+        Resume a failed or interrupted task from its last checkpoint, see `aresume`.
+        """
+        return asyncio.run(self.aresume(task_id, session_id = session_id, task_home = task_home))
+
+    async def aresume(
+        self,
+        task_id: str = "test",
+        session_id: Optional[str] = None,
+        task_home: Optional[str] = None,
+        ):
+        """
+        Resume a task from its last checkpoint, skipping the nodes that already completed.
+
+        Nodes that completed before the failure are not run again (no repeated retrieval,
+        crawls or LLM calls); a run that already finished just returns its result.
+
+        Args:
+            task_id (str, optional): Task id of the run. Defaults to "test".
+            session_id (str, optional): Session id of the run. Defaults to ghostcoder_config.SESSION_ID.
+            task_home (str, optional): Task dir. Defaults to the one saved with the checkpoint.
+
+        Returns:
+            tuple: Generated code block and its execution output.
+
+        Raises:
+            ValueError: If checkpoints are disabled or the task has no checkpoint.
+        """
+        if self.checkpointer is None:
+            raise ValueError("Resume needs a checkpointer, enable cache_config.CHECKPOINTS or pass one.")
+        context = RunContext.from_config(session_id = session_id, task_id = task_id, task_home = task_home)
+
+        # Same run settings as the interrupted run
+        latest = await self.checkpointer.aget_tuple({"configurable": {"thread_id": context.thread_id()}})
+        if latest is None:
+            raise ValueError("No checkpoint found for task " + context.thread_id() + ".")
+        if task_home is None and latest.metadata.get("task_home"):
+            context = RunContext.from_config(
+                session_id = context.session_id,
+                task_id = context.task_id,
+                task_home = latest.metadata["task_home"],
+                execution_mode = latest.metadata.get("execution_mode"),
+                )
+
+        # Continue from the last completed step, or return the finished result
+        config = self._run_config(context)
+        snapshot = await self.graph.aget_state(config)
+        if snapshot.next:
+            output_state = await self.graph.ainvoke(None, config = config)
+        else:
+            output_state = snapshot.values
+
+        # Parse result
+        return output_state['generated_codeblock'], output_state['execution_outstr']
+
+    async def run_many(
+        self,
+        tasks: list[dict],
+        max_concurrency: Optional[int] = None,
+        max_llm_calls: Optional[int] = None,
+        max_containers: Optional[int] = None,
+        session_id: Optional[str] = None,
+        ):
+        """
+        Run independent tasks concurrently over this agent, yielding results as they finish.
+
+        Each task gets its own graph state and task dir <WORK_HOME or cwd>/<session_id>/<task_id>.
+        LLM calls and docker containers are capped process-wide, separately from the
+        number of tasks, since tasks spend most of their time waiting on one or the other.
+
+            async for result in agent.run_many(tasks, max_concurrency=8):
+                print(result["task_id"], result["error"])
+
+        Args:
+            tasks (list[dict]): arun arguments per task: `task` and `input_wrap`, and
+                                optionally `task_id` (default "task_<index>", unique in the
+                                batch), `task_home`, `update_to`, `previous_codeblock`, `use_reg`.
+            max_concurrency (int, optional): Tasks running at once. Defaults to
+                                             ghostcoder_config.MAX_CONCURRENT_TASKS.
+            max_llm_calls (int, optional): Sets the process-wide cap of LLM calls in flight
+                                           (0 for unlimited). Defaults to ghostcoder_config.MAX_LLM_CALLS.
+            max_containers (int, optional): Sets the process-wide cap of running docker
+                                            executors. Defaults to coder_config.MAX_CONTAINERS.
+            session_id (str, optional): Session id shared by the batch. Defaults to
+                                        ghostcoder_config.SESSION_ID, or a new "batch_<id>".
+
+        Yields:
+            dict: Per task, in completion order: `task_id`, `codeblock`, `execution_outstr`,
+                  and `error`, the exception of a failed task or None.
+
+        Raises:
+            ValueError: If two tasks have the same task id.
+        """
+        max_concurrency = max_concurrency or ghostcoder_config.MAX_CONCURRENT_TASKS
+        if max_llm_calls is not None:
+            get_llm_limiter().set_limit(max_llm_calls)
+        if max_containers is not None:
+            get_executor_pool().max_containers = max_containers
+        session_id = session_id or ghostcoder_config.SESSION_ID or "batch_" + uuid.uuid4().hex[:8]
+
+        # Parse tasks, ids name the task dirs
+        specs = []
+        for i, spec in enumerate(tasks):
+            spec = dict(spec)
+            spec.setdefault("task_id", "task_" + str(i))
+            specs.append(spec)
+        task_ids = [spec["task_id"] for spec in specs]
+        if len(set(task_ids)) != len(task_ids):
+            raise ValueError("Task ids must be unique within a batch, they name the task dirs.")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_one(spec):
+            async with semaphore:
+                try:
+                    codeblock, exe_out = await self.arun(session_id = session_id, **spec)
+                    return {"task_id": spec["task_id"], "codeblock": codeblock, "execution_outstr": exe_out, "error": None}
+                except Exception as e:
+                    print(f"Task {spec['task_id']} failed due to:\n{e}")
+                    return {"task_id": spec["task_id"], "codeblock": None, "execution_outstr": None, "error": e}
+
+        # Return results as they finish
+        pending = [asyncio.ensure_future(run_one(spec)) for spec in specs]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                yield await next_done
+        finally:
+            # Stop the remaining tasks when the caller stops iterating
+            for future in pending:
+                future.cancel()
+
     def draw_graph(self):
         i = 0 
         while i < self.max_try:
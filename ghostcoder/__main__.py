@@ -0,0 +1,3 @@
+from ghostcoder.cli import main
+
+raise SystemExit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder Command Line Interface
+# Maintenance commands run outside of an analysis session.
+#
+# Usage:
+#   python -m ghostcoder refcodedb build --config config.yaml [--backend local]
+
+import argparse
+from ghostcoder.config import *
+from ghostcoder.utils.setup import build_RefCodeDB
+from ghostcoder.utils.refcodedb import format_sync_report
+
+#######################################
+# REFCODEDB COMMANDS
+#######################################
+
+#######################################
+# Incrementally load RefCodeDB.csv into the vector store
+# Globals:
+#   llm_config (read for the embedding model API)
+#   retriever_config (read for backend, paths and chunk size)
+# Arguments:
+#   args (argparse.Namespace): Parsed command line arguments
+# Returns:
+#   int: Exit code
+#######################################
+def refcodedb_build(args: argparse.Namespace) -> int:
+    """
+    Run `refcodedb build`: sync RefCodeDB.csv into the vector store and report throughput.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments of the `refcodedb build` command.
+
+    Returns:
+        int: 0 on success.
+    """
+    if args.config:
+        load_yaml_config(args.config)
+    emb_model = initial_embedmodel(llm_config.EMBED_MODEL_API)
+
+    def print_progress(report: dict) -> None:
+        print(f"  {report['rows']} rows processed ({report['rows_per_s']:.1f} rows/s)")
+
+    report = build_RefCodeDB(
+        emb_model,
+        backend=args.backend,
+        csv_path=args.csv,
+        index_dir=args.index_dir,
+        name=args.name,
+        chunksize=args.chunk_size,
+        progress=print_progress,
+        )
+    print(f"RefCodeDB ({report['backend']}) {format_sync_report(report)}")
+    return 0
+
+
+#######################################
+# ARGUMENT PARSING
+#######################################
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the `ghostcoder` argument parser."""
+    parser = argparse.ArgumentParser(prog="ghostcoder", description="BIA-Ghostcoder maintenance commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    refcodedb = commands.add_parser("refcodedb", help="Manage the reference code database.")
+    refcodedb_commands = refcodedb.add_subparsers(dest="refcodedb_command", required=True)
+    build = refcodedb_commands.add_parser(
+        "build",
+        help="Incrementally load RefCodeDB.csv: only new or edited rows are embedded, removed rows are deleted.",
+        )
+    build.add_argument("--config", default="", help="YAML config file (see example_config.yaml).")
+    build.add_argument("--backend", default="", choices=["", "local", "pgvector"],
+                       help="Vector store, defaults to retriever_config.REFCODEDB_BACKEND.")
+    build.add_argument("--csv", default="", help="RefCodeDB table, defaults to RefcodeDB/RefCodeDB.csv.")
+    build.add_argument("--index-dir", default="", help="Local index directory, defaults to RefcodeDB/index.")
+    build.add_argument("--name", default="RefCodeDB", help="Index or collection name.")
+    build.add_argument("--chunk-size", type=int, default=0,
+                       help="Rows read and embedded per chunk, defaults to retriever_config.REFCODEDB_CHUNK_SIZE.")
+    build.set_defaults(func=refcodedb_build)
+    return parser
+
+
+def main(argv=None) -> int:
+    """Entry point of the `ghostcoder` command."""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,9 @@
 import os
+import copy
+import time
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import docker
 import json
 import docker.errors
@@ -8,8 +12,49 @@ from ..config import *
 
 # DOCKER_IMAGES = ['python:3.9-slim', 'r-base:4.2.3']
 
+# Shared docker client and local image index, refreshed after IMAGE_INDEX_TTL seconds
+_CLIENT = None
+_IMAGE_TAGS = None
+_IMAGE_TAGS_TIME = 0.0
+_DOCKER_LOCK = threading.Lock()
+# Parsed profiles, reloaded when the profile file changes
+_PROFILES = None
+_PROFILES_KEY = None
+_PROFILES_LOCK = threading.Lock()
 
-def load_docker_profiles():
+
+def get_docker_client():
+    # One client (and connection pool) per process, raises DockerException if docker is unavailable
+    global _CLIENT
+    with _DOCKER_LOCK:
+        if _CLIENT is None:
+            _CLIENT = docker.from_env()
+        return _CLIENT
+
+def get_image_tags(refresh = False):
+    # Set of name:tag of the local images, listed at most once per IMAGE_INDEX_TTL seconds
+    global _IMAGE_TAGS, _IMAGE_TAGS_TIME
+    with _DOCKER_LOCK:
+        if (not refresh and _IMAGE_TAGS is not None
+                and time.monotonic() - _IMAGE_TAGS_TIME < docker_config.IMAGE_INDEX_TTL):
+            return _IMAGE_TAGS
+    try:
+        docker_images = get_docker_client().images.list()
+        tags = frozenset(tag for img in docker_images for tag in img.tags)
+    except docker.errors.DockerException:
+        # Docker unavailable, cached as empty too so callers don't retry on every call
+        tags = frozenset()
+    with _DOCKER_LOCK:
+        _IMAGE_TAGS, _IMAGE_TAGS_TIME = tags, time.monotonic()
+    return tags
+
+def invalidate_image_index():
+    # Force the next get_image_tags to list images again, e.g. after a pull or rmi
+    global _IMAGE_TAGS
+    with _DOCKER_LOCK:
+        _IMAGE_TAGS = None
+
+def get_docker_profile_path():
     if len(docker_config.DOCKER_PROFILES_DIR) > 0:
         profile_dir = docker_config.DOCKER_PROFILES_DIR
     else:
@@ -17,32 +62,38 @@ def load_docker_profiles():
     default_profile_path = os.path.join(profile_dir,docker_config.DEFAULT_DOCKER_PROFILE)
     new_profile_path = os.path.join(profile_dir,docker_config.NEW_DOCKER_PROFILE)
     if os.path.exists(new_profile_path):
-        profile_path = new_profile_path
-    else:
-        profile_path = default_profile_path
-    with open(profile_path, 'r', encoding = 'utf-8') as f:
-        profiles = json.load(f)
-    return profiles
+        return new_profile_path
+    return default_profile_path
+
+def load_docker_profiles():
+    # Memoized, reparsed only when the profile file (or its path) changes
+    global _PROFILES, _PROFILES_KEY
+    profile_path = get_docker_profile_path()
+    key = (profile_path, os.stat(profile_path).st_mtime_ns)
+    with _PROFILES_LOCK:
+        if _PROFILES_KEY != key:
+            with open(profile_path, 'r', encoding = 'utf-8') as f:
+                _PROFILES = json.load(f)
+            _PROFILES_KEY = key
+        # Callers may modify the profiles, hand out a copy
+        return copy.deepcopy(_PROFILES)
 
 def check_docker_exists(
         name:str,
         tag:str,
         ):
     target_tags = name+':'+tag
-    client = docker.from_env()
-    images = client.images.list()
-    for img in images:
-        if img.tags == target_tags:
-            return True
-    return False
-
-def get_docker_status():
+    return target_tags in get_image_tags()
+
+def list_docker_image_tags():
+    # All name:tag of the local images, sorted; empty when docker is unavailable
+    return sorted(get_image_tags())
+
+def get_docker_status(all_loaded_tags = None):
     docker_status_str = "Loaded dockers are:\n"
     docker_profiles = load_docker_profiles()
-    docker_images = docker.from_env().images.list()
-    all_loaded_tags = []
-    for img in docker_images:
-        all_loaded_tags.append(img.tags[0]) 
+    if all_loaded_tags is None:
+        all_loaded_tags = list_docker_image_tags()
     for profile in docker_profiles['Docker images']:
         profile_tags = profile['name']+':'+profile['tag']
         profile_str = "docker name: " + profile_tags + "\n"
@@ -67,8 +118,9 @@ def add_docker_image_profile(
     docker_profiles = load_docker_profiles()
     
     # Check if profile existed 
-    if check_docker_exists(name = name, tag = tag):
-        return 
+    for profile in docker_profiles['Docker images']:
+        if profile['name'] == name and profile['tag'] == tag:
+            return 
 
     # Build new profile 
     try:
@@ -76,7 +128,7 @@ def add_docker_image_profile(
             "name": name, # docker image id, from docker env, or docker hub
             "tag": tag, # docker image tag
             "description":description, # description of this docker
-            "language": language, # coding language(s) fits in this docker
+            "languages": language, # coding language(s) fits in this docker
             "packages":packages, # pre-installed packages 
             }
     except:
@@ -87,8 +139,8 @@ def add_docker_image_profile(
     if verbose:
         print("New docker profile added.")
 
-    # Write new profiles
-    new_profile_path = os.path.join(docker_config.DOCKER_PROFILES_DIR,docker_config.NEW_DOCKER_PROFILE)
+    # Write new profiles, next to the profiles they extend
+    new_profile_path = os.path.join(os.path.dirname(get_docker_profile_path()),docker_config.NEW_DOCKER_PROFILE)
     with open(new_profile_path, 'w') as f:
         json.dump(docker_profiles, f, indent=2)
     if verbose:
@@ -99,16 +151,49 @@ def pull_docker_images(
         name:str, 
         tag:str,
         verbose = False,
+        progress = None,
         ):
-    client = docker.from_env()
+    # progress(image, event) receives the docker pull events (status, id, progressDetail)
     docker_tags = name+':'+tag
     try:
-        client.images.pull(docker_tags)
+        client = get_docker_client()
+        for event in client.api.pull(name, tag = tag, stream = True, decode = True):
+            if 'error' in event:
+                raise docker.errors.APIError(event['error'])
+            if progress is not None:
+                progress(docker_tags, event)
+        invalidate_image_index()
         if verbose:
             print(f"Successfully pulled docker image: {docker_tags}")
         return True
-    except docker.errors.APIError as e:
+    except docker.errors.DockerException as e:
         if verbose:
             print(f"Failed to pull image {docker_tags} due to {e}")
         return False
 
+
+def pull_many_docker_images(
+        images:list,
+        max_workers = None,
+        verbose = False,
+        progress = None,
+        ):
+    # Pull (name, tag) pairs in parallel, skipping local ones; returns {name:tag: success}
+    max_workers = max_workers or docker_config.MAX_PULL_WORKERS
+    local_tags = get_image_tags()
+    results = {}
+    to_pull = []
+    for name, tag in images:
+        if name+':'+tag in local_tags:
+            results[name+':'+tag] = True
+        else:
+            to_pull.append((name, tag))
+    if to_pull:
+        with ThreadPoolExecutor(max_workers = max(1, max_workers)) as pool:
+            futures = {
+                name+':'+tag: pool.submit(pull_docker_images, name, tag, verbose, progress)
+                for name, tag in to_pull
+            }
+            for docker_tags, future in futures.items():
+                results[docker_tags] = future.result()
+    return results
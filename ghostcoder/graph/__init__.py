@@ -4,6 +4,7 @@ from .webcrawler import create_crawler_agent
 from .retriever import  create_retriever_agent
 from .filemanager import create_filemanager_agent
 from .ghostcoder import create_ghostcoder_agent
+from .registry import get_compiled_graph, clear_compiled_graphs
 
 __all__ = [
     create_coder_agent,
@@ -12,4 +13,6 @@ __all__ = [
     create_retriever_agent,
     create_filemanager_agent,
     create_ghostcoder_agent,
+    get_compiled_graph,
+    clear_compiled_graphs,
 ]
\ No newline at end of file
@@ -3,6 +3,7 @@ from ..utils import *
 from ..prompts import load_prompt_template
 from .webcrawler import create_crawler_agent
 from .executor import create_executor_agent
+from .registry import get_compiled_graph
 from ..config import *
 
 from typing import TypedDict, Annotated, Optional, Type, Any
@@ -18,6 +19,7 @@ from langgraph.types import Checkpointer
 from langgraph.store.base import BaseStore
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.pregel import RetryPolicy
+from langchain_core.runnables import RunnableConfig
 #from langgraph.types import interrupt
 
 #----------------
@@ -54,7 +56,7 @@ def create_coder_agent(
         ref_codeblocks: str
         previous_codeblock: str
         data_perception: str
-        # env_profiles: str # Moved to config
+        env_profiles: dict # Task dirs and runtimes of this run
 
         #tracing parameter
         n_iter: int
@@ -62,6 +64,7 @@ def create_coder_agent(
         # websearch: bool # Moved to config
 
         #generated
+        script_type: str # "env" for env profiling code, which skips the critic
         generated_codeblock: Annotated[list[str], operator.add] # Generated code, save history for version control 
         comment: Annotated[list[str], operator.add] # Critique of the generated code
         execution_outstr: Annotated[list[str], operator.add]  # Execution output string
@@ -79,7 +82,8 @@ def create_coder_agent(
     #----------------
     # Get crawler subgraph 
     logger.debug("Loading crawler subgraph.")
-    crawler_subgraph = create_crawler_agent(
+    crawler_subgraph = get_compiled_graph(
+        create_crawler_agent,
         chat_model = chat_model, 
         max_retry = max_retry,
         name =  "crawler_subgraph",
@@ -92,7 +96,8 @@ def create_coder_agent(
         )
     
     logger.debug("Loading executor subgraph.")
-    executor_subgraph = create_executor_agent(
+    executor_subgraph = get_compiled_graph(
+        create_executor_agent,
         code_model = code_model,
         max_retry = max_retry,
         name =  "executor_subgraph",
@@ -108,7 +113,7 @@ def create_coder_agent(
     # Define nodes
     #----------------
 
-    def node_code_generation(state:State):
+    def node_code_generation(state:State, config:RunnableConfig):
         """
         This function generates code based on the task description, data perception,
         previous code, generated code, and reference code blocks. It uses an LLM to generate the code
@@ -118,6 +123,7 @@ def create_coder_agent(
         # 1. Pass inputs
         # 1.1 Basic inputs
         task_instruction = state['task_instruction']
+        data_perception = state['data_perception']
         try:
             generated_codeblock = state['generated_codeblock'][-1]
         except:
@@ -140,7 +146,7 @@ def create_coder_agent(
         logger.debug("ref_codeblocks: "+str(ref_codeblocks))
         # 1.4 When working in code improvement loop
         try:
-            comment = state['comment']
+            comment = state['comment'][-1]
         except:
             comment = ""
         logger.debug("critique comment:"+str(comment))
@@ -148,13 +154,17 @@ def create_coder_agent(
         # 1.5 When working in error fix loop
         try:
             error_status = state['error_status']
-            execution_outstr = state['execution_outstr']
+            execution_outstr = state['execution_outstr'][-1]
         except:
             error_status = False
         logger.debug("error_status:"+str(error_status))
-        # 1.6 Parse output paths
-        fig_dir = file_config.FIGURE_DIR
-        out_dir = file_config.OUTPUT_DIR
+        # 1.6 Parse output paths, the task dirs of this run
+        try:
+            task_dirs = state['env_profiles']['task_dirs']
+        except KeyError:
+            task_dirs = get_run_context(config).task_dirs()
+        fig_dir = task_dirs['figure_dir']
+        out_dir = task_dirs['output_dir']
         output_paths = '--output_data_dir: '+out_dir + '\n--output_figure_dir'+ fig_dir
         logger.debug("Output paths: "+output_paths)
 
@@ -245,7 +255,7 @@ def create_coder_agent(
         logger.debug("END node_env_parser")
         return {
             'generated_codeblock':[code_block],
-            'scrpt_type': script_type
+            'script_type': script_type,
             'n_iter':n_iter
         }
 
@@ -287,7 +297,7 @@ def create_coder_agent(
                 #critique = critique_report_2md(critique)
                 logger.info("Successfully generated critique.")
                 logger.debug("critique_status: "+str(critique_status))
-                logger.debug("critique: "+str(critique))
+                logger.debug("critique comment: "+str(comment))
                 break
             except Exception as e:
                 i+=1
@@ -300,7 +310,7 @@ def create_coder_agent(
         logger.debug("END node_criticism")
         return {
             'critique_status': critique_status, 
-            'comment': comment,
+            'comment': [comment],
         }
 
     async def node_executor(state:State):
@@ -371,7 +381,7 @@ def create_coder_agent(
 
         logger.debug("END node_executor")
         return{
-            'execution_outstr': execution_outstr,
+            'execution_outstr': [execution_outstr],
             'error_status':error_status,
             'error_summary':error_summary
         }
@@ -492,7 +502,7 @@ def create_coder_agent(
 
     def router_skip_critic(state:State):
         logger.debug("START router_skip_critic")
-        if state['scrpt_type'] == 'env':
+        if state['script_type'] == 'env':
             logger.debug("SELECT executor: code block for env profiling, skil critic")
             logger.debug("END router_skip_critic")
             return "exe"
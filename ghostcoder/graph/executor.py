@@ -15,12 +15,11 @@ from langgraph.types import Checkpointer
 from langgraph.store.base import BaseStore
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.pregel import RetryPolicy
+from langchain_core.runnables import RunnableConfig
 #from langgraph.types import interrupt
 #Autogen executors
 from autogen_core import CancellationToken
 from autogen_core.code_executor import CodeBlock
-from autogen_ext.code_executors.docker import DockerCommandLineCodeExecutor
-from autogen_ext.code_executors.local import LocalCommandLineCodeExecutor
 
 #----------------
 # Initial logging
@@ -67,7 +66,7 @@ def create_executor_agent(
     # Define nodes
     #----------------
     
-    def node_env_parser(state:State):
+    def node_env_parser(state:State, config:RunnableConfig):
         """
         """
         logger.debug("START node_env_parser")
@@ -80,8 +79,25 @@ def create_executor_agent(
             logger.info("Using given env profiles from graph input.")
         except: 
             env_profiles = get_env_profiles()
+            env_profiles['task_dirs'] = get_run_context(config).task_dirs()
             logger.info("Using default env profiles from config.")
 
+        # Reuse the decision for an already routed code block, or route it locally
+        cache_key = runtime_cache_key(generated_codeblock, env_profiles)
+        decision = get_cached_runtime(cache_key)
+        if decision is not None:
+            logger.info("Using cached runtime decision: " + str(decision))
+        elif coder_config.RUNTIME_DETECTOR:
+            decision = detect_runtime(generated_codeblock, env_profiles)
+            if decision is not None:
+                logger.info("Detected runtime without LLM: " + str(decision))
+                put_cached_runtime(cache_key, decision)
+            else:
+                logger.info("Runtime is ambiguous, asking LLM.")
+        if decision is not None:
+            logger.debug("END node_env_parser")
+            return {**decision, "env_profiles": env_profiles}
+
         # Call prompt template
         prompt, input_vars = load_prompt_template('executor.router')
         logger.debug(
@@ -156,8 +172,7 @@ def create_executor_agent(
                     logger.exception("Get exception with"+str(i)+"tries:\n")
                 else:
                     logger.debug("Get exception when parsing env:\n"+str(e))
-        logger.debug("END node_env_parser")
-        return{
+        decision = {
             "language": language,
             "use_docker": use_docker,
             "docker_image": docker_image,
@@ -165,6 +180,9 @@ def create_executor_agent(
             "script_file": script_file,
             "bash_cmd": bash_cmd,
         }
+        put_cached_runtime(cache_key, decision)
+        logger.debug("END node_env_parser")
+        return {**decision, "env_profiles": env_profiles}
 
     def node_script_wrapper(state:State):
         """
@@ -192,7 +210,7 @@ def create_executor_agent(
 
         logger.debug("END node_script_wrapper")
 
-    async def node_cmd_execute(state:State):
+    async def node_cmd_execute(state:State, config:RunnableConfig):
         """
         """
         logger.debug("START node_cmd_execute") 
@@ -209,8 +227,23 @@ def create_executor_agent(
         # Parse env profiles
         task_dir = env_profiles['task_dirs']['task_home']
 
+        # Persistent kernel mode: native Python/R blocks run in the session kernel, so data
+        # loaded by earlier blocks and retries stays in memory. The wrapped script file is
+        # still written, but its code runs in the kernel instead of a new process.
+        kernel = None
+        if get_run_context(config).execution_mode == "kernel" and not use_docker:
+            kernel = coder_config.KERNEL_NAMES.get(str(language).lower())
+            if kernel is None:
+                logger.info("No kernel for language "+str(language)+", running as a command.")
+
         # Parse code to run directly
-        if need_wrapped:
+        if kernel is not None:
+            exe_code = generated_codeblock
+            if exe_code.lstrip().startswith("```"):
+                exe_code = extract_code_blocks(exe_code)[0]
+            use_language = language
+            logger.info("Ready to execute code block in "+kernel+" kernel.")
+        elif need_wrapped:
             if bash_cmd.startswith("```"):
                 # Parse bash cmd
                 bash_cmd = extract_code_blocks(bash_cmd)[0]
@@ -226,43 +259,14 @@ def create_executor_agent(
         #print(use_docker)
         #print(docker_image)
 
-        # 1. Check if EXECUTOR already exist
-        if hasattr(coder_config, 'EXECUTOR') and coder_config.EXECUTOR is not None:
-            executor = coder_config.EXECUTOR
-            logger.info("Using created executor.")
-        else:
-            # Create executor
-            if use_docker:
-                try:
-                    executor = DockerCommandLineCodeExecutor(
-                        image = docker_image, 
-                        timeout = 60, 
-                        work_dir= task_dir, # Use the task main dir to store the code files.
-                        #bind_dir="./", # Path inside the docker
-                        delete_tmp_files  = True, # All code history saved in memory, no need temp code files
-                        auto_remove = False, # Do not auto remove container, for consistent running env 
-                        stop_container = False, # Do not auto stop container
-                    )   
-                    logger.info("Created new docker cmd executor with docker image:"+docker_image)
-                except Exception as e:
-                    logger.exception("Get exception when creating docker executor:")
-                    # print(f"Error create docker cmd executor due to: \n{e}")
-            else: 
-                try:
-                    executor = LocalCommandLineCodeExecutor(
-                        timeout=30,  # Timeout for each code execution in seconds.
-                        work_dir=task_dir,  # Use the task main dir to store the code files.
-                    )
-                    logger.info("Created new native env cmd executor.")
-                except Exception as e:
-                    logger.exception("Get exception when creating native executor:")
-                    # print(f"Error create local cmd executor due to: \n{e}")
-        # Update Executor
-        coder_config.EXECUTOR = executor
-        
-        # Execute codes
+        # Execute codes on the warm executor of this docker image (or native env, or kernel) and task dir
         try:
-            async with executor:
+            async with get_executor_pool().executor(
+                docker_image = docker_image,
+                work_dir = task_dir, # Use the task main dir to store the code files.
+                use_docker = use_docker,
+                kernel = kernel,
+                ) as executor:
                 exe_result = await executor.execute_code_blocks(
                     code_blocks = [
                         CodeBlock(
@@ -272,17 +276,16 @@ def create_executor_agent(
                     ],
                     cancellation_token=CancellationToken(),
                 )
-                logger.info("Successfully executed code block.")
-                logger.debug("with output:\n" + exe_result.output)
+            logger.info("Successfully executed code block.")
+            logger.debug("with output:\n" + exe_result.output)
+            # Parse execution result
+            output = exe_result.output
+            execution_results = "Code executed with output:\n" + output + "\n"
+            #exit_code = exe_result.exit_code
+            #execution_results = "Code executed with exit code "+ str(exit_code) +"\n"
         except Exception as e:
             logger.exception("Get exception when running executor:")
-            #print(f"Error executor code due to: \n{e}")
-
-        # Parse execution result
-        output = exe_result.output
-        execution_results = "Code executed with output:\n" + output + "\n"
-        #exit_code = exe_result.exit_code
-        #execution_results = "Code executed with exit code "+ str(exit_code) +"\n"
+            execution_results = "Code failed to execute due to executor error:\n" + str(e) + "\n"
 
         logger.info("End executor subagent...\n============executor============\n")
         logger.debug("END node_cmd_execute")
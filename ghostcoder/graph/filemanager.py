@@ -19,6 +19,7 @@ from langgraph.types import Checkpointer
 from langgraph.store.base import BaseStore
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.pregel import RetryPolicy
+from langchain_core.runnables import RunnableConfig
 #from langgraph.types import interrupt
 
 #----------------
@@ -49,6 +50,7 @@ def create_filemanager_agent(
         #input
         session_id: str
         task_id: str
+        task_home: str # optional, used without a run context in the config
         # docker_files_dir: str # Moved to config
         
         #parameter
@@ -68,42 +70,22 @@ def create_filemanager_agent(
     # Define nodes
     #----------------
 
-    def node_file_management(state:State):
+    def node_file_management(state:State, config:RunnableConfig):
         """
         """
         logger.debug("START node_file_management")
         logger.info("============file manager============\nStarting filemanager subagent...\n")
-        # Pass input 
-        try:
-            task_home = file_config.WORK_HOME
-        except:
-            task_home = ''
-
-        try:
-            input_data_dir = file_config.INPUT_DATA_DIR
-        except:
-            input_data_dir = ''
-
-        try:
-            session_id = state['session_id']
-            ghostcoder_config.SESSION_ID = session_id
-        except:
-            session_id = ''
-
-        try:
-            task_id = state['task_id']
-            ghostcoder_config.TASK_ID = task_id
-        except:
-            session_id = ''
-
-            
-        if len(task_home) < 1: # When use default TASK_HOME
-            task_home = os.path.join(os.getcwd(),session_id,task_id) # Default to current dir
-            file_config.WORK_HOME = task_home
-
-        if len(input_data_dir) < 1: # When use default INPUT_DATA_DIR
-            input_data_dir = os.path.join(os.getcwd(), 'data') # Default to current dir
-            file_config.INPUT_DATA_DIR = input_data_dir
+        # Pass input: the run context, else the ids given in the state and config defaults
+        context = get_run_context(
+            config,
+            session_id = state.get('session_id'),
+            task_id = state.get('task_id'),
+            task_home = state.get('task_home'),
+            )
+        session_id = context.session_id
+        task_id = context.task_id
+        task_home = context.task_home
+        input_data_dir = context.input_data_dir
 
         logger.debug(
             "Given inputs:\n----------------\n"+
@@ -117,29 +99,20 @@ def create_filemanager_agent(
         logger.info(
             "Creating file paths..."
             )
-        if not check_dir_exists(task_home):
-            create_dir(task_home)
-            logger.info(
-            "Created work home path as"+str(task_home)
-            )
-        file_config.DATA_DIR = os.path.join(task_home,file_config.DATA_FILENAME)
-        file_config.FIGURE_DIR = os.path.join(task_home,file_config.FIGURE_FILENAME)
-        file_config.OUTPUT_DIR = os.path.join(task_home,file_config.OUTPUT_FILENAME)
-        for fname in [
-            file_config.DATA_DIR, 
-            file_config.FIGURE_DIR, 
-            file_config.OUTPUT_DIR]:
+        # Task dirs of this run only, so concurrent runs don't overwrite each other's paths
+        task_dirs = context.task_dirs()
+        for dir_ in task_dirs.values():
             if not check_dir_exists(dir_):
                 create_dir(dir_)
                 logger.info(
-                "Created sub path"+str(dir_)
+                "Created path"+str(dir_)
                 )
         
         # Copy data 
         logger.info(
         "Copying data files to task dir..."
         )
-        data_files = copy_files(file_config.INPUT_DATA_DIR,file_config.DATA_DIR, )
+        data_files = copy_files(input_data_dir,task_dirs['data_dir'], )
         logger.info(
         "Copied data files to task "+str(data_files)
         )
@@ -151,7 +124,7 @@ def create_filemanager_agent(
         logger.debug("END node_file_management")
         return {
             "data_files": data_files,
-            "env_profiles": env_profiles,
+            "env_profiles": {"task_dirs": task_dirs},
         }
     
     def env_perception(state:State):
@@ -161,6 +134,8 @@ def create_filemanager_agent(
         
 
         env_profiles = get_env_profiles()
+        # Keep the task dirs of this run
+        env_profiles['task_dirs'] = state['env_profiles']['task_dirs']
         logger.debug(
             "Detailed env profiles:\n--------env profiles--------\n"+
             str(env_profiles)+
@@ -172,12 +147,11 @@ def create_filemanager_agent(
         )
 
         # Check docker status perception 
-        docker_status_str = get_docker_status()
-        env_profiles['docker status'] = docker_status_str
+        docker_status_str = env_profiles['docker status']
         logger.debug("Docker status:"+str(docker_status_str))
 
-        # Check native env profiles 
-        native_env_profile = get_native_env_perception()
+        # Check native env profiles, probed (or loaded from cache) by get_env_profiles
+        native_env_profile = env_profiles['native env languages']
         # Pass to env_profiles 
         env_profiles['native env languages'] = "Language installed in native env and their versions are:\n"+str(native_env_profile) + "\n"
         logger.debug("Native env status:"+str(native_env_profile))
@@ -206,7 +180,8 @@ def create_filemanager_agent(
 
     # add edges
     builder.add_edge(START, "File management")
-    builder.add_edge("File management",END)
+    builder.add_edge("File management","Env perception")
+    builder.add_edge("Env perception",END)
 
     return builder.compile(
         checkpointer=checkpointer,
@@ -3,6 +3,7 @@ from ghostcoder.prompts import load_prompt_template
 from .coder import create_coder_agent
 from .retriever import create_retriever_agent
 from .filemanager import create_filemanager_agent
+from .registry import get_compiled_graph
 from ..config import *
 
 from typing import TypedDict, Optional, Type, Any
@@ -45,8 +46,11 @@ def create_ghostcoder_agent(
         #input
         task_description: str
         previous_codeblock: str # optional, default use none
+        # Per-run settings come with the run context in the config (see RunContext),
+        # these are only used by runs started without one
         task_id: str # optional, default use ghostcoder_config.TASK_ID
         session_id: str # optional, default use ghostcoder_config.SESSION_ID
+        task_home: str # optional, default <WORK_HOME or cwd>/<session_id>/<task_id>
         
         #parameters 
         n_iter: int
@@ -76,7 +80,8 @@ def create_ghostcoder_agent(
     #----------------
 
     # Get crawler subgraph 
-    coder_subgraph = create_coder_agent(
+    coder_subgraph = get_compiled_graph(
+        create_coder_agent,
         chat_model = chat_model, 
         reason_model = reason_model,
         code_model = code_model,
@@ -90,7 +95,8 @@ def create_ghostcoder_agent(
         debug = debug,
         )
 
-    retriever_subgraph = create_retriever_agent(
+    retriever_subgraph = get_compiled_graph(
+        create_retriever_agent,
         chat_model = chat_model, 
         max_retry = max_retry,
         name =  "retriever_subgraph",
@@ -102,7 +108,8 @@ def create_ghostcoder_agent(
         debug = debug,
         )
     
-    filemanager_subgraph = create_filemanager_agent(
+    filemanager_subgraph = get_compiled_graph(
+        create_filemanager_agent,
         name =  "filemanager_subgraph",
         config_schema = config_schema,
         checkpointer = checkpointer,
@@ -121,26 +128,14 @@ def create_ghostcoder_agent(
     async def node_filemanager(state:State):
         """"""
 
-        # Pass and update inputs
-        try:
-            task_id = state['task_id']
-            ghostcoder_config.TASK_ID = task_id
-        except:
-            task_id = ghostcoder_config.TASK_ID
-        try:
-            session_id = state['session_id']
-        except:
-            session_id = ghostcoder_config.SESSION_ID
-            ghostcoder_config.SESSION_ID = session_id
-
-        docker_profile_dir = docker_config.DOCKER_PROFILES_DIR
-
-        # Parse subgraph inputs
+        # Parse subgraph inputs, the ids and task dir of the run context (inherited
+        # with the config) take precedence over the ones in the state
         fm_input = {
-            "task_id": task_id,
-            "session_id": session_id,
             "max_iter": file_config.MAX_ITER,
         }
+        for key in ("task_id", "session_id", "task_home"):
+            if state.get(key):
+                fm_input[key] = state[key]
         
         # Get reference using file manager subgraph
         i = 0
@@ -172,7 +167,6 @@ def create_ghostcoder_agent(
 
         # Pass inputs
         task_description = state['task_description']
-        data_perception = state['data_perception']
         previous_codeblock = state['previous_codeblock']
         n_iter = state['n_iter']
         try:
@@ -224,7 +218,7 @@ def create_ghostcoder_agent(
             }
 
 
-    def node_retriever(state:State):
+    async def node_retriever(state:State):
         """"""
         # Pass inputs
         retriever_input = {
@@ -236,7 +230,7 @@ def create_ghostcoder_agent(
             i = 0
             while i < max_retry:
                 try:
-                    retriever_state = retriever_subgraph.invoke(
+                    retriever_state = await retriever_subgraph.ainvoke(
                         retriever_input,
                         config = config_schema)
                     # Pass output
@@ -288,6 +282,7 @@ The method for inspecting the file is determined by its type and context. Follow
 
         # Pass inputs
         data_files = state['data_files']
+        given_perception = state.get('data_perception', "")
 
         # Parse data perception task
         task_instruction = "### Purpose\nTo inspect a given data file to understand its structure, format, and content (metadata) before performing any analysis. This helps prevent errors and inform the next steps of the workflow. The choice of tool and language will be adapted based on the file type and the context of other available data.:\n - Data files:" + str(data_files) + "\n"
@@ -301,6 +296,7 @@ The method for inspecting the file is determined by its type and context. Follow
             "data_perception"   : data_perception,
             "ref_codeblocks"    : "",
             "previous_codeblock": "",
+            "env_profiles"      : state["env_profiles"],
             }
 
         if ghostcoder_config.ALLOW_DATA_PERCEPTION:
@@ -312,10 +308,13 @@ The method for inspecting the file is determined by its type and context. Follow
 
             # Pass output
             generated_codeblock = coder_state['generated_codeblock'][-1]
-            execution_outstr = coder_state['execution_outstr']
+            execution_outstr = coder_state['execution_outstr'][-1]
+            if len(given_perception) > 1:
+                execution_outstr = given_perception + "\n" + execution_outstr
         else:
             generated_codeblock = ""
-            execution_outstr = "Data perception is not available."
+            # Keep the perception given with the task input, if any
+            execution_outstr = given_perception or "Data perception is not available."
             coder_state = {}
 
         # Return 
@@ -348,7 +347,7 @@ The method for inspecting the file is determined by its type and context. Follow
 
         # Pass output
         generated_codeblock = coder_state['generated_codeblock'][-1]
-        execution_outstr = coder_state['execution_outstr']
+        execution_outstr = coder_state['execution_outstr'][-1]
         
         return {
             "generated_codeblock":generated_codeblock,
@@ -366,6 +365,7 @@ The method for inspecting the file is determined by its type and context. Follow
         generated_codeblock = state['generated_codeblock']
         execution_outstr = state['execution_outstr']
         criteria = state['criteria']
+        n_iter = state['n_iter']
 
         human_input = "## Instruction in last round:  \n" + task_instruction + '\n'
         human_input += "## Evaluation criteria:  \n" + criteria + '\n'
@@ -452,12 +452,6 @@ The method for inspecting the file is determined by its type and context. Follow
     # Define conditional edges
     #----------------
     
-    def router_use_RAG(state:State):
-        if ghostcoder_config.DB_RETRIEVE:
-            return "RAG"
-        else:
-            return "continue"
-        
     def router_eval(state:State):
         if state['n_iter'] < ghostcoder_config.MAX_ITER:
             if state['eval_decision'].lower() == 'refine instruction':
@@ -478,34 +472,32 @@ The method for inspecting the file is determined by its type and context. Follow
     # add nodes
     builder.add_node("File manager", node_filemanager)
     builder.add_node("Task parser", node_task_parser)
+    builder.add_node("Task refiner", node_task_parser)
     builder.add_node("Retriever", node_retriever)
+    builder.add_node("Data perception", node_data_perception_coder)
     builder.add_node("Coder",node_task_coder)
     builder.add_node("Evaluator",node_evaluator)
-    builder.add_node("Output parser",node_output_parser)
     # builder.add_node("Update env",node_update_env)
     # add edges
     builder.add_edge(START, "File manager")
+    # Task parsing, retrieval and data perception are independent: run them as
+    # parallel branches, the Coder starts once all three are done
     builder.add_edge("File manager", "Task parser")
-    builder.add_conditional_edges(
-        "Task parser", 
-        router_use_RAG,
-        {
-            "RAG"       : "Retriever", 
-            "continue"  : "Coder"
-        }
-    )
-    builder.add_edge("Retriever","Coder")
+    builder.add_edge("File manager", "Retriever")
+    builder.add_edge("File manager", "Data perception")
+    builder.add_edge(["Task parser", "Retriever", "Data perception"], "Coder")
+    # Refined instructions reuse the retrieved code and perception
+    builder.add_edge("Task refiner", "Coder")
     builder.add_edge("Coder", "Evaluator")
     builder.add_conditional_edges(
         "Evaluator", 
         router_eval,
         {
-            "regen_instruc" : "Task parser", 
+            "regen_instruc" : "Task refiner", 
             "coder"         : "Coder",
-            "output"        : "Output parser",
+            "output"        : END, # Results are in generated_codeblock and execution_outstr
         }
     )
-    builder.add_edge("Output parser", END)
 
 
     return builder.compile(
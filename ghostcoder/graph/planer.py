@@ -192,8 +192,8 @@ def create_planner_agent(
             data_dir = state['data_dir']
             logger.info("Use defined data dir:"+str(data_dir))
         except:
-            # Use default data dir 
-            data_dir = str(file_config.DATA_DIR)
+            # Use the data dir of the default run context
+            data_dir = RunContext.from_config().data_dir
             logger.info("Use default data dir"+str(data_dir))
 
         try:
@@ -0,0 +1,79 @@
+import logging
+import weakref
+import threading
+from typing import Callable
+
+from ..config import ghostcoder_config
+
+#langgraph
+from langgraph.graph.state import CompiledStateGraph
+
+#----------------
+# Initial logging
+#----------------
+logger = logging.getLogger(__name__)
+
+#----------------
+# Compiled graph registry
+#----------------
+# Compiled graphs hold no per-run state (it lives in the graph input/config and the
+# checkpointer), so one compiled graph per topology and arguments can serve every agent
+# in the process. Graphs are held weakly, so a graph and its arguments are released with
+# the last agent using it. A live graph keeps its arguments alive (_GRAPH_ARGS), so the
+# id() of a model in a key can't be reused by another object while the entry exists.
+_GRAPHS: "weakref.WeakValueDictionary[tuple, CompiledStateGraph]" = weakref.WeakValueDictionary()
+_GRAPH_ARGS: "weakref.WeakKeyDictionary[CompiledStateGraph, tuple]" = weakref.WeakKeyDictionary()
+_GRAPHS_LOCK = threading.RLock() # Reentrant, factories fetch their own subgraphs here
+
+
+def _arg_key(value):
+    # Hashable key of a factory argument, objects (models, checkpointers, stores) by identity
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_arg_key(v) for v in value)
+    return ("id", id(value))
+
+def get_compiled_graph(
+    factory: Callable[..., CompiledStateGraph],
+    *args,
+    **kwargs,
+    ) -> CompiledStateGraph:
+    """
+    Return the compiled graph of `factory(*args, **kwargs)`, compiling it only once.
+
+    Graphs built by the same factory with the same arguments (models, checkpointer
+    and store compared by identity) are shared. Set ghostcoder_config.SHARE_GRAPHS
+    to False to compile a new graph on every call.
+
+    Args:
+        factory (Callable): Graph factory, e.g. create_crawler_agent.
+        *args, **kwargs: Arguments of the factory.
+
+    Returns:
+        CompiledStateGraph: The shared compiled graph.
+    """
+    if not ghostcoder_config.SHARE_GRAPHS:
+        return factory(*args, **kwargs)
+
+    key = (
+        factory.__module__, factory.__qualname__,
+        _arg_key(args),
+        tuple(sorted((k, _arg_key(v)) for k, v in kwargs.items())),
+    )
+    with _GRAPHS_LOCK:
+        graph = _GRAPHS.get(key)
+        if graph is None:
+            logger.debug("Compiling " + factory.__qualname__ + " for the graph registry.")
+            graph = factory(*args, **kwargs)
+            _GRAPHS[key] = graph
+            _GRAPH_ARGS[graph] = (args, kwargs)
+        else:
+            logger.debug("Reusing compiled " + factory.__qualname__ + " from the graph registry.")
+        return graph
+
+def clear_compiled_graphs() -> None:
+    """Drop every shared compiled graph, e.g. after changing the config they read at build time."""
+    with _GRAPHS_LOCK:
+        _GRAPHS.clear()
+        _GRAPH_ARGS.clear()
@@ -1,10 +1,13 @@
+import time
 import logging
+import threading
 from ..utils import *
 from ..prompts import load_prompt_template
 from .webcrawler import create_crawler_agent
+from .registry import get_compiled_graph
 from ..config import *
 
-from typing import TypedDict, Optional, Type, Any
+from typing import TypedDict, Optional, Type, Any, NotRequired
 import operator 
 #langchain
 from langchain_core.language_models import LanguageModelLike
@@ -46,6 +49,7 @@ def create_retriever_agent(
     class State(TypedDict):
         #input
         task_description: str
+        ref_filters: NotRequired[dict] # RefCodeDB metadata pre-filters, default retriever_config.REFCODEDB_FILTERS
 
         #generated
         db_use: str
@@ -57,7 +61,8 @@ def create_retriever_agent(
     # Load subgraphs
     #----------------
     # Get crawler subgraph 
-    crawler_subgraph = create_crawler_agent(
+    crawler_subgraph = get_compiled_graph(
+        create_crawler_agent,
         chat_model = chat_model, 
         max_retry = max_retry,
         name =  "crawler_subgraph",
@@ -72,21 +77,42 @@ def create_retriever_agent(
     #----------------
     # initial retrievers
     #----------------
-    retrievers = []
-    logger.info("============retriever============\nStarting retriever subagent...\n")
-    logger.info("Initializing retrievers...")
-    logger.debug(
-        "Totally"+str(len(retriever_config.DATABASES))+" vdbs to add, they are:\n"+
-        str(retriever_config.DATABASES)
-        )
-    for db in retriever_config.DATABASES:
-        if db['name'] != 'web_crawler':
-            try:
-                retriever =  setup_vdbs(db['name'])
-                retrievers.append(retriever)
-                logger.info("Successfully add vector db:"+str(db['name']))
-            except Exception as e:
-                logger.exception("Get exception when adding vdb:")
+    retrievers = {} # Built on first retrieval by get_retrievers(), not at graph construction
+    failed_setups = {} # db name -> (next retry time, current backoff) of vdbs that failed to set up
+    retrievers_lock = threading.Lock()
+
+    def get_retrievers():
+        """
+        Set up the vector db retrievers on first use. Vector stores and their pooled
+        database engine are shared process-wide by setup_vdbs. Vdbs that fail to set up
+        (e.g. database briefly unreachable) are retried on later calls, with backoff.
+        """
+        with retrievers_lock:
+            now = time.monotonic()
+            to_setup = [
+                db['name'] for db in retriever_config.DATABASES
+                if db['name'] != 'web_crawler'
+                and db['name'] not in retrievers
+                and failed_setups.get(db['name'], (0, 0))[0] <= now
+                ]
+            if to_setup:
+                logger.info("Initializing retrievers...")
+                logger.debug(
+                    "Totally"+str(len(to_setup))+" vdbs to add, they are:\n"+
+                    str(to_setup)
+                    )
+            for db_name in to_setup:
+                try:
+                    retrievers[db_name] = setup_vdbs(db_name, llm_config.MODELS['embed_model'])
+                    failed_setups.pop(db_name, None)
+                    logger.info("Successfully add vector db:"+str(db_name))
+                except Exception as e:
+                    # Retry later, doubling the wait on each failure
+                    backoff = failed_setups.get(db_name, (0, 0))[1]
+                    backoff = min(backoff * 2, retriever_config.DB_SETUP_RETRY_MAX) if backoff else retriever_config.DB_SETUP_RETRY
+                    failed_setups[db_name] = (now + backoff, backoff)
+                    logger.exception("Get exception when adding vdb, retrying in "+str(backoff)+"s:")
+            return dict(retrievers)
 
 
     #----------------
@@ -97,6 +123,7 @@ def create_retriever_agent(
         This function generates web search queries based on the error summary using an LLM.
         """
         logger.debug("START node_chose_db")
+        logger.info("============retriever============\nStarting retriever subagent...\n")
         
         # Pass inputs
         task_description = state['task_description']
@@ -133,7 +160,7 @@ def create_retriever_agent(
             try:
                 response = chain.invoke(message)
                 db_use = response['DB to use']
-                logger.info("LLM chose "+db_se+ "to use.")
+                logger.info("LLM chose "+str(db_use)+" to use.")
                 break
             except Exception as e:
                 i+=1
@@ -187,42 +214,49 @@ def create_retriever_agent(
         
         # Parse webpage content
         logger.info("Parsing crawled web pages.")
-        webpages = []
-        n_pages = 0
+        messages = []
         for res in crawl_res:
             if 'fullpage_content' in res.keys():
                 if len(res['fullpage_content']) < 100: #skip page with too few content
-                    logger.debug("Parsing #"+str(n_pages+1)+" web page.")
+                    logger.debug("Skip web page with too few content: "+str(res.get('url')))
                     continue
                 # Parse human input
-                logger.info("Parsing #"+str(n_pages+1)+" web page using LLM.")
                 human_input = "## The original web page content:  \n" + res['fullpage_content'] + "\n"
                 logger.debug("Human input:\n"+human_input)
 
                 # Construct input message
-                message = [
+                messages.append([
                     SystemMessage(content=prompt.format()),
                     HumanMessage(content=human_input)
-                ]
-                i = 0
-                while i < max_retry: 
-                    try:
-                        response = chat_model.invoke(message)
-                        parsed_page = response.content
-                        logger.info("Successfully parse #"+str(n_pages+1)+" web page.")
-                        logger.debug("Parsed content:\n"+parsed_page)
-                        break
-                    except Exception as e:
-                        i+=1
-                        if i == max_retry:
-                            logger.exception("Get exception when parsing web page with LLM:")
-                            raise
-                        else:
-                            logger.debug("Get exception when parsing web page with LLM:\n"+str(e))
-
-                n_pages += 1
-                webpages.append(parsed_page)
-        logger.info("Totally parsed "+str(parsed_page)+" web pages.")
+                ])
+
+        # Parse all pages in one batch, retry only the pages that failed
+        logger.info("Parsing "+str(len(messages))+" web pages using LLM.")
+        parsed_pages = [None] * len(messages)
+        pending = list(range(len(messages)))
+        i = 0
+        while len(pending) > 0 and i < max_retry:
+            responses = chat_model.batch(
+                [messages[idx] for idx in pending],
+                config = {"max_concurrency": retriever_config.MAX_CONCURRENCY},
+                return_exceptions = True,
+                )
+            failed = []
+            for idx, response in zip(pending, responses):
+                if isinstance(response, Exception):
+                    logger.debug("Get exception when parsing #"+str(idx+1)+" web page with LLM:\n"+str(response))
+                    failed.append(idx)
+                else:
+                    parsed_pages[idx] = response.content
+                    logger.info("Successfully parse #"+str(idx+1)+" web page.")
+                    logger.debug("Parsed content:\n"+response.content)
+            pending = failed
+            i+=1
+        if len(pending) > 0:
+            logger.warning("Failed to parse "+str(len(pending))+" web pages after "+str(max_retry)+" tries, skipped.")
+
+        webpages = [page for page in parsed_pages if page is not None]
+        logger.info("Totally parsed "+str(len(webpages))+" web pages.")
 
         logger.debug("END node_webcrawler")
         return {
@@ -239,15 +273,20 @@ def create_retriever_agent(
         task_description = state['task_description']
         logger.debug("Given inputs:\n"+str(task_description))
 
+        # Metadata pre-filters narrow the candidates, and the blocks sent to node_filter
+        ref_filters = state.get('ref_filters') or retriever_config.REFCODEDB_FILTERS
+        if ref_filters:
+            logger.info("Filtering ref code blocks by metadata: "+str(ref_filters))
+
         # Retrieve refcode 
         logger.info("Retrieving ref code blocks from vdbs.")
         refcodes=[]
-        for retriever in retrievers:
-            docs = retriever.invoke(task_description)
-            logger.info("Get "+str(len(docs))+" results from"+str(retriever['name']))
+        for db_name, retriever in get_retrievers().items():
+            docs = retrieve_vdb(retriever, task_description, ref_filters)
+            logger.info("Get "+str(len(docs))+" results from "+str(db_name))
             for doc in docs:
                 code = doc.metadata["CodeBlock"]
-                refcodes.apppend(code)
+                refcodes.append(code)
         
         logger.debug("Retrived code blocks:\n"+str(refcodes))
         logger.debug("END node_vdb_retriever")
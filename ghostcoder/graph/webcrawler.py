@@ -6,7 +6,9 @@ from ..config import *
 
 
 from typing import TypedDict, Optional, Type, Any
+import json
 import operator 
+from concurrent.futures import ThreadPoolExecutor
 #langchain
 from langchain_core.language_models import LanguageModelLike
 from langchain_core.messages import HumanMessage, SystemMessage
@@ -56,6 +58,11 @@ def create_crawler_agent(
         crawled_webs: str
         summary: str
 
+    #----------------
+    # Initial web search client
+    #----------------
+    websearch = None # Created lazily by get_websearch(), shared by every run of this subgraph
+
     #----------------
     # Define nodes
     #----------------
@@ -111,9 +118,26 @@ def create_crawler_agent(
         }
 
 
+    def get_websearch():
+        """
+        Create the Tavily client on first use and reuse it for the subgraph lifetime.
+        """
+        nonlocal websearch
+        if websearch is None:
+            # Set up Tavily key
+            os.environ["TAVILY_API_KEY"] = tavily_config.API_KEY
+            logger.debug("Tavily API key set as:"+tavily_config.API_KEY)
+            websearch = TavilySearch(
+                max_results=tavily_config.MAX_RESULTS,
+                topic="general",)
+            logger.debug("Created Tavily search client.")
+        return websearch
+
     def node_websearch(state:State):
         """
         This function performs web searches using the provided queries and collects results.
+        Queries are sent concurrently, bounded by crawler_config.MAX_CONCURRENT_QUERIES,
+        and results are merged in query order.
         """
         logger.debug("START node_websearch")   
 
@@ -121,29 +145,42 @@ def create_crawler_agent(
         query_list = state['query_list']
         logger.debug("Given inputs:\n"+str(query_list))
 
-        # Set up Tavily key
-        os.environ["TAVILY_API_KEY"] = tavily_config.API_KEY
-        logger.debug("Tavily API key set as:"+tavily_config.API_KEY)
-
         # Call Tavily search 
         logger.info("Start web search using Tavily...")
-        websearch = TavilySearch(
-            max_results=tavily_config.MAX_RESULTS,
-            topic="general",)
-        logger.info("Queried Tavily search results.")
-
-        # Get web query
+        search_client = None if cache_config.WEB_CACHE_OFFLINE else get_websearch()
+
+        web_cache = get_web_cache()
+
+        def run_query(query):
+            # Search results are cached with the crawled pages, for offline replay
+            cache_key = "tavily://" + str(tavily_config.MAX_RESULTS) + "/" + str(query)
+            if web_cache is not None:
+                entry = web_cache.get(cache_key)
+                if entry is not None and (cache_config.WEB_CACHE_OFFLINE or not entry['expired']):
+                    logger.debug("Query with question '"+str(query)+"' served from cache.")
+                    return json.loads(entry['content'])
+            if cache_config.WEB_CACHE_OFFLINE:
+                logger.info("Offline mode, no cached results for query '"+str(query)+"'.")
+                return {"results": []}
+            logger.debug("Query with question '"+str(query)+"'...")
+            res = search_client.invoke({"query":query})
+            if web_cache is not None and isinstance(res, dict):
+                web_cache.put(cache_key, json.dumps(res))
+            return res
+
+        # Get web query, map() keeps results in query order
         query_results = []
-        for query in query_list:
+        n_workers = max(1, min(int(crawler_config.MAX_CONCURRENT_QUERIES), len(query_list)))
+        with ThreadPoolExecutor(max_workers = n_workers) as pool:
             try:
-                logger.debug("Query with question '"+str(query)+"'...")
-                res = websearch.invoke({"query":query})
-                if 'results' in res.keys():
-                    query_results += res['results']
-                    logger.debug("Get "+str(len(res['results']))+" results.")
+                for res in pool.map(run_query, query_list):
+                    if 'results' in res.keys():
+                        query_results += res['results']
+                        logger.debug("Get "+str(len(res['results']))+" results.")
             except Exception as e:
                 logger.exception("Get exception when querying with Tavily.")
                 raise
+        logger.info("Queried Tavily search results.")
         
         if crawler_config.PRINT_WEBSEARCH_RES:
             logger.debug("Print query results")
@@ -229,6 +266,8 @@ def create_crawler_agent(
 
     def node_crawler(state:State):
         """
+        This function crawls the selected web pages concurrently. Pages that fail or do not
+        finish within crawler_config.CRAWL_DEADLINE are skipped, the rest are returned.
         """
         logger.debug("START node_crawler")
 
@@ -237,28 +276,29 @@ def create_crawler_agent(
 
         # Crawl from url
         logger.info("Start crawling web pages...")
+        web_contents = webcontent_batch_loader(
+            [res['url'] for res in useful_results],
+            max_workers = crawler_config.MAX_CRAWL_WORKERS,
+            max_per_host = crawler_config.MAX_CRAWL_PER_HOST,
+            timeout = crawler_config.CRAWL_TIMEOUT,
+            deadline = crawler_config.CRAWL_DEADLINE,
+            )
+
+        # Merge crawled pages in selection order
         crawled_webs = "## Crawled web pages:  \n---\n"
         j = 0
         for res in useful_results:
-            i = 0 
-            while i < max_retry:
-                try:
-                    web_content = webcontent_str_loader(res['url'])
-                    if crawler_config.PRINT_WEBPAGE:
-                        print(web_content)
-                    res['fullpage_content'] = web_content
-                    crawled_webs += "### Page "+str(j)+ ":  \n"
-                    crawled_webs += web_content + '\n---\n'
-                    j+=1
-                    logger.debug("Crawled web page "+str(j)+":\n"+web_content)
-                    break
-                except Exception as e:
-                    i+=1
-                    if i == max_retry:
-                        logger.exception("Get exception when crawling web pages:")
-                        raise
-                    else:
-                        logger.debug("Get exception when crawling web pages:\n"+str(e))
+            if res['url'] not in web_contents:
+                logger.info("Skipped web page "+str(res['url'])+", not loaded in time.")
+                continue
+            web_content = web_contents[res['url']]
+            if crawler_config.PRINT_WEBPAGE:
+                print(web_content)
+            res['fullpage_content'] = web_content
+            crawled_webs += "### Page "+str(j)+ ":  \n"
+            crawled_webs += web_content + '\n---\n'
+            j+=1
+            logger.debug("Crawled web page "+str(j)+":\n"+web_content)
 
         logger.info("Crawled total "+str(j)+" web pages.")
 
@@ -1,8 +1,10 @@
 import os
 import re
+from functools import lru_cache
 from langchain_core.prompts import PromptTemplate
 
-def load_prompt_template(prompt_name: str):
+@lru_cache(maxsize=None)
+def _load_prompt_template(prompt_name: str):
     """
     Loads a prompt template from a Markdown file and processes it for use with LangChain's PromptTemplate.
     
@@ -42,4 +44,18 @@ def load_prompt_template(prompt_name: str):
         template = template,
         )
 
-    return system_prompt, input_vars
\ No newline at end of file
+    return system_prompt, input_vars
+
+def load_prompt_template(prompt_name: str):
+    """
+    Loads a prompt template, reading and parsing each template file only once per process.
+
+    Args:
+        prompt_name: The name of the prompt template file (without extension).
+    Returns:
+        system_prompt: The processed template string, with placeholders converted for LangChain use.
+        input_vars: The input variables name in the prompt.
+    """
+    system_prompt, input_vars = _load_prompt_template(prompt_name)
+    # Copy the list so callers can't change the cached one
+    return system_prompt, list(input_vars)
@@ -1,6 +1,15 @@
 from .execute import *
+from .kernel import *
+from .runtime import *
+from .executorpool import *
+from .limits import *
+from .context import *
 from .data import *
 from .format import *
 from .io import *
+from .cache import *
+from .checkpoint import *
+from .vectorindex import *
+from .refcodedb import *
 from .setup import *
 from .log import *
\ No newline at end of file
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder Cache Utilities
+# Provides persistent, content-addressed caches used across the BIA-Ghostcoder graphs.
+# Repeated LLM calls with identical rendered messages (reruns, resumes, retries after
+# a downstream failure), repeatedly crawled documentation pages and already embedded
+# texts are answered from disk instead of paying another round trip.
+
+import os
+import gzip
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from ghostcoder.config import cache_config, llm_config
+
+# LangChain cache and embedding interfaces, (de)serialization of generations
+from langchain_core.caches import BaseCache
+from langchain_core.embeddings import Embeddings
+from langchain_core.load import dumps, loads
+
+#######################################
+# SHARED SQLITE STORAGE
+# Size-capped key/value table with least-recently-used eviction and hit/miss counters
+#######################################
+
+class SQLiteCacheStore:
+    """
+    Size-capped cache table stored in a single SQLite file.
+
+    Every row carries its stored size and last access time. Once the total stored
+    size exceeds `max_bytes`, least recently used rows are evicted. Hit and miss
+    counters are kept per process and exposed through `stats()`. Subclasses add
+    their own columns through `extra_columns` and implement the lookup logic.
+
+    Instances are safe to share between threads.
+    """
+
+    table_name = "cache"
+    extra_columns = ""
+
+    def __init__(self, database_path: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            database_path (str): Path of the SQLite file. Parent directories are created.
+            max_bytes (int, optional): Size cap of stored values in bytes. Least
+                                       recently used entries are evicted above it.
+                                       Non-positive values disable eviction.
+        """
+        self.database_path = os.path.abspath(database_path)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.database_path), exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.database_path,
+            check_same_thread=False,  # Guarded by self._lock
+            isolation_level=None,     # Autocommit, each statement is its own transaction
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table_name} ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            f" last_access REAL NOT NULL{self.extra_columns})"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_access ON {self.table_name} (last_access)"
+        )
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove every cached entry and reset the counters."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table_name}")
+            self._conn.execute("VACUUM")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Report cache usage.
+
+        Returns:
+            dict: Number of entries, stored bytes, hit/miss counters and hit rate.
+        """
+        with self._lock:
+            entries, total = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table_name}"
+            ).fetchone()
+            hits, misses = self.hits, self.misses
+        n_lookups = hits + misses
+        return {
+            "entries": entries,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / n_lookups if n_lookups else 0.0,
+        }
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the size cap is respected. Caller holds the lock."""
+        if self.max_bytes <= 0:
+            return
+        total = self._conn.execute(
+            f"SELECT COALESCE(SUM(size), 0) FROM {self.table_name}"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        to_free = total - self.max_bytes
+        stale_keys = []
+        for key, size in self._conn.execute(
+            f"SELECT key, size FROM {self.table_name} ORDER BY last_access ASC"
+        ):
+            stale_keys.append((key,))
+            to_free -= size
+            if to_free <= 0:
+                break
+        self._conn.executemany(f"DELETE FROM {self.table_name} WHERE key = ?", stale_keys)
+
+
+#######################################
+# LLM RESPONSE CACHE
+# SQLite-backed response cache plugged into LangChain chat models via `cache=`
+#######################################
+
+#######################################
+# Build content-addressed key for a cached LLM call
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   llm_string (str): Serialized model parameters (model name, temperature, ...)
+#   prompt (str): Serialized rendered messages
+# Returns:
+#   str: Hex SHA-256 digest identifying the call
+#######################################
+def make_cache_key(llm_string: str, prompt: str) -> str:
+    """
+    Build the content-addressed key of an LLM call.
+
+    LangChain passes the serialized model parameters as `llm_string` (it contains the
+    model name, temperature and the other invocation parameters) and the serialized
+    rendered messages as `prompt`. Hashing both gives a key that changes whenever the
+    model, its sampling settings or any message content changes.
+
+    Args:
+        llm_string (str): Serialized model parameters provided by LangChain.
+        prompt (str): Serialized rendered messages provided by LangChain.
+
+    Returns:
+        str: Hex SHA-256 digest identifying the call.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(llm_string.encode("utf-8"))
+    hasher.update(b"\x00")
+    hasher.update(prompt.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+class SQLiteLLMCache(SQLiteCacheStore, BaseCache):
+    """
+    Persistent LLM response cache stored in a single SQLite file.
+
+    Entries are keyed by `make_cache_key` and evicted in least-recently-used order
+    once the total stored size exceeds `max_bytes`.
+
+    The cache is safe to share between threads and between every model created by
+    `initial_chatmodel` / `setup_LLMs`; since the key contains the model parameters,
+    responses of different models never collide.
+    """
+
+    table_name = "llm_cache"
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[list]:
+        """
+        Look up cached generations for a call.
+
+        Args:
+            prompt (str): Serialized rendered messages.
+            llm_string (str): Serialized model parameters.
+
+        Returns:
+            Optional[list]: Cached generations, or None on a miss.
+        """
+        key = make_cache_key(llm_string, prompt)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+        try:
+            return [loads(gen) for gen in json.loads(row[0])]
+        except Exception:
+            # Entry written by an incompatible LangChain version, treat as a miss
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        """
+        Store the generations of a call and evict old entries if over the size cap.
+
+        Args:
+            prompt (str): Serialized rendered messages.
+            llm_string (str): Serialized model parameters.
+            return_val (Sequence[Any]): Generations returned by the model.
+        """
+        key = make_cache_key(llm_string, prompt)
+        value = json.dumps([dumps(gen) for gen in return_val])
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._evict()
+
+
+#######################################
+# WEB PAGE CACHE
+# URL-keyed store of extracted page text, gzip-compressed, with TTL and HTTP validators
+#######################################
+
+class WebPageCache(SQLiteCacheStore):
+    """
+    Persistent cache of extracted web page text keyed by URL.
+
+    Text is stored gzip-compressed together with the ETag / Last-Modified validators
+    of the page, so an expired entry can be revalidated with a cheap conditional
+    request instead of a full crawl. Entries are evicted in least-recently-used
+    order once the compressed size exceeds `max_bytes`.
+    """
+
+    table_name = "web_cache"
+    extra_columns = ", etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL"
+
+    def __init__(
+            self,
+            database_path: str,
+            ttl: float = 7 * 24 * 3600,
+            max_bytes: int = 1024 * 1024 * 1024,
+            ):
+        """
+        Open (or create) the web page cache.
+
+        Args:
+            database_path (str): Path of the SQLite file. Parent directories are created.
+            ttl (float, optional): Seconds after which an entry must be revalidated.
+                                   Defaults to one week.
+            max_bytes (int, optional): Size cap of compressed pages in bytes.
+        """
+        super().__init__(database_path, max_bytes)
+        self.ttl = float(ttl)
+
+    def get(self, url: str) -> Optional[dict]:
+        """
+        Look up a cached page.
+
+        Args:
+            url (str): Page URL (or any other key stored with `put`).
+
+        Returns:
+            Optional[dict]: None on a miss, otherwise a dict with 'content', 'etag',
+                            'last_modified', 'fetched_at' and 'expired' (True once the
+                            entry is older than the TTL).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, etag, last_modified, fetched_at FROM web_cache WHERE key = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE web_cache SET last_access = ? WHERE key = ?", (time.time(), url)
+            )
+            self.hits += 1
+        value, etag, last_modified, fetched_at = row
+        return {
+            "content": gzip.decompress(value).decode("utf-8"),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+            "expired": time.time() - fetched_at > self.ttl,
+        }
+
+    def put(
+            self,
+            url: str,
+            content: str,
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None,
+            ) -> None:
+        """
+        Store the extracted text of a page and evict old entries if over the size cap.
+
+        Args:
+            url (str): Page URL (or any other key).
+            content (str): Extracted page text.
+            etag (str, optional): ETag header returned by the server.
+            last_modified (str, optional): Last-Modified header returned by the server.
+        """
+        value = gzip.compress(content.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO web_cache"
+                " (key, value, size, last_access, etag, last_modified, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, value, len(value), now, etag, last_modified, now),
+            )
+            self._evict()
+
+    def touch(self, url: str) -> None:
+        """
+        Mark a page as fresh again after a successful revalidation.
+
+        Args:
+            url (str): Page URL.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE web_cache SET fetched_at = ? WHERE key = ?", (time.time(), url)
+            )
+
+
+#######################################
+# EMBEDDING CACHE
+# Persistent embedding vectors keyed by model name and text hash, with batched misses
+#######################################
+
+class EmbeddingCache(SQLiteCacheStore):
+    """
+    Persistent store of embedding vectors keyed by model name, embedding kind
+    (document or query) and the SHA-256 of the text. Vectors are stored as raw
+    float32 bytes.
+    """
+
+    table_name = "embedding_cache"
+
+    @staticmethod
+    def make_key(model: str, kind: str, text: str) -> str:
+        """Build the key of one embedded text."""
+        return model + ":" + kind + ":" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict:
+        """
+        Look up several embeddings at once.
+
+        Args:
+            keys (list[str]): Keys built with make_key.
+
+        Returns:
+            dict: Mapping from found key to its vector (list of floats).
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(unique_keys), 500):  # Stay under SQLite's variable limit
+                chunk = unique_keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, value in self._conn.execute(
+                    f"SELECT key, value FROM embedding_cache WHERE key IN ({marks})", chunk
+                ):
+                    found[key] = np.frombuffer(value, dtype=np.float32).tolist()
+                self._conn.execute(
+                    f"UPDATE embedding_cache SET last_access = ? WHERE key IN ({marks})", [now] + chunk
+                )
+            self.hits += len(found)
+            self.misses += len(unique_keys) - len(found)
+        return found
+
+    def put_many(self, items: dict) -> None:
+        """
+        Store several embeddings and evict old entries if over the size cap.
+
+        Args:
+            items (dict): Mapping from key to vector.
+        """
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            value = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((key, value, len(value), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding model wrapper that serves repeated texts from an EmbeddingCache and
+    sends the remaining texts to the wrapped model in batches of `batch_size`.
+
+    Rebuilding RefCodeDB after editing a few rows therefore only embeds the
+    changed rows, and repeated retrievals of the same task description do not
+    call the embedding API again.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, batch_size: int = 10):
+        """
+        Wrap an embedding model.
+
+        Args:
+            embeddings (Embeddings): The LangChain embedding model to wrap.
+            cache (EmbeddingCache): Store for computed vectors.
+            batch_size (int, optional): Texts per embedding request. Defaults to 10.
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.batch_size = max(1, int(batch_size))
+        # Model name, part of every key so vectors of different models never mix
+        self.model = str(getattr(embeddings, "model", type(embeddings).__name__))
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed documents, computing only those not cached yet, in batches.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            list[list[float]]: One vector per text, in input order.
+        """
+        keys = [EmbeddingCache.make_key(self.model, "doc", text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        # Unique texts still to embed, in first-seen order
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        missing_keys = list(missing.keys())
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start:start + self.batch_size]
+            vectors = self.embeddings.embed_documents([missing[key] for key in batch_keys])
+            new_items = dict(zip(batch_keys, vectors))
+            self.cache.put_many(new_items)
+            found.update(new_items)
+
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embed a query, reusing the cached vector of an identical earlier query.
+
+        Args:
+            text (str): Query text.
+
+        Returns:
+            list[float]: Query vector.
+        """
+        key = EmbeddingCache.make_key(self.model, "query", text)
+        found = self.cache.get_many([key])
+        if key in found:
+            return found[key]
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many({key: vector})
+        return list(vector)
+
+
+#######################################
+# SHARED CACHE INSTANCES
+# Process-wide caches created lazily from cache_config
+#######################################
+
+_LLM_CACHE: Optional[SQLiteLLMCache] = None
+_WEB_CACHE: Optional[WebPageCache] = None
+_EMBED_CACHE: Optional[EmbeddingCache] = None
+_CACHE_LOCK = threading.Lock()
+
+#######################################
+# Get the shared LLM response cache
+# Globals:
+#   cache_config (read for cache switch, path and size cap)
+#   _LLM_CACHE (created on first call)
+# Arguments:
+#   None (uses global configuration)
+# Returns:
+#   Optional[SQLiteLLMCache]: Shared cache, or None when caching is disabled
+#######################################
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """
+    Return the process-wide LLM response cache.
+
+    The cache is created lazily from `cache_config` so YAML configuration loaded with
+    `load_yaml_config` is honoured. Pass the result as `cache=` when building chat models.
+
+    Returns:
+        Optional[SQLiteLLMCache]: The shared cache, or None if `cache_config.LLM_CACHE`
+                                  is disabled or the cache file cannot be opened.
+    """
+    global _LLM_CACHE
+    if not cache_config.LLM_CACHE:
+        return None
+    with _CACHE_LOCK:
+        if _LLM_CACHE is None:
+            try:
+                _LLM_CACHE = SQLiteLLMCache(
+                    database_path=os.path.join(cache_config.CACHE_DIR, cache_config.LLM_CACHE_FILE),
+                    max_bytes=int(cache_config.LLM_CACHE_MAX_MB) * 1024 * 1024,
+                )
+            except Exception as e:
+                # Graceful degradation - models still work without a cache
+                print(f"Warning: Failed to open LLM response cache: {e}")
+                return None
+    return _LLM_CACHE
+
+#######################################
+# Get the shared web page cache
+# Globals:
+#   cache_config (read for cache switch, path, TTL and size cap)
+#   _WEB_CACHE (created on first call)
+# Arguments:
+#   None (uses global configuration)
+# Returns:
+#   Optional[WebPageCache]: Shared cache, or None when caching is disabled
+#######################################
+def get_web_cache() -> Optional[WebPageCache]:
+    """
+    Return the process-wide web page cache used by `webcontent_str_loader`.
+
+    Returns:
+        Optional[WebPageCache]: The shared cache, or None if `cache_config.WEB_CACHE`
+                                is disabled or the cache file cannot be opened.
+    """
+    global _WEB_CACHE
+    if not cache_config.WEB_CACHE:
+        return None
+    with _CACHE_LOCK:
+        if _WEB_CACHE is None:
+            try:
+                _WEB_CACHE = WebPageCache(
+                    database_path=os.path.join(cache_config.CACHE_DIR, cache_config.WEB_CACHE_FILE),
+                    ttl=float(cache_config.WEB_CACHE_TTL_HOURS) * 3600,
+                    max_bytes=int(cache_config.WEB_CACHE_MAX_MB) * 1024 * 1024,
+                )
+            except Exception as e:
+                # Graceful degradation - pages are crawled without a cache
+                print(f"Warning: Failed to open web page cache: {e}")
+                return None
+    return _WEB_CACHE
+
+#######################################
+# Wrap an embedding model with the shared embedding cache
+# Globals:
+#   cache_config (read for cache switch, path and size cap)
+#   llm_config (read for embedding batch size)
+#   _EMBED_CACHE (created on first call)
+# Arguments:
+#   embeddings: LangChain embedding model to wrap
+# Returns:
+#   Embeddings: Cached wrapper, or the model itself when caching is disabled
+#######################################
+def get_cached_embeddings(embeddings):
+    """
+    Wrap an embedding model with the process-wide embedding cache.
+
+    Args:
+        embeddings: LangChain embedding model, or None.
+
+    Returns:
+        Embeddings: A CachedEmbeddings wrapper batching requests by
+                    llm_config.EMBED_BATCH_SIZE, or the model unchanged if it is None,
+                    already wrapped, `cache_config.EMBED_CACHE` is disabled or the
+                    cache file cannot be opened.
+    """
+    global _EMBED_CACHE
+    if embeddings is None or isinstance(embeddings, CachedEmbeddings) or not cache_config.EMBED_CACHE:
+        return embeddings
+    with _CACHE_LOCK:
+        if _EMBED_CACHE is None:
+            try:
+                _EMBED_CACHE = EmbeddingCache(
+                    database_path=os.path.join(cache_config.CACHE_DIR, cache_config.EMBED_CACHE_FILE),
+                    max_bytes=int(cache_config.EMBED_CACHE_MAX_MB) * 1024 * 1024,
+                )
+            except Exception as e:
+                # Graceful degradation - embeddings are computed without a cache
+                print(f"Warning: Failed to open embedding cache: {e}")
+                return embeddings
+    return CachedEmbeddings(embeddings, _EMBED_CACHE, batch_size=llm_config.EMBED_BATCH_SIZE)
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder Checkpoints
+# Durable LangGraph checkpoints in a single SQLite file, so a crashed or failed run can
+# be resumed from its last completed node (GhostCoder.resume) instead of repeating the
+# retrieval, crawls and LLM calls before it. Checkpoints stay compact: channel values
+# are stored once per version, large values (crawled pages, reference code) by reference
+# in a compressed, content-addressed table, and list channels that grow by appending
+# (code history, execution outputs) store each item once.
+
+import os
+import json
+import zlib
+import random
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from ghostcoder.config import cache_config
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS
+
+# Serialized values from this size on are stored by reference, compressed
+REF_MIN_BYTES = 1024
+# Schema version (PRAGMA user_version), 1 added the content_refs table
+SCHEMA_VERSION = 1
+
+#######################################
+# SQLITE CHECKPOINT SAVER
+#######################################
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpoint saver backed by one SQLite file.
+
+    Follows the storage layout of LangGraph's in-memory saver: a checkpoint row
+    holds the channel versions, and every channel value is stored once per
+    version, so a step only writes the channels it changed. Serialized values of
+    REF_MIN_BYTES or more are stored once per content (zlib-compressed, shared by
+    every thread), and non-empty lists item by item, so appending to a history
+    list adds one item instead of a new copy of the list. The threads using each
+    content are indexed, so deleting a thread only checks its own contents.
+
+    Instances are safe to share between threads; the async methods run the SQLite
+    calls in a worker thread.
+    """
+
+    def __init__(self, database_path: str, *, serde: Any = None):
+        """
+        Open (or create) the checkpoint database.
+
+        Args:
+            database_path (str): Path of the SQLite file. Parent directories are created.
+            serde (SerializerProtocol, optional): Value serializer. Defaults to
+                                                  LangGraph's JsonPlusSerializer.
+        """
+        super().__init__(serde=serde)
+        self.database_path = os.path.abspath(database_path)
+        self._lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(self.database_path), exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.database_path,
+            check_same_thread=False,  # Guarded by self._lock
+            isolation_level=None,     # Autocommit, multi-statement updates use _transaction
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,"
+            " parent_checkpoint_id TEXT, checkpoint_type TEXT NOT NULL, checkpoint BLOB NOT NULL,"
+            " metadata_type TEXT NOT NULL, metadata BLOB NOT NULL,"
+            " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));"
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL,"
+            " version TEXT NOT NULL, type TEXT NOT NULL, value BLOB,"
+            " PRIMARY KEY (thread_id, checkpoint_ns, channel, version));"
+            "CREATE TABLE IF NOT EXISTS writes ("
+            " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,"
+            " task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL,"
+            " type TEXT NOT NULL, value BLOB, task_path TEXT NOT NULL DEFAULT '',"
+            " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));"
+            "CREATE TABLE IF NOT EXISTS contents ("
+            " hash TEXT PRIMARY KEY, type TEXT NOT NULL, data BLOB NOT NULL, compressed INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS content_refs ("
+            " thread_id TEXT NOT NULL, hash TEXT NOT NULL, PRIMARY KEY (thread_id, hash));"
+            "CREATE INDEX IF NOT EXISTS content_refs_hash ON content_refs (hash);"
+        )
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._index_content_refs()
+
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements atomically, holding the lock."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _index_content_refs(self) -> None:
+        """Index the contents used by every thread, once for databases written before content_refs."""
+        with self._transaction() as conn:
+            for table in ("blobs", "writes"):
+                for thread_id, type_, value in conn.execute(
+                    f"SELECT thread_id, type, value FROM {table} WHERE type IN ('ref', 'ref_list')"
+                ).fetchall():
+                    digests = json.loads(value) if type_ == "ref_list" else [value.decode("utf-8")]
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO content_refs VALUES (?, ?)",
+                        [(thread_id, digest) for digest in digests],
+                    )
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    #----------------
+    # Value storage
+    #----------------
+
+    def _put_content(self, thread_id: str, type_: str, data: bytes) -> str:
+        """Store a serialized value once per content, used by thread_id, and return its hash. Caller holds the lock."""
+        digest = hashlib.sha256(type_.encode("utf-8") + b"\x00" + data).hexdigest()
+        packed = zlib.compress(data, 6) if len(data) >= REF_MIN_BYTES else data
+        compressed = len(packed) < len(data)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO contents (hash, type, data, compressed) VALUES (?, ?, ?, ?)",
+            (digest, type_, packed if compressed else data, int(compressed)),
+        )
+        self._conn.execute("INSERT OR IGNORE INTO content_refs VALUES (?, ?)", (thread_id, digest))
+        return digest
+
+    def _get_content(self, digest: str) -> Any:
+        """Load a value stored by _put_content. Caller holds the lock."""
+        type_, data, compressed = self._conn.execute(
+            "SELECT type, data, compressed FROM contents WHERE hash = ?", (digest,)
+        ).fetchone()
+        return self.serde.loads_typed((type_, zlib.decompress(data) if compressed else data))
+
+    def _dump(self, thread_id: str, value: Any) -> tuple[str, bytes]:
+        """Serialize a value of a thread, storing large ones by reference. Caller holds the lock."""
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) < REF_MIN_BYTES:
+            return type_, data
+        if isinstance(value, list):
+            refs = [self._put_content(thread_id, *self.serde.dumps_typed(item)) for item in value]
+            return "ref_list", json.dumps(refs).encode("utf-8")
+        return "ref", self._put_content(thread_id, type_, data).encode("utf-8")
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        """Deserialize a value written by _dump. Caller holds the lock."""
+        if type_ == "ref":
+            return self._get_content(data.decode("utf-8"))
+        if type_ == "ref_list":
+            return [self._get_content(digest) for digest in json.loads(data)]
+        return self.serde.loads_typed((type_, data))
+
+    #----------------
+    # Reads
+    #----------------
+
+    def _load_tuple(self, row: tuple) -> CheckpointTuple:
+        """Build the checkpoint tuple of a checkpoints row. Caller holds the lock."""
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, c_type, c_data, m_type, m_data = row
+        checkpoint = self.serde.loads_typed((c_type, c_data))
+
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = self._conn.execute(
+                "SELECT type, value FROM blobs"
+                " WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if blob is not None and blob[0] != "empty":
+                channel_values[channel] = self._load(*blob)
+
+        pending_writes = [
+            (task_id, channel, self._load(type_, value))
+            for task_id, channel, type_, value in self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes"
+                " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+                " ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        ]
+        # Sends of the parent step, restored for checkpoint formats that keep them apart
+        pending_sends = []
+        if parent_id:
+            pending_sends = [
+                self._load(type_, value)
+                for type_, value in self._conn.execute(
+                    "SELECT type, value FROM writes"
+                    " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND channel = ?"
+                    " ORDER BY task_path, task_id, idx",
+                    (thread_id, checkpoint_ns, parent_id, TASKS),
+                )
+            ]
+
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint={**checkpoint, "channel_values": channel_values, "pending_sends": pending_sends},
+            metadata=self.serde.loads_typed((m_type, m_data)),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=pending_writes,
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Get a checkpoint tuple: the given checkpoint_id, else the latest of the thread.
+
+        Args:
+            config (RunnableConfig): Config with thread_id, optionally checkpoint_ns and checkpoint_id.
+
+        Returns:
+            Optional[CheckpointTuple]: The checkpoint tuple, or None if there is none.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        params = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            # Checkpoint ids are time-ordered
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            return self._load_tuple(row) if row is not None else None
+
+    def list(
+            self,
+            config: Optional[RunnableConfig],
+            *,
+            filter: Optional[dict[str, Any]] = None,
+            before: Optional[RunnableConfig] = None,
+            limit: Optional[int] = None,
+            ) -> Iterator[CheckpointTuple]:
+        """
+        List checkpoints, newest first.
+
+        Args:
+            config (RunnableConfig, optional): Restricts to a thread (and namespace, checkpoint id).
+            filter (dict, optional): Metadata values the checkpoints must have.
+            before (RunnableConfig, optional): Only checkpoints older than this one.
+            limit (int, optional): Maximum number of checkpoints.
+
+        Yields:
+            CheckpointTuple: Matching checkpoint tuples.
+        """
+        query, params = "SELECT * FROM checkpoints WHERE 1 = 1", []
+        if config is not None:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        n_found = 0
+        for row in rows:
+            if limit is not None and n_found >= limit:
+                break
+            with self._lock:
+                checkpoint_tuple = self._load_tuple(row)
+            if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            n_found += 1
+            yield checkpoint_tuple
+
+    #----------------
+    # Writes
+    #----------------
+
+    def put(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions,
+            ) -> RunnableConfig:
+        """
+        Save a checkpoint and the channel values that changed in its step.
+
+        Args:
+            config (RunnableConfig): Config of the parent checkpoint.
+            checkpoint (Checkpoint): Checkpoint to save.
+            metadata (CheckpointMetadata): Checkpoint metadata.
+            new_versions (ChannelVersions): Channels updated in this step and their new versions.
+
+        Returns:
+            RunnableConfig: Config pointing to the saved checkpoint.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)
+        values = c.pop("channel_values")
+
+        with self._transaction() as conn:
+            for channel, version in new_versions.items():
+                type_, data = self._dump(thread_id, values[channel]) if channel in values else ("empty", None)
+                conn.execute(
+                    "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, channel, str(version), type_, data),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),  # parent
+                    *self.serde.dumps_typed(c),
+                    *self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+                ),
+            )
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[tuple[str, Any]],
+            task_id: str,
+            task_path: str = "",
+            ) -> None:
+        """
+        Save the writes of a task, kept until the step's checkpoint is saved.
+
+        Args:
+            config (RunnableConfig): Config of the checkpoint the task runs on.
+            writes (Sequence[tuple[str, Any]]): (channel, value) writes.
+            task_id (str): Task id.
+            task_path (str, optional): Task path. Defaults to "".
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._transaction() as conn:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                # Special writes (errors, interrupts) replace earlier ones, regular writes are kept
+                verb = "INSERT OR REPLACE" if write_idx < 0 else "INSERT OR IGNORE"
+                conn.execute(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel,
+                     *self._dump(thread_id, value), task_path),
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """
+        Delete every checkpoint and write of a thread, and the contents no other thread uses.
+
+        Only the thread's own contents are checked, with indexed lookups, so the cost
+        grows with the size of the thread and not with the whole checkpoint history.
+
+        Args:
+            thread_id (str): Thread to delete.
+        """
+        with self._transaction() as conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            digests = [digest for (digest,) in conn.execute(
+                "SELECT hash FROM content_refs WHERE thread_id = ?", (thread_id,)
+            )]
+            conn.execute("DELETE FROM content_refs WHERE thread_id = ?", (thread_id,))
+            conn.executemany(
+                "DELETE FROM contents WHERE hash = ?"
+                " AND NOT EXISTS (SELECT 1 FROM content_refs WHERE hash = ?)",
+                [(digest, digest) for digest in digests],
+            )
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        """Next channel version, a sortable string as used by LangGraph's own savers."""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    #----------------
+    # Async interface, SQLite calls run in a worker thread
+    #----------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+            self,
+            config: Optional[RunnableConfig],
+            *,
+            filter: Optional[dict[str, Any]] = None,
+            before: Optional[RunnableConfig] = None,
+            limit: Optional[int] = None,
+            ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: [*self.list(config, filter=filter, before=before, limit=limit)]
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions,
+            ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[tuple[str, Any]],
+            task_id: str,
+            task_path: str = "",
+            ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+#######################################
+# SHARED CHECKPOINTER
+#######################################
+
+_CHECKPOINTER: Optional[SQLiteCheckpointSaver] = None
+_CHECKPOINTER_LOCK = threading.Lock()
+
+#######################################
+# Get the shared checkpoint saver
+# Globals:
+#   cache_config (read for checkpoint switch and path)
+#   _CHECKPOINTER (created on first call)
+# Arguments:
+#   None (uses global configuration)
+# Returns:
+#   Optional[SQLiteCheckpointSaver]: Shared saver, or None when checkpoints are disabled
+#######################################
+def get_checkpointer() -> Optional[SQLiteCheckpointSaver]:
+    """
+    Return the process-wide durable checkpoint saver.
+
+    Created lazily from `cache_config` (CACHE_DIR/CHECKPOINT_FILE), and shared so that
+    agents using it keep sharing their compiled graphs.
+
+    Returns:
+        Optional[SQLiteCheckpointSaver]: The shared saver, or None if
+                                         `cache_config.CHECKPOINTS` is disabled or
+                                         the database cannot be opened.
+    """
+    global _CHECKPOINTER
+    if not cache_config.CHECKPOINTS:
+        return None
+    with _CHECKPOINTER_LOCK:
+        if _CHECKPOINTER is None:
+            try:
+                _CHECKPOINTER = SQLiteCheckpointSaver(
+                    os.path.join(cache_config.CACHE_DIR, cache_config.CHECKPOINT_FILE)
+                )
+            except Exception as e:
+                # Graceful degradation - runs work without checkpoints, but can't be resumed
+                print(f"Warning: Failed to open checkpoint database: {e}")
+                return None
+    return _CHECKPOINTER
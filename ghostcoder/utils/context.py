@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder Run Context
+# Per-run settings (session and task ids, task directories, execution mode) travel
+# with each graph run in the LangGraph config, under configurable["run_context"],
+# instead of being written to the module-level config classes. The config classes
+# only provide the defaults, so runs in one process don't overwrite each other.
+
+import os
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from ghostcoder.config import ghostcoder_config, file_config, coder_config
+
+# Key of the run context in the LangGraph config["configurable"]
+RUN_CONTEXT_KEY = "run_context"
+
+#######################################
+# RUN CONTEXT
+#######################################
+
+@dataclass(frozen=True)
+class RunContext:
+    """
+    Immutable settings of one graph run.
+
+    Built from the config defaults by `RunContext.from_config`, passed to the graph
+    with `context.as_config()` and read back in nodes with `get_run_context(config)`.
+    Subgraphs invoked from a node inherit it with the rest of the config.
+    """
+    session_id: str
+    task_id: str
+    task_home: str
+    input_data_dir: str
+    data_dir: str
+    figure_dir: str
+    output_dir: str
+    execution_mode: str
+
+    @classmethod
+    def from_config(
+            cls,
+            session_id: Optional[str] = None,
+            task_id: Optional[str] = None,
+            task_home: Optional[str] = None,
+            execution_mode: Optional[str] = None,
+            ) -> "RunContext":
+        """
+        Build a run context, filling what is not given from the config defaults.
+
+        Args:
+            session_id (str, optional): Defaults to ghostcoder_config.SESSION_ID.
+            task_id (str, optional): Defaults to ghostcoder_config.TASK_ID.
+            task_home (str, optional): Task dir. Defaults to
+                                       <WORK_HOME or cwd>/<session_id>/<task_id>.
+            execution_mode (str, optional): "command" or "kernel". Defaults to
+                                            coder_config.EXECUTION_MODE.
+
+        Returns:
+            RunContext: The run context.
+        """
+        session_id = session_id or ghostcoder_config.SESSION_ID
+        task_id = task_id or ghostcoder_config.TASK_ID
+        # WORK_HOME is the root of all task dirs, as in GhostCoder.run_many
+        task_home = task_home or os.path.join(file_config.WORK_HOME or os.getcwd(), session_id, task_id)
+        # Sub dir names, also when set_up_workdirs made the configured ones absolute
+        return cls(
+            session_id = session_id,
+            task_id = task_id,
+            task_home = task_home,
+            input_data_dir = os.path.abspath(file_config.INPUT_DATA_DIR or 'data'),
+            data_dir = os.path.join(task_home, os.path.basename(file_config.DATA_DIR)),
+            figure_dir = os.path.join(task_home, os.path.basename(file_config.FIGURE_DIR)),
+            output_dir = os.path.join(task_home, os.path.basename(file_config.OUTPUT_DIR)),
+            execution_mode = execution_mode or coder_config.EXECUTION_MODE,
+        )
+
+    def task_dirs(self) -> dict:
+        """Task dirs in the env profiles format ('task_home', 'data_dir', 'figure_dir', 'output_dir')."""
+        return {
+            "task_home": self.task_home,
+            "data_dir": self.data_dir,
+            "figure_dir": self.figure_dir,
+            "output_dir": self.output_dir,
+        }
+
+    def thread_id(self) -> str:
+        """Checkpoint thread of the run, <session_id>/<task_id>."""
+        return self.session_id + "/" + self.task_id
+
+    def as_config(self, **configurable) -> dict:
+        """
+        LangGraph config carrying this context and the run's checkpoint thread.
+
+        Args:
+            **configurable: Extra configurable values.
+
+        Returns:
+            dict: {"configurable": {"run_context": ..., "thread_id": ..., **configurable}}
+        """
+        return {"configurable": {RUN_CONTEXT_KEY: self, "thread_id": self.thread_id(), **configurable}}
+
+    def replace(self, **changes) -> "RunContext":
+        """Copy of the context with some fields changed."""
+        return replace(self, **changes)
+
+#######################################
+# Get the run context of a graph run
+# Globals:
+#   None (defaults come from RunContext.from_config)
+# Arguments:
+#   config (dict): LangGraph config of the running node
+#   **defaults: from_config arguments used when the run has no context
+# Returns:
+#   RunContext: The run context
+#######################################
+def get_run_context(config: Optional[dict] = None, **defaults) -> RunContext:
+    """
+    Return the run context passed with the graph config.
+
+    Runs started without one (e.g. a subgraph invoked directly) get a context
+    built from the config defaults and the given values.
+
+    Args:
+        config (dict, optional): The `config` argument of the node.
+        **defaults: session_id, task_id, task_home or execution_mode for a new
+                    context, None values are ignored.
+
+    Returns:
+        RunContext: The run context.
+    """
+    context = ((config or {}).get("configurable") or {}).get(RUN_CONTEXT_KEY)
+    if isinstance(context, RunContext):
+        return context
+    return RunContext.from_config(**{k: v for k, v in defaults.items() if v})
@@ -6,11 +6,22 @@
 # for bioinformatics analysis workflows.
 
 import os
+import re
+import json
+import atexit
+import shutil
+import time
+import uuid
 import pickle
 import inspect
+import reprlib
+import threading
+import numpy as np
 import pandas as pd
 from anndata._core.anndata import AnnData
 
+from ghostcoder.config import file_config, ghostcoder_config
+
 #######################################
 # LEGACY CODE - DEPRECATED
 # This is the original implementation of permanent_input_vars
@@ -58,65 +69,391 @@ from anndata._core.anndata import AnnData
 
 
 #######################################
-# Persist variables to temporary pickle file
+# INPUT VARIABLE PERSISTENCE
+# Input variables are written with a fast path per type (h5ad/zarr for AnnData,
+# Parquet for DataFrames, .npy for arrays, pickle as fallback) into a per-session
+# directory, described by a JSON manifest (see load_input_vars). Directories are
+# removed when the process exits, and stale ones left by crashed processes are
+# pruned after file_config.INPUT_PERSIST_TTL_HOURS
+#######################################
+
+INPUT_MANIFEST_FILE = "manifest.json"
+INPUT_DIR_PREFIX = "inputs_"
+
+# Input directories created by this process, removed at exit
+_INPUT_DIRS = set()
+_INPUT_DIRS_LOCK = threading.Lock()
+
+#######################################
+# Persist variables to a per-session directory
 # Globals:
-#   None (uses local variables only)
+#   file_config (read for persistence directory and AnnData format)
+#   ghostcoder_config (read for session ID)
 # Arguments:
-#   variables (list): List of Python objects to serialize and save
+#   variables (list): List of Python objects to save
+#   var_names (list, optional): Names of the variables
+#   persist_dir (str, optional): Target directory
 # Returns:
-#   str: Absolute path to the created pickle file
+#   str: Absolute path to the manifest file
 # Raises:
 #   OSError: If directory creation or file writing fails
 #######################################
-def permanent_input_vars(variables: list) -> str:
+def permanent_input_vars(variables: list, var_names: list = None, persist_dir: str = "") -> str:
     """
-    Saves the given list of variables to a pickle file in a temporary directory.
+    Saves the given variables to a per-session directory, one file per variable.
     
-    This function creates a 'temp' directory in the current working directory if it doesn't exist,
-    and saves the list of variables to a file named 'input_vars.pkl' in that directory.
-    Used primarily for persisting analysis input variables across different execution contexts.
+    Each variable is written in the fastest format for its type, and a manifest
+    describing the files is written next to them:
+    - AnnData: the original file is referenced without copying when the object is
+      backed, otherwise it is written as .h5ad (or .zarr, file_config.INPUT_ANNDATA_FORMAT)
+    - DataFrame: Parquet (pyarrow) if it can store the columns, pickle otherwise
+    - numpy array (not object dtype): .npy, which can be memory-mapped
+    - anything else: pickle
+    
+    Every call gets its own directory under temp/<session id>/ (or under
+    file_config.INPUT_PERSIST_DIR), so concurrent runs do not overwrite each other.
+    It is removed when the process exits, or earlier with cleanup_input_vars. Input
+    directories left by processes that did not exit cleanly are pruned when a new
+    one is created, once older than file_config.INPUT_PERSIST_TTL_HOURS. A given
+    persist_dir is left to the caller.
     
     Parameters:
     variables (list): The list of variables to save. Can contain any picklable Python objects
                      including pandas DataFrames, AnnData objects, and basic data types.
+    var_names (list, optional): Names of the variables, used in the manifest and the
+                               file names. Defaults to var_0, var_1, ...
+    persist_dir (str, optional): Directory to write to, created if needed.
+                                Defaults to a new per-session directory.
     
     Returns:
-    str: The absolute path to the created pickle file.
+    str: The absolute path to the manifest file, see load_input_vars.
     
     Raises:
-    OSError: If the temporary directory cannot be created or the file cannot be written.
+    OSError: If the directory cannot be created or a file cannot be written.
     """
+    var_names = var_names or [f"var_{i}" for i in range(len(variables))]
 
-    # Create a temporary directory to store the pickle file if it doesn't exist
-    # Using current working directory as base to ensure accessibility
-    current_dir = os.getcwd()
-    temp_dir = os.path.join(current_dir, 'temp')
-    if not os.path.exists(temp_dir):
-        os.mkdir(temp_dir)
-    
-    # Define the path for the pickle file
-    # Using standardized filename for consistency across the application
-    pickle_file_path = os.path.join(temp_dir, 'input_vars.pkl')
-    
-    # Save the list of variables to the pickle file using binary mode
-    # This preserves all Python object types including complex scientific data structures
-    with open(pickle_file_path, 'wb') as f:
-        pickle.dump(variables, f)
+    # Create a fresh directory per call, grouped by session
+    if not persist_dir:
+        base_dir = file_config.INPUT_PERSIST_DIR or os.path.join(os.getcwd(), 'temp')
+        _prune_stale_input_dirs(base_dir)
+        persist_dir = os.path.join(
+            base_dir, ghostcoder_config.SESSION_ID or "session",
+            INPUT_DIR_PREFIX + str(os.getpid()) + "_" + uuid.uuid4().hex[:12]
+            )
+        with _INPUT_DIRS_LOCK:
+            _INPUT_DIRS.add(os.path.abspath(persist_dir))
+    os.makedirs(persist_dir, exist_ok=True)
+
+    entries = []
+    for i, (value, name) in enumerate(zip(variables, var_names)):
+        # Index prefix keeps duplicate names (e.g. "unknown") apart
+        stem = os.path.join(persist_dir, f"{i:02d}_" + re.sub(r"[^\w.-]", "_", str(name)))
+        entry = {"name": name, "type": type(value).__name__}
+        entry.update(_persist_variable(value, stem))
+        entries.append(entry)
+
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "session_id": ghostcoder_config.SESSION_ID,
+        "variables": entries,
+    }
+    manifest_path = os.path.abspath(os.path.join(persist_dir, INPUT_MANIFEST_FILE))
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
     
     # Return the absolute path for use by other components
-    return pickle_file_path 
+    return manifest_path
+
+#######################################
+# Remove persisted input variables
+# Globals:
+#   _INPUT_DIRS (updated)
+# Arguments:
+#   manifest (str | dict): Manifest path or loaded manifest
+# Returns:
+#   None
+#######################################
+def cleanup_input_vars(manifest) -> None:
+    """
+    Remove the directory written by permanent_input_vars, once its variables are no
+    longer needed. Referenced files (backed AnnData inputs) live elsewhere and are kept.
+
+    Parameters:
+    manifest (str | dict): Path of the manifest file, or the manifest itself.
+    """
+    if isinstance(manifest, dict):
+        entries = [e for e in manifest["variables"] if not e.get("reference")]
+        if not entries:
+            return
+        persist_dir = os.path.dirname(entries[0]["path"])
+    else:
+        persist_dir = os.path.dirname(os.path.abspath(manifest))
+    shutil.rmtree(persist_dir, ignore_errors=True)
+    with _INPUT_DIRS_LOCK:
+        _INPUT_DIRS.discard(os.path.abspath(persist_dir))
+
+def _prune_stale_input_dirs(base_dir: str) -> None:
+    """Remove input directories under base_dir/<session> older than the configured TTL
+    whose process is gone."""
+    ttl_hours = file_config.INPUT_PERSIST_TTL_HOURS
+    if not ttl_hours or ttl_hours <= 0 or not os.path.isdir(base_dir):
+        return
+    expire_before = time.time() - ttl_hours * 3600
+    for session in os.scandir(base_dir):
+        if not session.is_dir():
+            continue
+        for entry in os.scandir(session.path):
+            try:
+                if (entry.name.startswith(INPUT_DIR_PREFIX) and entry.is_dir()
+                        and entry.stat().st_mtime < expire_before
+                        and not _process_alive(entry.name[len(INPUT_DIR_PREFIX):].split("_")[0])):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                pass
+
+def _process_alive(pid: str) -> bool:
+    """Whether the process that created an input directory is still running on this host."""
+    if not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass # Exists, owned by another user
+    return True
+
+@atexit.register
+def _remove_input_dirs() -> None:
+    """Remove the input directories created by this process."""
+    with _INPUT_DIRS_LOCK:
+        for persist_dir in _INPUT_DIRS:
+            shutil.rmtree(persist_dir, ignore_errors=True)
+        _INPUT_DIRS.clear()
 
+def _persist_variable(value, stem: str) -> dict:
+    """Write one variable with the fast path of its type, return its manifest fields."""
+    if isinstance(value, AnnData):
+        if value.isbacked and value.filename is not None:
+            # Already on disk, reference it instead of copying
+            return {"format": "h5ad", "path": os.path.abspath(str(value.filename)), "reference": True}
+        if file_config.INPUT_ANNDATA_FORMAT == "zarr":
+            value.write_zarr(stem + ".zarr")
+            return {"format": "zarr", "path": os.path.abspath(stem + ".zarr"), "reference": False}
+        value.write_h5ad(stem + ".h5ad")
+        return {"format": "h5ad", "path": os.path.abspath(stem + ".h5ad"), "reference": False}
+    if isinstance(value, pd.DataFrame):
+        try:
+            value.to_parquet(stem + ".parquet")
+            return {"format": "parquet", "path": os.path.abspath(stem + ".parquet"), "reference": False}
+        except Exception:
+            # No Parquet engine, or columns Parquet cannot store (e.g. mixed objects)
+            if os.path.exists(stem + ".parquet"):
+                os.remove(stem + ".parquet")
+    elif isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        np.save(stem + ".npy", value)
+        return {"format": "npy", "path": os.path.abspath(stem + ".npy"), "reference": False}
+
+    # Save any other variable using binary pickle mode
+    # This preserves all Python object types including complex scientific data structures
+    with open(stem + ".pkl", 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return {"format": "pickle", "path": os.path.abspath(stem + ".pkl"), "reference": False}
 
 #######################################
-# Generate comprehensive DataFrame description
+# Open persisted input variables
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   manifest (str | dict): Manifest path or loaded manifest
+#   lazy (bool): Open large data without loading it into memory
+# Returns:
+#   dict: Variable name -> value
+#######################################
+def load_input_vars(manifest, lazy: bool = True) -> dict:
+    """
+    Open the variables saved by permanent_input_vars.
+
+    With lazy, h5ad files are opened in backed read-only mode and .npy arrays are
+    memory-mapped. Zarr stores, Parquet tables and pickles are always read into
+    memory (anndata has no backed mode for zarr); keep file_config.INPUT_ANNDATA_FORMAT
+    at 'h5ad' for large AnnData inputs.
+
+    Parameters:
+    manifest (str | dict): Path of the manifest file, or the manifest itself.
+    lazy (bool): Open h5ad and .npy data without loading it. Defaults to True.
+
+    Returns:
+    dict: Variable values keyed by name, in manifest order. Duplicate names keep
+          the last variable.
+    """
+    if isinstance(manifest, str):
+        with open(manifest, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    variables = {}
+    for entry in manifest["variables"]:
+        path, fmt = entry["path"], entry["format"]
+        if fmt == "h5ad":
+            import anndata
+            variables[entry["name"]] = anndata.read_h5ad(path, backed='r' if lazy else None)
+        elif fmt == "zarr":
+            import anndata
+            # Eager, see above
+            variables[entry["name"]] = anndata.read_zarr(path)
+        elif fmt == "parquet":
+            variables[entry["name"]] = pd.read_parquet(path)
+        elif fmt == "npy":
+            variables[entry["name"]] = np.load(path, mmap_mode='r' if lazy else None)
+        else:
+            with open(path, 'rb') as f:
+                variables[entry["name"]] = pickle.load(f)
+    return variables
+
+
+#######################################
+# DATA OBSERVATION BUDGET
+# Observations are prompt material: statistics come from a bounded row sample,
+# wide schemas are truncated and the text is capped, so cost does not grow
+# with the number of cells or genes
+#######################################
+
+OBSERVATION_SAMPLE_ROWS = 10000 # Rows sampled for statistics and value counts
+OBSERVATION_MAX_COLUMNS = 30 # Column names listed per dtype group
+OBSERVATION_MAX_STATS_COLUMNS = 12 # Columns with summary statistics / sample rows
+OBSERVATION_MAX_CHARS = 12000 # Hard cap of a whole observation
+OBSERVATION_MAX_COLWIDTH = 40 # Characters per cell in printed rows
+
+# Short, bounded repr for variables that are not tables
+_OBSERVATION_REPR = reprlib.Repr()
+_OBSERVATION_REPR.maxlist = _OBSERVATION_REPR.maxtuple = _OBSERVATION_REPR.maxset = 50
+_OBSERVATION_REPR.maxdict = 50
+_OBSERVATION_REPR.maxstring = _OBSERVATION_REPR.maxother = 2000
+
+#######################################
+# Truncate text to a character budget
 # Globals:
 #   None (uses local variables only)
 # Arguments:
+#   text (str): Text to truncate
+#   max_chars (int): Character budget
+# Returns:
+#   str: Text of at most about max_chars characters
+#######################################
+def truncate_text(text: str, max_chars: int) -> str:
+    """
+    Cut a text to a character budget, noting how much was dropped.
+
+    Parameters:
+    text (str): Text to truncate.
+    max_chars (int): Maximum number of characters kept.
+
+    Returns:
+    str: The text itself if short enough, otherwise its first max_chars characters
+         followed by a truncation note.
+    """
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + f"\n... (truncated, {len(text) - max_chars} more characters)"
+
+#######################################
+# Sample rows of a DataFrame
+# Globals:
+#   OBSERVATION_SAMPLE_ROWS (default sample size)
+# Arguments:
+#   var (pd.DataFrame): DataFrame to sample
+#   n_rows (int): Sample size
+#   seed (int): Random seed
+# Returns:
+#   pd.DataFrame: Sampled rows in their original order
+#######################################
+def sample_rows(var: pd.DataFrame, n_rows: int = OBSERVATION_SAMPLE_ROWS, seed: int = 0) -> pd.DataFrame:
+    """
+    Draw a uniform random sample of rows, without replacement.
+
+    Equivalent to a reservoir sample over the rows, but the DataFrame is indexable,
+    so only the sampled positions are drawn (Floyd's algorithm in numpy), which
+    takes O(n_rows) time however long the DataFrame is. Fixed seeds keep repeated
+    observations of the same data identical, so they hit the LLM cache.
+
+    Parameters:
+    var (pd.DataFrame): DataFrame to sample.
+    n_rows (int): Maximum number of rows in the sample.
+    seed (int): Random seed.
+
+    Returns:
+    pd.DataFrame: The DataFrame itself if it has at most n_rows rows, otherwise
+                  n_rows randomly chosen rows kept in their original order.
+    """
+    if var.shape[0] <= n_rows:
+        return var
+    positions = np.random.default_rng(seed).choice(var.shape[0], size=n_rows, replace=False)
+    positions.sort()
+    return var.iloc[positions]
+
+#######################################
+# Group DataFrame columns by dtype
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   var (pd.DataFrame): DataFrame whose columns are grouped
+# Returns:
+#   dict: Dtype group name -> list of column names
+#######################################
+def group_columns_by_dtype(var: pd.DataFrame) -> dict:
+    """
+    Group the columns of a DataFrame into numeric, boolean, categorical, datetime,
+    text and other columns.
+
+    Parameters:
+    var (pd.DataFrame): DataFrame whose columns are grouped.
+
+    Returns:
+    dict: Non-empty groups in a fixed order, mapping the group name to its column
+          names in column order.
+    """
+    groups = {"numeric": [], "boolean": [], "categorical": [], "datetime": [], "text": [], "other": []}
+    for column, dtype in var.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            groups["boolean"].append(column)
+        elif pd.api.types.is_numeric_dtype(dtype):
+            groups["numeric"].append(column)
+        elif isinstance(dtype, pd.CategoricalDtype):
+            groups["categorical"].append(column)
+        elif pd.api.types.is_datetime64_any_dtype(dtype) or pd.api.types.is_timedelta64_dtype(dtype):
+            groups["datetime"].append(column)
+        elif pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype):
+            groups["text"].append(column)
+        else:
+            groups["other"].append(column)
+    return {group: columns for group, columns in groups.items() if columns}
+
+def _format_names(names: list, max_names: int) -> str:
+    """Join names, listing at most max_names of them."""
+    listed = ", ".join(str(name) for name in names[:max_names])
+    if len(names) > max_names:
+        listed += f", ... and {len(names) - max_names} more"
+    return listed
+
+#######################################
+# Generate comprehensive DataFrame description
+# Globals:
+#   OBSERVATION_* (default budgets)
+# Arguments:
 #   var (pd.DataFrame): DataFrame object to analyze and describe
+#   max_chars (int): Character budget of the description
+#   n_sample (int): Rows sampled for statistics
+#   seed (int): Sampling seed
 # Returns:
 #   str: Multi-line string containing DataFrame structure and content summary
 #######################################
-def describe_dataframe(var: pd.DataFrame) -> str:
+def describe_dataframe(
+        var: pd.DataFrame,
+        max_chars: int = OBSERVATION_MAX_CHARS,
+        n_sample: int = OBSERVATION_SAMPLE_ROWS,
+        seed: int = 0,
+        ) -> str:
     """
     Generate a natural language description of a pandas DataFrame.
     
@@ -124,46 +461,80 @@ def describe_dataframe(var: pd.DataFrame) -> str:
     data types, summary statistics, and sample data. This is particularly useful
     for bioinformatics data analysis where understanding data structure is critical.
 
+    The cost is bounded regardless of the DataFrame size: statistics and value
+    counts are computed on a random sample of rows, columns are summarized per
+    dtype group with a limited number of names listed, only a few columns get
+    statistics and printed rows, and the text is capped at max_chars.
+
     Parameters:
     var (pd.DataFrame): The DataFrame to describe. Should be a valid pandas DataFrame
                        with at least basic structure (rows and columns).
+    max_chars (int): Maximum length of the description. Defaults to
+                     OBSERVATION_MAX_CHARS.
+    n_sample (int): Rows sampled for statistics. Defaults to OBSERVATION_SAMPLE_ROWS.
+    seed (int): Sampling seed. Defaults to 0.
 
     Returns:
     str: A multi-line string describing the DataFrame's structure and content,
          including dimensions, column names, data types, statistics, and sample rows.
     """
     desc = ""
+    n_rows, n_columns = var.shape
     
     # Basic dimensional information - essential for understanding data scale
-    desc += f"\nIt has {var.shape[0]} rows and {var.shape[1]} columns."
-    
-    # Column information - critical for understanding available features
-    desc += f"\nColumn names: {', '.join(var.columns)}"
-    
-    # Data type information - important for downstream analysis planning
-    desc += f"\nData types:\n{var.dtypes.to_string()}"
-    
-    # Statistical summary - provides insight into data distribution and quality
-    desc += f"\nSummary statistics:\n{var.describe().to_string()}"
-    
+    desc += f"\nIt has {n_rows} rows and {n_columns} columns."
+    if n_columns == 0:
+        desc += f"\nIndex: {_format_names(list(var.index[:OBSERVATION_MAX_COLUMNS]), OBSERVATION_MAX_COLUMNS)}"
+        return truncate_text(desc, max_chars)
+
+    # Column and data type information, grouped by dtype for wide tables
+    groups = group_columns_by_dtype(var)
+    column_dtypes = dict(var.dtypes.items())
+    desc += "\nColumns by data type:"
+    for group, columns in groups.items():
+        dtypes = sorted({str(column_dtypes[column]) for column in columns})
+        desc += f"\n- {group} ({len(columns)}, {', '.join(dtypes)}): "
+        desc += _format_names(columns, OBSERVATION_MAX_COLUMNS)
+
+    # Statistics on a row sample, limited to the first columns of each group
+    sample = sample_rows(var, n_sample, seed)
+    sampled = f" (from {sample.shape[0]} sampled rows)" if sample.shape[0] < n_rows else ""
+    numeric = groups.get("numeric", [])[:OBSERVATION_MAX_STATS_COLUMNS]
+    if numeric:
+        desc += f"\nSummary statistics{sampled}:\n"
+        desc += sample[numeric].describe().to_string(max_colwidth=OBSERVATION_MAX_COLWIDTH)
+    labels = (groups.get("categorical", []) + groups.get("boolean", []) + groups.get("text", []))
+    if labels:
+        desc += f"\nTop values{sampled}:"
+        for column in labels[:OBSERVATION_MAX_STATS_COLUMNS]:
+            counts = sample[column].value_counts(dropna=False)
+            top = ", ".join(f"{str(value)[:OBSERVATION_MAX_COLWIDTH]} ({count})" for value, count in counts.head(5).items())
+            dtype = column_dtypes[column]
+            n_unique = len(dtype.categories) if isinstance(dtype, pd.CategoricalDtype) \
+                else f"{len(counts)}{'+' if sampled else ''}"
+            desc += f"\n- {column}: {n_unique} unique; {top}"
+
     # Sample data - allows quick verification of data format and content
-    desc += f"\nFirst few rows:\n{var.head().to_string()}"
+    shown = list(var.columns[:OBSERVATION_MAX_STATS_COLUMNS])
+    desc += f"\nFirst few rows" + (f" (first {len(shown)} columns)" if n_columns > len(shown) else "") + ":\n"
+    desc += var.iloc[:5, :len(shown)].to_string(max_colwidth=OBSERVATION_MAX_COLWIDTH)
     
-    return desc
+    return truncate_text(desc, max_chars)
 
 #######################################
 # Generate comprehensive descriptions for multiple variables
 # Globals:
-#   None (uses local variables only)
+#   OBSERVATION_MAX_CHARS (default budget)
 # Arguments:
 #   variables (list): List of Python objects to describe
 #   var_names (list): Corresponding names for each variable
+#   max_chars (int): Character budget of the whole observation
 # Returns:
 #   str: Formatted string containing detailed descriptions of all variables
 # Raises:
 #   ValueError: If variables and var_names lists have different lengths
 #######################################
-def data_observation(variables: list, var_names: list) -> str:
+def data_observation(variables: list, var_names: list, max_chars: int = OBSERVATION_MAX_CHARS) -> str:
     """
     Generate descriptions for a list of variables.
     
@@ -171,12 +542,18 @@ def data_observation(variables: list, var_names: list) -> str:
     including its name, type, and additional details if it's a DataFrame or AnnData object.
     Particularly useful for bioinformatics workflows where understanding input data
     structure is crucial for analysis planning.
+
+    The observation is budgeted: every variable gets an equal share of max_chars,
+    tables are described by describe_dataframe on sampled rows, other objects by a
+    bounded repr, and the result never exceeds max_chars (plus a truncation note).
     
     Parameters:
     variables (list): List of variables to describe. Can contain pandas DataFrames,
                      AnnData objects, or any other Python objects.
     var_names (list): List of names corresponding to the variables. Must have the
                      same length as variables list.
+    max_chars (int): Maximum length of the observation. Defaults to
+                     OBSERVATION_MAX_CHARS.
     
     Returns:
     str: A formatted string containing descriptions of each variable, with detailed
@@ -191,40 +568,51 @@ def data_observation(variables: list, var_names: list) -> str:
         return "Error with data observation, wrong paries"  # TODO(developer): Fix typo in error message
 
     prcp = ""
+    budget = max_chars // max(1, len(variables))
     
     # Iterate through each variable and generate appropriate description
     for i in range(len(variables)):
         var = variables[i]
-        prcp += f"Variable '{var_names[i]}' is a {type(var).__name__}:\n"
+        var_prcp = f"Variable '{var_names[i]}' is a {type(var).__name__}:\n"
         
         # Handle pandas DataFrame objects with comprehensive description
         if isinstance(var, pd.DataFrame):
-            prcp += describe_dataframe(var)
+            var_prcp += describe_dataframe(var, max_chars=budget)
             
         # Handle AnnData objects (common in single-cell genomics)
         elif isinstance(var, AnnData):
             # Basic AnnData structure information
-            prcp += f"\nIt has {var.n_obs} observations and {var.n_vars} variables."
+            var_prcp += f"\nIt has {var.n_obs} observations and {var.n_vars} variables."
+            var_prcp += f"\nIts .X is a {type(var.X).__name__}"
+            if var.X is not None:
+                var_prcp += f" of {var.X.dtype}" + (f" with {var.X.nnz} stored values" if hasattr(var.X, "nnz") else "")
+            var_prcp += "."
+            for name in ("layers", "obsm", "varm", "obsp"):
+                keys = list(getattr(var, name).keys())
+                if keys:
+                    var_prcp += f"\nIts .{name}: {_format_names(keys, OBSERVATION_MAX_COLUMNS)}"
             
             # Describe observation metadata if available
             if var.obs is not None and not var.obs.empty:
-                prcp += "\nFor its .obs (observation metadata):"
-                prcp += describe_dataframe(var.obs)
+                var_prcp += "\nFor its .obs (observation metadata):"
+                var_prcp += describe_dataframe(var.obs, max_chars=budget // 2)
                 
             # Describe variable metadata if available  
             if var.var is not None and not var.var.empty:
-                prcp += "\nFor its .var (variable metadata):"
-                prcp += describe_dataframe(var.var)
+                var_prcp += "\nFor its .var (variable metadata):"
+                var_prcp += describe_dataframe(var.var, max_chars=budget // 2)
                 
             # List unstructured annotations if present
             if var.uns:
-                prcp += f"\nIts unstructured annotation (.uns): {list(var.uns.keys())}"
+                var_prcp += f"\nIts unstructured annotation (.uns): {_format_names(list(var.uns.keys()), OBSERVATION_MAX_COLUMNS)}"
                 
-        # Handle all other data types with basic string representation
+        # Handle all other data types with a bounded representation
         else:
-            prcp += f"{var}\n"
+            var_prcp += f"{_OBSERVATION_REPR.repr(var)}\n"
+
+        prcp += truncate_text(var_prcp, budget) + "\n"
 
-    return prcp
+    return truncate_text(prcp, max_chars)
 
 
 
@@ -241,11 +629,12 @@ def data_observation(variables: list, var_names: list) -> str:
 #######################################
 def input_variable_wrapper(variables):
     """
-    Wraps the input variables by finding their names, saving them to a pickle file,
-    and generating a description.
+    Wraps the input variables by finding their names, persisting them, and generating
+    a description.
     
     This function uses introspection to find the names of the variables passed to it,
-    saves them to a temporary pickle file, and generates a description using data_observation.
+    saves them to a per-session directory with permanent_input_vars, and generates a
+    description using data_observation.
     This is the main entry point for preparing input variables for bioinformatics analysis
     workflows in the BIA-Ghostcoder system.
     
@@ -256,7 +645,8 @@ def input_variable_wrapper(variables):
     Returns:
     dict: A dictionary containing:
           - 'var_names': List of discovered variable names
-          - 'persis_add': Path to pickle file containing serialized variables
+          - 'persis_add': Path to the manifest of the persisted variables
+          - 'manifest': The manifest itself, open the variables with load_input_vars
           - 'perception': Detailed description of all variables
           
     Raises:
@@ -305,8 +695,10 @@ def input_variable_wrapper(variables):
     wrap_dict['var_names'] = var_names
 
     # Save variables to persistent storage for cross-execution access
-    pickle_file_path = permanent_input_vars(variables)
-    wrap_dict['persis_add'] = pickle_file_path
+    manifest_path = permanent_input_vars(variables, var_names)
+    wrap_dict['persis_add'] = manifest_path
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        wrap_dict['manifest'] = json.load(f)
 
     # Generate detailed description of all variables for analysis planning
     perception = data_observation(variables, var_names)
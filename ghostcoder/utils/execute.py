@@ -6,16 +6,30 @@
 # in bioinformatics analysis workflows. Supports execution monitoring and state tracking.
 
 import io
+import os
+import sys
 import copy
+import hashlib
 import builtins
 import numpy as np
 import pandas as pd
-from typing import Dict, Any
-from scipy.sparse import csr_matrix
+from typing import Dict, Any, Optional
+from scipy.sparse import issparse
 from anndata._core.anndata import AnnData
 from pandas.core.frame import DataFrame
 from contextlib import redirect_stdout, redirect_stderr
 
+# xxhash is optional, it hashes large array buffers several times faster than blake2b
+try:
+    import xxhash
+    _new_hasher = xxhash.xxh3_128
+except ImportError:
+    def _new_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+# Variables up to this size are deep copied before a trial run, larger ones are fingerprinted
+SNAPSHOT_MAX_BYTES = 16 * 1024 ** 2
+
 #######################################
 # Extract executable code from Markdown text
 # Globals:
@@ -95,6 +109,141 @@ def extract_code_blocks(
 # commonly used in single-cell genomics and bioinformatics analysis
 #######################################
 
+# Elements compared per chunk, bounds the temporary boolean arrays of a comparison
+COMPARE_CHUNK_SIZE = 1 << 20
+
+#######################################
+# Compare two array-likes chunk by chunk
+# Globals:
+#   COMPARE_CHUNK_SIZE (elements per chunk)
+# Arguments:
+#   arr_1: First numpy array or h5py dataset
+#   arr_2: Second numpy array or h5py dataset
+# Returns:
+#   bool: True if shape, dtype and values are equal
+#######################################
+def compare_arrays(arr_1, arr_2) -> bool:
+    """
+    Compare two arrays (numpy arrays or on-disk h5py datasets) with early exit.
+
+    Shape and dtype are checked first. Values are then compared in chunks of about
+    COMPARE_CHUNK_SIZE elements along the first axis, stopping at the first chunk
+    that differs, so no full-size boolean array is allocated and backed datasets
+    are read piecewise. NaNs in the same positions count as equal.
+
+    Args:
+        arr_1: First array, anything with shape, dtype and slicing.
+        arr_2: Second array.
+
+    Returns:
+        bool: True if both arrays hold the same values with the same shape and dtype.
+    """
+    if arr_1 is arr_2:
+        return True
+    if arr_1.shape != arr_2.shape or arr_1.dtype != arr_2.dtype:
+        return False
+    if arr_1.dtype.hasobject:
+        # Object arrays compare their elements with ==, NaN handling does not apply
+        return bool(np.array_equal(np.asarray(arr_1), np.asarray(arr_2)))
+    if len(arr_1.shape) == 0:
+        return bool(np.array_equal(arr_1[()], arr_2[()], equal_nan=arr_1.dtype.kind in "fc"))
+
+    has_nan = arr_1.dtype.kind in "fc"
+    row_size = max(1, int(np.prod(arr_1.shape[1:])))
+    step = max(1, COMPARE_CHUNK_SIZE // row_size)
+    for start in range(0, arr_1.shape[0], step):
+        chunk_1, chunk_2 = np.asarray(arr_1[start:start + step]), np.asarray(arr_2[start:start + step])
+        equal = chunk_1 == chunk_2
+        if equal.all():
+            continue
+        # Only look for NaNs once a chunk differs
+        if not has_nan or not (equal | (np.isnan(chunk_1) & np.isnan(chunk_2))).all():
+            return False
+    return True
+
+#######################################
+# Compare two dense, sparse or backed matrices
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   mat_1: First matrix
+#   mat_2: Second matrix
+# Returns:
+#   bool: True if the matrices are equal
+#######################################
+def compare_matrices(mat_1, mat_2) -> bool:
+    """
+    Compare two matrices without building a difference matrix.
+
+    Supports numpy arrays and matrices, every scipy sparse matrix/array format and
+    backed AnnData matrices (h5py datasets and CSR/CSC sparse datasets). Sparse
+    matrices are compared on shape, format, dtype and nnz first, then on their
+    indptr, indices and data buffers chunk by chunk. Explicitly stored zeros count
+    as stored values, so a matrix and a copy with zeros eliminated differ.
+
+    Args:
+        mat_1: First matrix, None allowed.
+        mat_2: Second matrix, None allowed.
+
+    Returns:
+        bool: True if both are None or both hold the same values in the same format.
+    """
+    if mat_1 is None or mat_2 is None:
+        return mat_1 is None and mat_2 is None
+    if mat_1 is mat_2:
+        return True
+
+    sparse_1 = issparse(mat_1) or _is_sparse_dataset(mat_1)
+    sparse_2 = issparse(mat_2) or _is_sparse_dataset(mat_2)
+    if sparse_1 != sparse_2:
+        return False
+    if not sparse_1:
+        if isinstance(mat_1, np.matrix) or isinstance(mat_2, np.matrix):
+            mat_1, mat_2 = np.asarray(mat_1), np.asarray(mat_2)
+        return compare_arrays(mat_1, mat_2)
+
+    # Cheap metadata checks first
+    if mat_1.shape != mat_2.shape or mat_1.dtype != mat_2.dtype:
+        return False
+    buffers_1, buffers_2 = _sparse_buffers(mat_1), _sparse_buffers(mat_2)
+    if buffers_1["format"] != buffers_2["format"]:
+        # Same values can be stored as CSR and CSC, compare in a common format
+        if not (issparse(mat_1) and issparse(mat_2)):
+            return False
+        buffers_1, buffers_2 = _sparse_buffers(mat_1.tocsr()), _sparse_buffers(mat_2.tocsr())
+    if buffers_1["data"].shape != buffers_2["data"].shape:
+        return False
+    # Unsorted or duplicate indices can store the same values in a different
+    # structure, only then a mismatch needs a retry on the canonical form (rare)
+    retry_canonical = issparse(mat_1) and issparse(mat_2) and not (
+        buffers_1["canonical"].has_canonical_format and buffers_2["canonical"].has_canonical_format)
+    # Data first, it is what in-place edits usually change
+    data_equal = compare_arrays(buffers_1["data"], buffers_2["data"])
+    if not data_equal and not retry_canonical:
+        return False
+    structure_equal = all(compare_arrays(buffers_1[name], buffers_2[name]) for name in ("indptr", "indices"))
+    if structure_equal:
+        return data_equal
+    if retry_canonical:
+        canonical_1, canonical_2 = buffers_1["canonical"].copy(), buffers_2["canonical"].copy()
+        canonical_1.sum_duplicates()
+        canonical_2.sum_duplicates()
+        return compare_matrices(canonical_1, canonical_2)
+    return False
+
+def _is_sparse_dataset(data) -> bool:
+    """Whether data is a backed AnnData CSR/CSC dataset."""
+    return hasattr(data, "group") and getattr(data, "format", None) in ("csr", "csc")
+
+def _sparse_buffers(mat) -> dict:
+    """Return the format and indptr/indices/data buffers of a sparse matrix."""
+    if _is_sparse_dataset(mat):
+        group = mat.group
+        return {"format": mat.format, "indptr": group["indptr"], "indices": group["indices"], "data": group["data"]}
+    if mat.format not in ("csr", "csc"):
+        mat = mat.tocsr()
+    return {"format": mat.format, "indptr": mat.indptr, "indices": mat.indices, "data": mat.data, "canonical": mat}
+
 #######################################
 # Compare two AnnData objects for complete equality
 # Globals:
@@ -114,15 +263,22 @@ def compare_anndata(adata_1: AnnData, adata_2: AnnData) -> bool:
     all major components including data matrices, metadata, and annotations.
     Essential for validating data processing results in bioinformatics workflows.
 
+    Components are compared cheapest first and the comparison stops at the first
+    difference. Matrices are compared with compare_matrices, so dense, sparse
+    (CSR/CSC, matrix or array) and backed X are supported without allocating a
+    difference matrix.
+
     Attributes checked include:
     - obs: Observations DataFrame (cell metadata)
     - var: Variables DataFrame (gene metadata)
     - X: Data matrix (dense or sparse expression data)
+    - layers: Alternative data matrices (e.g., raw counts)
     - obsm: Observation matrices (e.g., PCA, UMAP embeddings)
     - varm: Variable matrices (e.g., principal components)
     - obsp: Observation pairwise matrices (e.g., distance matrices)
     - varp: Variable pairwise matrices (e.g., correlation matrices)
-    - uns: Unstructured annotations (analysis parameters, results)
+    - uns: Unstructured annotations (analysis parameters, results), nested
+    - raw: Frozen raw X and var, if set
 
     Parameters:
         adata_1 (AnnData): First AnnData object to compare. Should be a valid
@@ -134,62 +290,43 @@ def compare_anndata(adata_1: AnnData, adata_2: AnnData) -> bool:
         bool: True if all attributes are equal, False otherwise. Returns False
               immediately if basic dimensions don't match.
     """
-    # List to track comparison results for each AnnData component
-    checkpoints = []
-
-    # Helper function to compare DataFrames with null safety
-    def compare_dataframes(df1: DataFrame, df2: DataFrame) -> bool:
-        """Compare two DataFrames handling None values appropriately."""
-        if df1 is None and df2 is None:
-            return True
-        if df1 is None or df2 is None:
-            return False
-        return df1.equals(df2)
-
-    # Helper function to compare matrices (dense or sparse) with type awareness
-    def compare_matrices(mat1, mat2) -> bool:
-        """Compare matrices efficiently handling both dense and sparse formats."""
-        if mat1 is None and mat2 is None:
-            return True
-        if mat1 is None or mat2 is None:
-            return False
-        # Efficient sparse matrix comparison using nnz (number of non-zeros)
-        if isinstance(mat1, csr_matrix) and isinstance(mat2, csr_matrix):
-            return (mat1 != mat2).nnz == 0  # No differences means equal
-        # Standard numpy array comparison for dense matrices
-        return np.array_equal(mat1, mat2)
-
-    # Helper function to compare dictionaries of arrays (e.g., obsm, varm)
-    def compare_dicts(dict1: dict, dict2: dict) -> bool:
-        """Compare dictionaries containing numpy arrays or similar structures."""
-        if dict1.keys() != dict2.keys():
-            return False
-        return all(np.array_equal(dict1[key], dict2[key]) for key in dict1)
-
     # Early exit if basic dimensions don't match - no need to check details
+    if adata_1 is adata_2:
+        return True
     if adata_1.shape != adata_2.shape:
         return False
-    else:
+
+    # Structure checks are cheap, run them before reading any values
+    mappings = ("layers", "obsm", "varm", "obsp", "varp")
+    if any(getattr(adata_1, name).keys() != getattr(adata_2, name).keys() for name in mappings):
+        return False
+    if adata_1.uns.keys() != adata_2.uns.keys() or (adata_1.raw is None) != (adata_2.raw is None):
+        return False
+
+    # Lazily evaluated so all() stops at the first difference
+    checkpoints = (
+        # Compare X (main data matrix - expression values), most often changed and
+        # shape/nnz/dtype mismatches are found without reading values
+        lambda: compare_matrices(adata_1.X, adata_2.X),
         # Compare obs (observations/cell metadata)
-        checkpoints.append(compare_dataframes(adata_1.obs, adata_2.obs))
+        lambda: adata_1.obs.equals(adata_2.obs),
         # Compare var (variables/gene metadata)
-        checkpoints.append(compare_dataframes(adata_1.var, adata_2.var))
-        # Compare X (main data matrix - expression values)
-        checkpoints.append(compare_matrices(adata_1.X, adata_2.X))
-        # Compare obsm (observation matrices - dimensionality reduction results)
-        checkpoints.append(compare_dicts(adata_1.obsm, adata_2.obsm))
-        # Compare varm (variable matrices - feature loadings)
-        checkpoints.append(compare_dicts(adata_1.varm, adata_2.varm))
-        # Compare obsp (observation pairwise matrices - distance/similarity)
-        checkpoints.append(compare_dicts(adata_1.obsp, adata_2.obsp))
-        # Compare varp (variable pairwise matrices - gene-gene relationships)
-        checkpoints.append(compare_dicts(adata_1.varp, adata_2.varp))
+        lambda: adata_1.var.equals(adata_2.var),
+        # Compare layers, obsm, varm, obsp and varp (matrices or DataFrames per key)
+        lambda: all(
+            compare_data(getattr(adata_1, name)[key], getattr(adata_2, name)[key])
+            for name in mappings for key in getattr(adata_1, name).keys()
+        ),
         # Compare uns (unstructured annotations - analysis parameters/results)
-        # TODO(developer): Consider using deepdiff for more robust nested structure comparison
-        checkpoints.append(adata_1.uns == adata_2.uns)
+        lambda: compare_data(dict(adata_1.uns), dict(adata_2.uns)),
+        # Compare raw (frozen unprocessed data)
+        lambda: adata_1.raw is None or (
+            adata_1.raw.var.equals(adata_2.raw.var) and compare_matrices(adata_1.raw.X, adata_2.raw.X)
+        ),
+    )
 
-        # Return True only if all attributes match perfectly
-        return all(checkpoints)
+    # Return True only if all attributes match perfectly
+    return all(check() for check in checkpoints)
 
 #######################################
 # Generic data comparison with type-aware handling
@@ -209,7 +346,9 @@ def compare_data(data_1: Any, data_2: Any) -> bool:
     used in bioinformatics analysis. It handles AnnData objects with specialized
     comparison and falls back to standard equality for other types.
 
-    If both objects are AnnData, they are compared using compare_anndata.
+    If both objects are AnnData, they are compared using compare_anndata. Arrays
+    and sparse matrices use compare_matrices, DataFrames `equals`, and dicts, lists
+    and tuples are compared item by item (so nested structures holding arrays work).
     For other types, a direct equality check is performed with exception handling.
 
     Parameters:
@@ -230,15 +369,225 @@ def compare_data(data_1: Any, data_2: Any) -> bool:
     # AnnData requires deep comparison of multiple components
     if isinstance(data_1, AnnData):
         return compare_anndata(data_1, data_2)
+
+    # Element-wise types, == does not return a single bool
+    if isinstance(data_1, (DataFrame, pd.Series)):
+        return data_1.equals(data_2)
+    if isinstance(data_1, np.ndarray) or issparse(data_1):
+        return compare_matrices(data_1, data_2)
+
+    # Containers (e.g. nested uns) are compared item by item
+    if isinstance(data_1, dict):
+        return data_1.keys() == data_2.keys() and all(
+            compare_data(data_1[key], data_2[key]) for key in data_1
+        )
+    if isinstance(data_1, (list, tuple)):
+        return len(data_1) == len(data_2) and all(
+            compare_data(item_1, item_2) for item_1, item_2 in zip(data_1, data_2)
+        )
     
     # For other types, attempt direct comparison with error handling
     try:
-        return data_1 == data_2
+        return bool(data_1 == data_2)
     except Exception:
         # If comparison fails (e.g., unsupported type, numpy array comparison issues)
         # return False to indicate objects are not equal
         return False
 
+
+#######################################
+# COPY-FREE CHANGE TRACKING
+# Large variables are tracked by content fingerprints (hashes of array buffers and
+# DataFrame columns) instead of deep copies, so a trial run does not double memory
+#######################################
+
+#######################################
+# Estimate the in-memory size of a variable
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   data (Any): Variable to measure
+# Returns:
+#   int: Approximate size in bytes
+#######################################
+def estimate_nbytes(data: Any) -> int:
+    """
+    Estimate the memory held by a variable without copying it.
+
+    Array, sparse matrix, DataFrame and AnnData buffers are counted; containers are
+    summed recursively and other objects use sys.getsizeof. Backed AnnData objects
+    do not count their on-disk X.
+
+    Args:
+        data (Any): Variable to measure.
+
+    Returns:
+        int: Approximate size in bytes.
+    """
+    if isinstance(data, np.ndarray):
+        return data.nbytes
+    if issparse(data):
+        return sum(
+            getattr(data, attr).nbytes
+            for attr in ("data", "indices", "indptr", "row", "col")
+            if isinstance(getattr(data, attr, None), np.ndarray)
+        )
+    if isinstance(data, (DataFrame, pd.Series)):
+        return int(np.sum(data.memory_usage(index=True, deep=False)))
+    if isinstance(data, AnnData):
+        size = estimate_nbytes(data.obs) + estimate_nbytes(data.var)
+        if not data.isbacked:
+            size += estimate_nbytes(data.X)
+        for mapping in (data.obsm, data.varm, data.obsp, data.varp, data.layers):
+            size += sum(estimate_nbytes(value) for value in mapping.values())
+        return size + estimate_nbytes(data.uns)
+    if isinstance(data, dict):
+        return sys.getsizeof(data) + sum(estimate_nbytes(value) for value in data.values())
+    if isinstance(data, (list, tuple, set, frozenset)):
+        return sys.getsizeof(data) + sum(estimate_nbytes(value) for value in data)
+    return sys.getsizeof(data)
+
+#######################################
+# Hash the content of a variable
+# Globals:
+#   _new_hasher (xxhash or blake2b factory)
+# Arguments:
+#   data (Any): Variable to fingerprint
+# Returns:
+#   Optional[str]: Hex digest, or None if the type is not supported
+#######################################
+def fingerprint_data(data: Any) -> Optional[str]:
+    """
+    Compute a content fingerprint of a variable without copying it.
+
+    Two variables with the same fingerprint have the same content with very high
+    probability, so a variable whose fingerprint changed during a trial run was
+    modified (in place or reassigned). Supported types:
+    - numpy arrays: dtype, shape and raw buffer (object arrays are not supported)
+    - scipy sparse matrices/arrays: format, shape and the data/indices/indptr buffers
+    - DataFrame/Series: columns, dtypes and pandas row hashes including the index
+    - AnnData: every component, nested uns included; backed objects hash the file
+      path, size and mtime instead of reading X
+    - scalars, strings and nested dict/list/tuple/set of supported types
+
+    Args:
+        data (Any): Variable to fingerprint.
+
+    Returns:
+        Optional[str]: Hex digest, or None if the variable (or something it contains)
+                       cannot be fingerprinted and has to be deep copied instead.
+    """
+    hasher = _new_hasher()
+    try:
+        supported = _update_fingerprint(hasher, data)
+    except (TypeError, ValueError, RecursionError):
+        return None
+    return hasher.hexdigest() if supported else None
+
+def _update_fingerprint(hasher, data: Any) -> bool:
+    """Feed the content of a variable to a hasher, return False if unsupported."""
+    hasher.update(type(data).__qualname__.encode("utf-8") + b"\x00")
+    if data is None or isinstance(data, (bool, int, float, complex, str, bytes, np.generic)):
+        hasher.update(repr(data).encode("utf-8") + b"\x00")
+        return True
+    if isinstance(data, np.ndarray):
+        if data.dtype.hasobject:
+            return False
+        hasher.update(repr((data.dtype.str, data.shape)).encode("utf-8"))
+        hasher.update(np.ascontiguousarray(data).data)
+        return True
+    if issparse(data):
+        hasher.update(repr((data.format, data.shape, data.dtype.str)).encode("utf-8"))
+        buffers = ("row", "col", "data") if data.format == "coo" else ("indptr", "indices", "data")
+        return all(_update_fingerprint(hasher, getattr(data, attr)) for attr in buffers)
+    if isinstance(data, (DataFrame, pd.Series)):
+        columns = list(data.columns) if isinstance(data, DataFrame) else [data.name]
+        dtypes = [str(t) for t in data.dtypes] if isinstance(data, DataFrame) else [str(data.dtype)]
+        hasher.update(repr((columns, dtypes, data.index.name)).encode("utf-8"))
+        return _update_fingerprint(hasher, pd.util.hash_pandas_object(data, index=True).to_numpy())
+    if isinstance(data, AnnData):
+        if data.isbacked:
+            stat = os.stat(data.filename)
+            hasher.update(repr((str(data.filename), stat.st_size, stat.st_mtime_ns)).encode("utf-8"))
+        elif not _update_fingerprint(hasher, data.X):
+            return False
+        parts = [data.obs, data.var, data.uns, data.raw.X if data.raw is not None else None]
+        parts += [dict(mapping) for mapping in (data.obsm, data.varm, data.obsp, data.varp, data.layers)]
+        return all(_update_fingerprint(hasher, part) for part in parts)
+    if isinstance(data, dict):
+        # Order-insensitive, like dict equality
+        items = []
+        for key, value in data.items():
+            item_hasher = _new_hasher()
+            if not _update_fingerprint(item_hasher, key) or not _update_fingerprint(item_hasher, value):
+                return False
+            items.append(item_hasher.hexdigest())
+        hasher.update("".join(sorted(items)).encode("utf-8"))
+        return True
+    if isinstance(data, (set, frozenset)):
+        return _update_fingerprint(hasher, {item: None for item in data})
+    if isinstance(data, (list, tuple)):
+        hasher.update(str(len(data)).encode("utf-8"))
+        return all(_update_fingerprint(hasher, item) for item in data)
+    return False
+
+#######################################
+# Snapshot the execution environment before a trial run
+# Globals:
+#   SNAPSHOT_MAX_BYTES (default deep copy size limit)
+# Arguments:
+#   local_env (Dict[str, Any]): Variables to snapshot
+#   deep_copy (bool): Deep copy every variable
+#   max_bytes (int): Size limit for deep copies
+# Returns:
+#   tuple[Dict[str, Any], Dict[str, str]]: Deep copies and fingerprints by name
+# Raises:
+#   ValueError: If a variable can neither be fingerprinted nor deep copied
+#######################################
+def snapshot_vars(
+        local_env: Dict[str, Any],
+        deep_copy: bool = False,
+        max_bytes: int = SNAPSHOT_MAX_BYTES,
+        ) -> tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Record the state of an execution environment for later change detection.
+
+    Small variables (up to `max_bytes`) are deep copied, so their previous values
+    stay available. Larger ones are only fingerprinted, which reads their buffers
+    once but allocates next to nothing; they fall back to a deep copy if their type
+    cannot be fingerprinted.
+
+    Args:
+        local_env (Dict[str, Any]): Variables to snapshot.
+        deep_copy (bool, optional): Deep copy every variable regardless of size.
+                                    Defaults to False.
+        max_bytes (int, optional): Largest variable that is deep copied.
+                                   Defaults to SNAPSHOT_MAX_BYTES (16 MB).
+
+    Returns:
+        tuple[Dict[str, Any], Dict[str, str]]: Deep copies of the small variables and
+                                               fingerprints of the large ones, each
+                                               variable is in exactly one of them.
+
+    Raises:
+        ValueError: If a variable can neither be fingerprinted nor deep copied.
+    """
+    copies, fingerprints = {}, {}
+    for name, value in local_env.items():
+        if not deep_copy and estimate_nbytes(value) > max_bytes:
+            fingerprint = fingerprint_data(value)
+            if fingerprint is not None:
+                fingerprints[name] = fingerprint
+                continue
+        try:
+            copies[name] = copy.deepcopy(value)
+        except Exception as e:
+            fingerprint = fingerprint_data(value)
+            if fingerprint is None:
+                raise ValueError(f"Failed to create a backup of variable '{name}': {e}")
+            fingerprints[name] = fingerprint
+    return copies, fingerprints
+
 #######################################
 # Analyze variable changes between execution states
 # Globals:
@@ -246,12 +595,14 @@ def compare_data(data_1: Any, data_2: Any) -> bool:
 # Arguments:
 #   original (Dict[str, Any]): Variable state before code execution
 #   final (Dict[str, Any]): Variable state after code execution
+#   fingerprints (Dict[str, str], optional): Fingerprints of variables not in original
 # Returns:
 #   Dict[str, Any]: Categorized changes (modified, new, removed variables)
 #######################################
 def compare_vars(
         original: Dict[str, Any],
-        final: Dict[str, Any]
+        final: Dict[str, Any],
+        fingerprints: Optional[Dict[str, str]] = None,
         ) -> Dict[str, Any]:
     """
     Compare two dictionaries and return their differences.
@@ -270,6 +621,10 @@ def compare_vars(
                                   state before code execution.
         final (Dict[str, Any]): The final dictionary representing the variable
                                state after code execution.
+        fingerprints (Dict[str, str], optional): Fingerprints (see fingerprint_data)
+                               of original variables that were not copied into
+                               `original`. They are modified if their fingerprint
+                               changed.
 
     Returns:
         Dict[str, Any]: A dictionary containing:
@@ -277,14 +632,18 @@ def compare_vars(
             - 'new': Set of keys added in final (newly created variables).
             - 'removed': Set of keys removed from original (deleted variables).
     """
+    fingerprints = fingerprints or {}
+
     # Convert keys to sets for efficient set operations
-    initial_keys = set(original.keys())
+    initial_keys = set(original.keys()) | set(fingerprints.keys())
     final_keys = set(final.keys())
 
     # Identify modified keys (present in both but with different values)
-    # Uses intelligent comparison that handles complex data types
-    modified = {k: final[k] for k in final_keys & initial_keys 
-                if not compare_data(original[k], final[k])}
+    # Uses intelligent comparison that handles complex data types,
+    # fingerprinted variables are compared by fingerprint
+    modified = {k: final[k] for k in final_keys & initial_keys
+                if (fingerprint_data(final[k]) != fingerprints[k] if k in fingerprints
+                    else not compare_data(original[k], final[k]))}
     
     # Identify new keys (only in final) - variables created during execution
     new = final_keys - initial_keys
@@ -305,6 +664,8 @@ def compare_vars(
 # Arguments:
 #   script (str): Python code to execute
 #   local_env (Dict[str, Any], optional): Local variables for execution context
+#   deep_copy (bool, optional): Deep copy every variable instead of fingerprinting large ones
+#   snapshot_max_bytes (int, optional): Largest variable deep copied before execution
 # Returns:
 #   Dict[str, Any]: Complete execution results including output, errors, and variable changes
 # Raises:
@@ -313,6 +674,8 @@ def compare_vars(
 def trial_run(
         script: str,
         local_env: Dict[str, Any] = None,
+        deep_copy: bool = False,
+        snapshot_max_bytes: int = SNAPSHOT_MAX_BYTES,
         ) -> Dict[str, Any]:
     """
     Attempts to run the generated code, returning comprehensive execution results.
@@ -321,8 +684,10 @@ def trial_run(
     Python code in a controlled environment while tracking all changes to variables,
     capturing output/errors, and providing detailed execution analysis.
 
-    The function creates a backup of the execution environment, runs the code with
-    proper output/error capture, and analyzes all changes made during execution.
+    The function snapshots the execution environment, runs the code with proper
+    output/error capture, and analyzes all changes made during execution. Small
+    variables are deep copied; large ones (e.g. an AnnData with millions of cells)
+    are only fingerprinted, so tracking changes does not double peak memory.
     Essential for validating generated bioinformatics analysis code.
 
     Parameters:
@@ -331,12 +696,22 @@ def trial_run(
         local_env (Dict[str, Any], optional): A dictionary of local variables to be 
                                             used in the execution context. Contains input
                                             data and variables. Defaults to empty dict.
+        deep_copy (bool, optional): Deep copy every variable before execution, as
+                                    opt-in for callers needing all previous values.
+                                    Defaults to False.
+        snapshot_max_bytes (int, optional): Variables up to this size are deep copied,
+                                            larger ones are fingerprinted.
+                                            Defaults to SNAPSHOT_MAX_BYTES (16 MB).
 
     Returns:
         Dict[str, Any]: A comprehensive dictionary containing:
             - 'output' (str): The captured stdout/stderr output from code execution.
             - 'error' (str): The error message if an exception occurred, None otherwise.
-            - 'input_vars' (Dict[str, Any]): Backup of original variables before execution.
+            - 'input_vars' (Dict[str, Any]): Backup of the deep copied original variables
+                                           before execution (large variables only
+                                           have a fingerprint).
+            - 'input_fingerprints' (Dict[str, str]): Fingerprints of the original
+                                           variables that were not deep copied.
             - 'output_vars' (Dict[str, Any]): Variables after execution (modified local_env).
             - 'var_status' (Dict[str, Any]): Detailed analysis of variable changes:
                 - 'modified': Variables that were changed during execution.
@@ -344,20 +719,19 @@ def trial_run(
                 - 'removed': Variables that were deleted during execution.
 
     Raises:
-        ValueError: If the local environment cannot be backed up (usually due to
-                   unpicklable objects in the environment).
+        ValueError: If a variable can neither be fingerprinted nor deep copied
+                   (usually an uncopyable object of an unsupported type).
     """
 
     # Ensure local_env is a dictionary; use an empty one if None
     # This provides a clean execution environment if no variables are provided
     local_env = local_env or {}
     
-    # Create a backup of the original variables for comparison
-    # Deep copy ensures we capture the exact state before execution
-    try:
-        input_vars = copy.deepcopy(local_env)
-    except Exception as e:
-        raise ValueError(f"Failed to create a backup of the local environment: {e}")
+    # Snapshot the original variables for comparison
+    # Small variables are deep copied, large ones fingerprinted to avoid doubling memory
+    input_vars, input_fingerprints = snapshot_vars(
+        local_env, deep_copy=deep_copy, max_bytes=snapshot_max_bytes
+        )
     
     # Initialize the output and error tracking variables
     output = "" 
@@ -386,13 +760,14 @@ def trial_run(
 
     # Analyze variable changes by comparing before/after states
     final_env = local_env
-    var_status = compare_vars(input_vars, final_env)
+    var_status = compare_vars(input_vars, final_env, input_fingerprints)
 
     # Prepare the comprehensive result dictionary
     result = {
         'output': output,
         'error': error,
         'input_vars': input_vars,
+        'input_fingerprints': input_fingerprints,
         'output_vars': final_env,  # Contains all variables after execution
         'var_status': var_status
         }
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder Executor Pool
+# Keeps code executors warm between code blocks. Executors are keyed by docker image
+# (or native environment, or Jupyter kernel) and work directory, started once and
+# reused by every execution with the same key; idle ones are stopped after a timeout
+# and the number of running containers is capped.
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Optional
+from contextlib import asynccontextmanager
+
+from ghostcoder.config import coder_config
+from ghostcoder.utils.kernel import KernelCodeExecutor
+
+# Autogen executors
+from autogen_ext.code_executors.docker import DockerCommandLineCodeExecutor
+from autogen_ext.code_executors.local import LocalCommandLineCodeExecutor
+
+logger = logging.getLogger(__name__)
+
+# Key used for executors running in the native environment
+NATIVE_ENV = "native"
+# Key prefix of Jupyter kernel executors, followed by the kernel name
+KERNEL_ENV = "kernel:"
+
+#######################################
+# EXECUTOR POOL
+#######################################
+
+class ExecutorPool:
+    """
+    Pool of started code executors keyed by (docker image, work dir).
+
+    `async with pool.executor(...)` hands out the warm executor of a key, starting
+    it on first use, so a container is started once per image and task directory
+    instead of once per code block. Executors idle for longer than `idle_timeout`
+    seconds are stopped on the next acquisition (or by `evict_idle`), and at most
+    `max_containers` docker executors run at once: when the cap is reached the
+    least recently used idle container is stopped, or the caller waits for one to
+    be released.
+
+    The pool may be shared by graphs running in different event loops or threads;
+    its bookkeeping is guarded by a thread lock that is never held across awaits.
+    """
+
+    def __init__(self, max_containers: int = 3, idle_timeout: float = 600):
+        """
+        Create an empty pool.
+
+        Args:
+            max_containers (int, optional): Maximum number of running docker executors.
+                                            Defaults to 3.
+            idle_timeout (float, optional): Seconds after which an unused executor is
+                                            stopped. Defaults to 600.
+        """
+        self.max_containers = max_containers
+        self.idle_timeout = idle_timeout
+        self._entries = {}  # key -> {"executor", "in_use", "last_used", "docker"}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+            docker_image: Optional[str],
+            work_dir: str,
+            use_docker: bool = True,
+            kernel: Optional[str] = None,
+            ) -> tuple[str, str]:
+        """Return the pool key of an image (or the native environment, or a kernel) and work dir."""
+        if kernel:
+            image = KERNEL_ENV + kernel
+        else:
+            image = docker_image if use_docker and docker_image else NATIVE_ENV
+        return (image, os.path.abspath(work_dir))
+
+    def _create_executor(self, key: tuple[str, str]):
+        """Create (not start) the executor of a key."""
+        image, work_dir = key
+        if image.startswith(KERNEL_ENV):
+            logger.info("Created new kernel executor with kernel:" + image[len(KERNEL_ENV):])
+            return KernelCodeExecutor(
+                kernel_name=image[len(KERNEL_ENV):],
+                work_dir=work_dir,
+                timeout=coder_config.KERNEL_TIMEOUT,
+            )
+        if image == NATIVE_ENV:
+            logger.info("Created new native env cmd executor.")
+            return LocalCommandLineCodeExecutor(
+                timeout=30,  # Timeout for each code execution in seconds.
+                work_dir=work_dir,  # Use the task main dir to store the code files.
+            )
+        logger.info("Created new docker cmd executor with docker image:" + image)
+        return DockerCommandLineCodeExecutor(
+            image=image,
+            timeout=60,
+            work_dir=work_dir,  # Use the task main dir to store the code files.
+            delete_tmp_files=True,  # All code history saved in memory, no need temp code files
+            auto_remove=True,  # The pool owns the container, remove it once stopped
+            stop_container=True,  # Stop still running containers at interpreter exit
+        )
+
+    def _n_containers(self) -> int:
+        """Number of docker executors in the pool. Caller holds the lock."""
+        return sum(1 for entry in self._entries.values() if entry["docker"])
+
+    def _pop_idle(self, older_than: float) -> list:
+        """Remove idle entries last used before `older_than`. Caller holds the lock."""
+        stale = [
+            key for key, entry in self._entries.items()
+            if entry["in_use"] == 0 and entry["last_used"] < older_than
+        ]
+        return [(key, self._entries.pop(key)["executor"]) for key in stale]
+
+    async def _stop(self, evicted: list) -> None:
+        """Stop evicted executors, logging instead of raising on failure."""
+        for key, executor in evicted:
+            try:
+                await executor.stop()
+                logger.info("Stopped idle executor " + str(key))
+            except Exception:
+                logger.exception("Get exception when stopping executor " + str(key) + ":")
+
+    async def evict_idle(self) -> int:
+        """
+        Stop executors unused for longer than `idle_timeout`.
+
+        Returns:
+            int: Number of stopped executors.
+        """
+        with self._lock:
+            evicted = self._pop_idle(time.monotonic() - self.idle_timeout)
+        await self._stop(evicted)
+        return len(evicted)
+
+    async def close(self) -> None:
+        """Stop every idle executor, e.g. at the end of a session."""
+        with self._lock:
+            evicted = self._pop_idle(float("inf"))
+        await self._stop(evicted)
+
+    async def _acquire(self, key: tuple[str, str]):
+        """Get the started executor of a key, creating and starting it if needed."""
+        is_docker = key[0] != NATIVE_ENV and not key[0].startswith(KERNEL_ENV)
+        created = False
+        while True:
+            evicted = []
+            with self._lock:
+                evicted.extend(self._pop_idle(time.monotonic() - self.idle_timeout))
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["in_use"] += 1
+                    break
+                if is_docker and self._n_containers() >= self.max_containers:
+                    # Make room by stopping the least recently used idle container
+                    idle = [
+                        (entry["last_used"], k) for k, entry in self._entries.items()
+                        if entry["docker"] and entry["in_use"] == 0
+                    ]
+                    if idle:
+                        lru_key = min(idle)[1]
+                        evicted.append((lru_key, self._entries.pop(lru_key)["executor"]))
+                if not is_docker or self._n_containers() < self.max_containers:
+                    # Reserve the slot before starting outside of the lock
+                    entry = {"executor": None, "in_use": 1, "last_used": time.monotonic(), "docker": is_docker}
+                    self._entries[key] = entry
+                    created = True
+                    break
+            await self._stop(evicted)
+            # Every container is busy, wait for one to be released
+            await asyncio.sleep(0.5)
+        await self._stop(evicted)
+
+        if created:
+            try:
+                executor = self._create_executor(key)
+                await executor.start()
+            except Exception:
+                with self._lock:
+                    self._entries.pop(key, None)
+                raise
+            entry["executor"] = executor
+        else:
+            # Another caller is still starting this executor
+            while entry["executor"] is None and key in self._entries:
+                await asyncio.sleep(0.1)
+            if entry["executor"] is None:
+                raise RuntimeError("Executor " + str(key) + " failed to start.")
+        return entry
+
+    @asynccontextmanager
+    async def executor(
+            self,
+            docker_image: Optional[str],
+            work_dir: str,
+            use_docker: bool = True,
+            kernel: Optional[str] = None,
+            ):
+        """
+        Borrow the warm executor of an image (or the native environment) and work dir.
+
+        Args:
+            docker_image (str, optional): Docker image to run in, ignored when
+                                          `use_docker` is False.
+            work_dir (str): Host work directory of the executor.
+            use_docker (bool, optional): Run in docker (default) or natively.
+            kernel (str, optional): Jupyter kernel name. When given, a persistent
+                                    native kernel is used instead, one per work dir
+                                    (i.e. per session and task).
+
+        Yields:
+            CodeExecutor: A started executor. It stays running after the block.
+        """
+        key = self.make_key(docker_image, work_dir, use_docker, kernel)
+        entry = await self._acquire(key)
+        try:
+            yield entry["executor"]
+        finally:
+            with self._lock:
+                entry["in_use"] -= 1
+                entry["last_used"] = time.monotonic()
+
+    def stats(self) -> dict:
+        """
+        Report pool usage.
+
+        Returns:
+            dict: Number of pooled executors, running containers and busy executors.
+        """
+        with self._lock:
+            return {
+                "executors": len(self._entries),
+                "containers": self._n_containers(),
+                "in_use": sum(1 for entry in self._entries.values() if entry["in_use"] > 0),
+                "max_containers": self.max_containers,
+            }
+
+
+# Process-wide pool shared by every executor subgraph
+_EXECUTOR_POOL: Optional[ExecutorPool] = None
+_POOL_LOCK = threading.Lock()
+
+#######################################
+# Get the shared executor pool
+# Globals:
+#   coder_config (read for pool limits)
+#   _EXECUTOR_POOL (created on first call)
+# Arguments:
+#   None (uses global configuration)
+# Returns:
+#   ExecutorPool: Process-wide executor pool
+#######################################
+def get_executor_pool() -> ExecutorPool:
+    """
+    Return the process-wide executor pool, created on first use.
+
+    Limits come from coder_config.MAX_CONTAINERS and coder_config.EXECUTOR_IDLE_TIMEOUT.
+
+    Returns:
+        ExecutorPool: Shared executor pool.
+    """
+    global _EXECUTOR_POOL
+    with _POOL_LOCK:
+        if _EXECUTOR_POOL is None:
+            _EXECUTOR_POOL = ExecutorPool(
+                max_containers=coder_config.MAX_CONTAINERS,
+                idle_timeout=coder_config.EXECUTOR_IDLE_TIMEOUT,
+            )
+    return _EXECUTOR_POOL
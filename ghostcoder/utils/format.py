@@ -6,9 +6,18 @@
 # and web content loading. Essential for processing LLM responses and formatting
 # output in bioinformatics analysis workflows.
 
+import io
 import re
 import json
+import time
+import threading
+from typing import Optional
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
 from langchain_unstructured import UnstructuredLoader
+from ghostcoder.config import cache_config
+from ghostcoder.utils.cache import get_web_cache
 
 #######################################
 # Extract Python code blocks from text content
@@ -196,15 +205,75 @@ def critique_report_2md(d: dict, level: int = 1) -> str:
 
 
 #######################################
-# Load and extract content from web URLs with retry mechanism
+# Fetch a web page, conditionally when a cached copy exists
 # Globals:
 #   None (uses local variables only)
 # Arguments:
+#   web_url (str): URL of the page
+#   etag (str, optional): Cached ETag, sent as If-None-Match
+#   last_modified (str, optional): Cached Last-Modified, sent as If-Modified-Since
+#   timeout (float, optional): Request timeout in seconds
+# Returns:
+#   dict: HTTP status, body, content type and the page's ETag / Last-Modified headers
+#######################################
+def fetch_webpage(
+        web_url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        timeout: Optional[float] = None,
+        ) -> dict:
+    """
+    Send a (conditional) GET request for a web page.
+
+    With the validators of a cached copy the server can answer 304 Not Modified
+    instead of sending the page again, and a changed page comes back in the same
+    round trip, with the validators to cache it under.
+
+    Args:
+        web_url (str): URL of the page.
+        etag (str, optional): Cached ETag, sent as If-None-Match.
+        last_modified (str, optional): Cached Last-Modified, sent as If-Modified-Since.
+        timeout (float, optional): Request timeout in seconds. Defaults to 10.
+
+    Returns:
+        dict: 'status' (HTTP status code, 0 on network failure), 'content' (body
+              bytes), 'content_type', and the 'etag' and 'last_modified' headers
+              of the current page (None if absent).
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    try:
+        response = requests.get(
+            web_url,
+            headers=headers,
+            timeout=timeout or 10,
+            allow_redirects=True,
+            )
+    except Exception as e:
+        return {"status": 0, "content": b"", "content_type": None, "etag": None, "last_modified": None, "error": e}
+    content_type = response.headers.get('Content-Type')
+    return {
+        "status": response.status_code,
+        "content": response.content,
+        "content_type": content_type.split(';')[0].strip() if content_type else None,
+        "etag": response.headers.get('ETag'),
+        "last_modified": response.headers.get('Last-Modified'),
+    }
+
+#######################################
+# Load and extract content from web URLs with retry mechanism
+# Globals:
+#   cache_config (read for WEB_CACHE_OFFLINE)
+# Arguments:
 #   web_url (str): URL to load content from
+#   timeout (float, optional): Per-request timeout in seconds
 # Returns:
 #   str: Concatenated page content from all loaded documents
 #######################################
-def webcontent_str_loader(web_url: str) -> str:
+def webcontent_str_loader(web_url: str, timeout: Optional[float] = None) -> str:
     """
     Loads content from a web URL using UnstructuredLoader.
     
@@ -216,27 +285,66 @@ def webcontent_str_loader(web_url: str) -> str:
     Attempts to load the content up to three times if exceptions occur.
     Concatenates the page_content of each document into a single string.
 
+    Loaded pages are kept in the shared web page cache (see get_web_cache). A cached
+    page is returned directly while younger than cache_config.WEB_CACHE_TTL_HOURS;
+    once expired it is fetched with a conditional GET on its ETag / Last-Modified, so
+    an unchanged page costs one request and no re-extraction. Fresh pages are fetched
+    with a single GET, whose validators are cached with the page.
+    With cache_config.WEB_CACHE_OFFLINE set, only cached pages are returned and the
+    network is never used (even with the cache disabled), so crawls can be replayed
+    offline.
+
     Args:
         web_url (str): The URL to load content from. Should be a valid HTTP/HTTPS URL
                       pointing to a web page with extractable content.
+        timeout (float, optional): Timeout in seconds of each HTTP request. Defaults to
+                                   None, which keeps the request default.
 
     Returns:
         str: The concatenated page content from all loaded documents. Returns an empty 
              string if all attempts fail or if no content is found.
     """
-    # Initialize the UnstructuredLoader with the provided web URL
-    # UnstructuredLoader handles various document formats and web content extraction
-    loader = UnstructuredLoader(web_url=web_url)
+    # Serve from the web page cache when possible
+    cache = get_web_cache()
+    entry = cache.get(web_url) if cache is not None else None
+    if cache_config.WEB_CACHE_OFFLINE:
+        if entry is not None:
+            return entry['content']
+        print(f"Offline mode, {web_url} is not cached. Returning empty string.")
+        return ''
+    if entry is not None and not entry['expired']:
+        return entry['content']
     
     # Initialize an empty string to store the concatenated page content
     page_content = ''
+    response = None
     
     # Attempt to load the content up to 3 times for reliability
     # This handles temporary network issues and server unavailability
     for attempt in range(3):
         try:
-            # Load the content from the web URL
-            # The loader processes the page and extracts structured content
+            # Fetch the page, an expired cached copy is revalidated in the same request
+            response = fetch_webpage(
+                web_url,
+                etag=entry['etag'] if entry is not None else None,
+                last_modified=entry['last_modified'] if entry is not None else None,
+                timeout=timeout,
+                )
+            if response['status'] == 304 and entry is not None:
+                cache.touch(web_url)
+                return entry['content']
+            if response['status'] == 0:
+                raise response['error']
+            if response['status'] >= 400:
+                raise RuntimeError(f"HTTP {response['status']} from {web_url}")
+            
+            # Extract the content of the fetched page
+            # UnstructuredLoader processes the page and extracts structured content
+            loader = UnstructuredLoader(
+                file=io.BytesIO(response['content']),
+                metadata_filename=web_url,
+                content_type=response['content_type'],
+                )
             res = loader.load()
             
             # Check if the result is not empty before processing
@@ -263,6 +371,96 @@ def webcontent_str_loader(web_url: str) -> str:
             # notify the user that all attempts have been exhausted
             if attempt == 2:
                 print("All attempts failed. Returning empty string.")
+
+    # Keep the page with the validators of the response it came from
+    if cache is not None and len(page_content) > 0:
+        cache.put(
+            web_url,
+            page_content,
+            etag=response['etag'],
+            last_modified=response['last_modified'],
+            )
     
     # Return the concatenated page content (empty string if all attempts failed)
     return page_content
+
+
+#######################################
+# Load content from several web URLs concurrently
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   web_urls (list[str]): URLs to load content from
+#   max_workers (int): Size of the fetch worker pool
+#   max_per_host (int): Maximum concurrent requests to a single host
+#   timeout (float): Per-request timeout in seconds
+#   deadline (float): Total time budget of the whole fetch stage in seconds
+# Returns:
+#   dict[str, str]: Page content of every URL that finished within the deadline
+#######################################
+def webcontent_batch_loader(
+        web_urls: list[str],
+        max_workers: int = 5,
+        max_per_host: int = 2,
+        timeout: float = 20,
+        deadline: float = 60,
+        ) -> dict[str, str]:
+    """
+    Loads content from several web URLs concurrently with a bounded worker pool.
+
+    Each URL is fetched with webcontent_str_loader in a thread pool. Requests to the
+    same host are limited to `max_per_host` at a time so a single documentation site
+    is not hammered, each HTTP request is bounded by `timeout`, and the whole stage is
+    bounded by `deadline`. Pages still loading when the deadline is reached are left
+    behind, so one slow site no longer stalls the crawler.
+
+    Args:
+        web_urls (list[str]): The URLs to load. Duplicates are fetched once.
+        max_workers (int, optional): Number of fetch threads. Defaults to 5.
+        max_per_host (int, optional): Concurrent requests allowed per host. Defaults to 2.
+        timeout (float, optional): Timeout in seconds of each HTTP request. Defaults to 20.
+        deadline (float, optional): Time budget in seconds for the whole batch. Defaults to 60.
+
+    Returns:
+        dict[str, str]: Mapping from URL to page content for every URL that finished
+                        before the deadline. Slow or failed URLs are absent, so callers
+                        get partial results instead of an exception.
+    """
+    unique_urls = list(dict.fromkeys(web_urls))
+    if len(unique_urls) == 0:
+        return {}
+
+    # One semaphore per host bounds concurrent requests to the same site
+    host_limits = {}
+    for url in unique_urls:
+        host = urlparse(url).netloc
+        if host not in host_limits:
+            host_limits[host] = threading.BoundedSemaphore(max(1, int(max_per_host)))
+
+    def fetch(url: str) -> str:
+        with host_limits[urlparse(url).netloc]:
+            return webcontent_str_loader(url, timeout=timeout)
+
+    contents = {}
+    stage_end = time.monotonic() + deadline
+    pool = ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(unique_urls))))
+    try:
+        pending = {pool.submit(fetch, url): url for url in unique_urls}
+        while pending:
+            remaining = stage_end - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                try:
+                    contents[url] = future.result()
+                except Exception as e:
+                    print(f"Failed to load {url}: {e}")
+        for url in pending.values():
+            print(f"Deadline reached, skipped loading {url}.")
+    finally:
+        # Do not block on pages still loading after the deadline
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return contents
@@ -7,10 +7,21 @@
 # in bioinformatics analysis projects.
 
 import os 
+import sys
+import json
 import shutil
+import hashlib
+import threading
 import subprocess
+from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
 from ghostcoder.config import *
 
+try:
+    import fcntl
+except ImportError:  # Windows, no reflinks
+    fcntl = None
+
 #######################################
 # Create and organize task-specific directory structure
 # Globals:
@@ -146,23 +157,197 @@ def create_dir(dir: str, verbose: bool = False) -> None:
         print(f"Created directory: {dir}")  # Fixed typo: "direction" -> "directory"
 
 #######################################
-# Copy files from source to destination directory
+# INCREMENTAL FILE SYNC
+# Input data is reflinked (or hardlinked, if enabled) into task dirs when possible
+# and only copied when needed; unchanged files are skipped using a sync manifest
+#######################################
+
+# Sync manifests live in the cache dir, one per destination, so task dirs only hold
+# input data (data/ is listed to the LLM and globbed by generated code)
+SYNC_MANIFEST_DIR = "sync_manifests"
+_LEGACY_SYNC_MANIFEST_FILE = ".ghostcoder_sync.json" # Kept in destinations by earlier versions
+_COPY_BUFFER_SIZE = 16 * 1024 * 1024
+# Linux FICLONE ioctl, copy-on-write clone on btrfs/XFS/overlayfs...
+_FICLONE = 0x40049409
+
+#######################################
+# Get the sync manifest path of a destination directory
+# Globals:
+#   cache_config (read for CACHE_DIR)
+# Arguments:
+#   destination_dir (str): Sync destination
+# Returns:
+#   str: Manifest path in the cache dir
+#######################################
+def sync_manifest_path(destination_dir: str) -> str:
+    """
+    Return the sync manifest path of a destination directory.
+
+    Manifests are kept in <CACHE_DIR>/sync_manifests, keyed by the absolute
+    destination path, instead of inside the destination.
+
+    Args:
+        destination_dir (str): Destination directory of copy_files.
+
+    Returns:
+        str: Path of the destination's manifest file.
+    """
+    key = hashlib.sha1(os.path.abspath(destination_dir).encode('utf-8')).hexdigest()
+    return os.path.join(cache_config.CACHE_DIR, SYNC_MANIFEST_DIR, key + ".json")
+
+#######################################
+# Hash the content of a file
 # Globals:
 #   None (uses local variables only)
 # Arguments:
+#   path (str): File to hash
+# Returns:
+#   str: Hex BLAKE2b digest
+#######################################
+def hash_file(path: str) -> str:
+    """
+    Compute the content hash of a file, reading it in blocks.
+
+    Args:
+        path (str): File to hash.
+
+    Returns:
+        str: Hex BLAKE2b digest of the file content.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_COPY_BUFFER_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def _reflink(src_path: str, dst_path: str) -> bool:
+    """Clone a file copy-on-write, return False if the filesystem cannot."""
+    if fcntl is None or sys.platform != "linux":
+        return False
+    try:
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        shutil.copystat(src_path, dst_path)
+        return True
+    except OSError:
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        return False
+
+def _copy_with_progress(src_path: str, dst_path: str, on_block: Optional[Callable[[bytes], None]]) -> None:
+    """Copy a file block by block, passing every block to on_block, then its metadata."""
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        for block in iter(lambda: src.read(_COPY_BUFFER_SIZE), b''):
+            dst.write(block)
+            if on_block is not None:
+                on_block(block)
+    shutil.copystat(src_path, dst_path)
+
+#######################################
+# Place one file into the destination
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   src_path (str): Source file
+#   dst_path (str): Destination file, replaced atomically
+#   link_mode (str): "auto", "reflink", "hardlink" or "copy"
+#   on_block (Callable): Called with every copied block
+# Returns:
+#   str: How the file was placed, "reflinked", "linked" or "copied"
+#######################################
+def place_file(
+        src_path: str,
+        dst_path: str,
+        link_mode: str = "auto",
+        on_block: Optional[Callable[[bytes], None]] = None,
+        ) -> str:
+    """
+    Put a copy of a file at a destination path, as cheaply as the filesystem allows.
+
+    Link modes:
+    - "auto": reflink, else hardlink when on the same filesystem, else copy
+    - "reflink": reflink, else copy
+    - "hardlink": hardlink when on the same filesystem, else copy
+    - "copy": always copy
+
+    A reflink is a copy-on-write clone, as safe as a copy. A hardlink shares the
+    file with the source, so code writing into the file in place also changes the
+    source; use "reflink" or "copy" if analysis code may modify its inputs.
+    The file is written next to the destination and renamed over it, so an
+    interrupted sync never leaves a partial file behind.
+
+    Args:
+        src_path (str): Source file.
+        dst_path (str): Destination file path.
+        link_mode (str, optional): See above. Defaults to "auto".
+        on_block (Callable, optional): Called with every copied block, e.g. to report
+                                       progress or hash the content while copying.
+
+    Returns:
+        str: "reflinked", "linked" or "copied".
+    """
+    tmp_path = dst_path + ".ghostcoder-tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    same_fs = os.stat(src_path).st_dev == os.stat(os.path.dirname(dst_path) or ".").st_dev
+    try:
+        if link_mode in ("auto", "reflink") and _reflink(src_path, tmp_path):
+            method = "reflinked"
+        elif link_mode in ("auto", "hardlink") and same_fs:
+            try:
+                os.link(src_path, tmp_path)
+                method = "linked"
+            except OSError:
+                # e.g. filesystems without hardlinks, or cross-mount bind paths
+                _copy_with_progress(src_path, tmp_path, on_block)
+                method = "copied"
+        else:
+            _copy_with_progress(src_path, tmp_path, on_block)
+            method = "copied"
+        os.replace(tmp_path, dst_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return method
+
+#######################################
+# Copy files from source to destination directory
+# Globals:
+#   file_config (read for copy mode, link mode and workers)
+# Arguments:
 #   source_dir (str): Source directory containing files to copy
 #   destination_dir (str): Target directory for copied files
 #   verbose (bool): Whether to print copy operation messages
+#   mode (str, optional): "sync" or "copy"
+#   link_mode (str, optional): How sync places files
+#   max_workers (int, optional): Files placed in parallel
+#   progress (Callable, optional): Called with the running report
 # Returns:
-#   list[str]: List of successfully copied file names
+#   list[str]: List of file names in the destination directory
 #######################################
-def copy_files(source_dir: str, destination_dir: str, verbose: bool = False) -> list[str]:
+def copy_files(
+        source_dir: str,
+        destination_dir: str,
+        verbose: bool = False,
+        mode: Optional[str] = None,
+        link_mode: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        progress: Optional[Callable[[dict], None]] = None,
+        ) -> list[str]:
     """
     Copy files from source directory to destination directory.
     
     This function copies all files (not directories) from the source directory
     to the destination directory, preserving file metadata. Used for organizing
     input data and results in BIA-Ghostcoder analysis workflows.
+
+    In "sync" mode (the default, file_config.COPY_MODE) the copy is incremental:
+    a file whose size and mtime match the last sync (recorded in a manifest in the
+    cache dir, see sync_manifest_path) is skipped; if only its mtime changed, its content hash decides.
+    Changed files are reflinked (or hardlinked, if link_mode allows) when possible
+    (see place_file) and copied otherwise, several files in parallel. "copy" mode
+    copies every file. Files hardlinked by an earlier sync are placed again when
+    link_mode does not allow hardlinks.
     
     Args:
         source_dir (str): The source directory path containing files to copy.
@@ -171,31 +356,129 @@ def copy_files(source_dir: str, destination_dir: str, verbose: bool = False) ->
                               Must be an existing directory with write permissions.
         verbose (bool, optional): Whether to print detailed copy operation messages.
                                  Defaults to False for quiet operation.
+        mode (str, optional): "sync" or "copy". Defaults to file_config.COPY_MODE.
+        link_mode (str, optional): "auto", "reflink", "hardlink" or "copy".
+                                  Defaults to file_config.COPY_LINK_MODE.
+        max_workers (int, optional): Files placed in parallel.
+                                    Defaults to file_config.COPY_MAX_WORKERS.
+        progress (Callable, optional): Called with the running report (files,
+                                      done, bytes_total, bytes_done and counts per
+                                      method) while copying and after every file.
     
     Returns:
-        list[str]: A list of file names that were successfully copied. Empty list
-                  if no files were copied or source directory is empty.
+        list[str]: A list of file names that are now in the destination directory
+                  (copied, linked or unchanged). Empty list if the source
+                  directory has no files.
     """
-    # Initialize list to track successfully copied items
-    items = []
-    
-    # Iterate through all items in the source directory
-    for item in os.listdir(source_dir):
+    mode = mode or file_config.COPY_MODE
+    link_mode = link_mode or file_config.COPY_LINK_MODE
+    max_workers = max_workers or file_config.COPY_MAX_WORKERS
+    if mode == "copy":
+        link_mode = "copy"
+
+    # Collect the files to sync, only files, not directories to avoid complex nested operations
+    files = []
+    for item in sorted(os.listdir(source_dir)):
         src_path = os.path.join(source_dir, item)
-        dst_path = os.path.join(destination_dir, item)
-        
-        # Only copy files, not directories to avoid complex nested operations
         if os.path.isfile(src_path):
-            # Use copy2 to preserve file metadata (timestamps, permissions)
-            shutil.copy2(src_path, dst_path)
-            items.append(item)
-            if verbose:
-                print(f"File {item} successfully copied to destination directory.")
-        else:
-            if verbose:
-                print(f"{item} is not a file, it will not be copied to destination directory.")
+            files.append((item, os.stat(src_path)))
+        elif verbose:
+            print(f"{item} is not a file, it will not be copied to destination directory.")
+
+    # Load the state of the last sync
+    manifest_path = sync_manifest_path(destination_dir)
+    legacy_path = os.path.join(destination_dir, _LEGACY_SYNC_MANIFEST_FILE)
+    previous = {}
+    if mode == "sync":
+        for path in (manifest_path, legacy_path):
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    previous = json.load(f)
+                break
+            except (OSError, ValueError):
+                previous = {}
+
+    report = {
+        "files": len(files), "done": 0,
+        "bytes_total": sum(stat.st_size for _, stat in files), "bytes_done": 0,
+        "skipped": 0, "reflinked": 0, "linked": 0, "copied": 0,
+    }
+    lock = threading.Lock()
+    manifest = {}
+
+    def add_bytes(n: int) -> None:
+        with lock:
+            report["bytes_done"] += n
+            if progress is not None:
+                progress(dict(report))
+
+    def sync_one(item: str, src_stat: os.stat_result) -> None:
+        src_path = os.path.join(source_dir, item)
+        dst_path = os.path.join(destination_dir, item)
+        record = {"size": src_stat.st_size, "mtime_ns": src_stat.st_mtime_ns}
+        method = None
+        if mode == "sync" and os.path.exists(dst_path):
+            dst_stat = os.stat(dst_path)
+            last = previous.get(item, {})
+            dst_matches = (dst_stat.st_size == last.get("size") and dst_stat.st_mtime_ns == last.get("dst_mtime_ns"))
+            if os.path.samefile(src_path, dst_path):
+                # Hardlinked by an earlier sync, kept only while hardlinks are allowed,
+                # else placed again so the task dir no longer aliases the source
+                if link_mode in ("auto", "hardlink"):
+                    method = "skipped"
+                    record["hash"] = last.get("hash")
+            elif dst_matches and src_stat.st_size == last.get("size"):
+                if src_stat.st_mtime_ns == last.get("mtime_ns"):
+                    method = "skipped"
+                    record["hash"] = last.get("hash")
+                elif last.get("hash"):
+                    # Touched but maybe not changed, the content hash decides
+                    record["hash"] = hash_file(src_path)
+                    if record["hash"] == last["hash"]:
+                        method = "skipped"
+        if method is None:
+            # Hash copies while copying, links are cheap to redo and are not hashed
+            hasher = hashlib.blake2b(digest_size=20)
+
+            def on_block(block: bytes) -> None:
+                hasher.update(block)
+                add_bytes(len(block))
+
+            method = place_file(src_path, dst_path, link_mode, on_block)
+            if method == "copied":
+                record["hash"] = hasher.hexdigest()
+        if method != "copied":
+            add_bytes(src_stat.st_size)
+        record["dst_mtime_ns"] = os.stat(dst_path).st_mtime_ns
+        with lock:
+            manifest[item] = record
+            report[method] += 1
+            report["done"] += 1
+            if progress is not None:
+                progress(dict(report))
+        if verbose:
+            print(f"File {item} {method} to destination directory.")
+
+    # Place files in parallel, large copies overlap instead of running one by one
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for future in [pool.submit(sync_one, item, stat) for item, stat in files]:
+            future.result()
+
+    if mode == "sync":
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+    # Drop a manifest left in the destination by earlier versions
+    if os.path.exists(legacy_path):
+        try:
+            os.remove(legacy_path)
+        except OSError:
+            pass
 
-    return items 
+    return [item for item, _ in files]
 
 
 
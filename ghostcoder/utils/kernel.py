@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder Kernel Executor
+# Runs generated Python/R code in a long-lived Jupyter kernel (IPython or IRkernel),
+# so objects loaded by one code block, such as a multi-GB AnnData or Seurat object,
+# stay in memory for the following blocks and error-fix retries.
+
+import re
+import asyncio
+import logging
+from typing import Optional
+
+from autogen_core import CancellationToken
+from autogen_core.code_executor import CodeBlock, CodeResult
+
+logger = logging.getLogger(__name__)
+
+# Strip terminal colors from kernel tracebacks
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+#######################################
+# KERNEL EXECUTOR
+#######################################
+
+class KernelCodeExecutor:
+    """
+    Code executor backed by one long-lived Jupyter kernel.
+
+    Exposes the same `start` / `stop` / `restart` / `execute_code_blocks` methods as
+    the autogen command-line executors, so it can be pooled and called the same
+    way. Unlike them, every code block runs in the same interpreter: variables,
+    imports and loaded datasets persist between blocks until the kernel is
+    stopped or restarted.
+    """
+
+    def __init__(self, kernel_name: str, work_dir: str, timeout: float = 600):
+        """
+        Create a kernel executor (the kernel is started by `start`).
+
+        Args:
+            kernel_name (str): Jupyter kernel spec, e.g. "python3" or "ir".
+            work_dir (str): Working directory of the kernel process.
+            timeout (float, optional): Seconds a code block may run before the kernel
+                                       is interrupted. Defaults to 600.
+        """
+        self.kernel_name = kernel_name
+        self.work_dir = work_dir
+        self.timeout = timeout
+        self._manager = None
+        self._client = None
+
+    async def start(self) -> None:
+        """
+        Start the kernel and wait until it answers.
+
+        Raises:
+            ImportError: If jupyter_client is not installed.
+        """
+        if self._manager is not None:
+            return
+        try:
+            from jupyter_client import AsyncKernelManager
+        except ImportError as e:
+            raise ImportError(
+                "Kernel execution mode needs jupyter_client with the ipykernel (Python) "
+                "or IRkernel (R) kernels installed."
+            ) from e
+        manager = AsyncKernelManager(kernel_name=self.kernel_name)
+        await manager.start_kernel(cwd=self.work_dir)
+        client = manager.client()
+        client.start_channels()
+        try:
+            await client.wait_for_ready(timeout=60)
+        except Exception:
+            client.stop_channels()
+            await manager.shutdown_kernel(now=True)
+            raise
+        self._manager, self._client = manager, client
+        logger.info("Started " + self.kernel_name + " kernel in " + self.work_dir)
+
+    async def stop(self) -> None:
+        """Shut the kernel down, dropping everything held in memory."""
+        if self._manager is None:
+            return
+        self._client.stop_channels()
+        await self._manager.shutdown_kernel(now=True)
+        self._manager, self._client = None, None
+        logger.info("Stopped " + self.kernel_name + " kernel in " + self.work_dir)
+
+    async def restart(self) -> None:
+        """Restart the kernel with an empty namespace."""
+        await self.stop()
+        await self.start()
+
+    async def is_alive(self) -> bool:
+        """Whether the kernel process is running."""
+        return self._manager is not None and await self._manager.is_alive()
+
+    async def execute_code_blocks(
+            self,
+            code_blocks: list[CodeBlock],
+            cancellation_token: Optional[CancellationToken] = None,
+            ) -> CodeResult:
+        """
+        Run code blocks one after another in the kernel.
+
+        Execution stops at the first failing block. A block running longer than
+        `timeout` is interrupted, which keeps the kernel and its state alive. A dead
+        kernel is restarted before running, its state is lost.
+
+        Args:
+            code_blocks (list[CodeBlock]): Code blocks to run. Their language is
+                                           expected to match the kernel.
+            cancellation_token (CancellationToken, optional): Interrupts the running
+                                                              block when cancelled.
+
+        Returns:
+            CodeResult: exit_code 0 on success, 1 on error, 124 on timeout, with the
+                        collected stdout, stderr, results and tracebacks as output.
+        """
+        if not await self.is_alive():
+            if self._manager is not None:
+                logger.warning("Kernel " + self.kernel_name + " died, restarting with an empty namespace.")
+            await self.restart()
+
+        outputs = []
+        exit_code = 0
+        for block in code_blocks:
+            exit_code = await self._execute(block.code, outputs, cancellation_token)
+            if exit_code != 0:
+                break
+        return CodeResult(exit_code=exit_code, output="".join(outputs))
+
+    async def _execute(self, code: str, outputs: list, cancellation_token: Optional[CancellationToken]) -> int:
+        """Run one code block, appending its output, and return its exit code."""
+
+        def collect(msg: dict) -> None:
+            msg_type = msg["msg_type"]
+            content = msg["content"]
+            if msg_type == "stream":
+                outputs.append(content["text"])
+            elif msg_type in ("execute_result", "display_data"):
+                text = content.get("data", {}).get("text/plain")
+                if text:
+                    outputs.append(text + "\n")
+            elif msg_type == "error":
+                outputs.append(_ANSI_ESCAPE.sub("", "\n".join(content["traceback"])) + "\n")
+
+        task = asyncio.ensure_future(
+            # stop_on_error=False: an interrupted block must not abort the next queued one
+            self._client.execute_interactive(code, timeout=self.timeout, output_hook=collect, stop_on_error=False)
+        )
+        if cancellation_token is not None:
+            cancellation_token.link_future(task)
+        try:
+            reply = await task
+        except TimeoutError:
+            # Stop the running block but keep the kernel and its state
+            await self._manager.interrupt_kernel()
+            outputs.append(f"Execution interrupted after {self.timeout} seconds.\n")
+            return 124
+        except asyncio.CancelledError:
+            await self._manager.interrupt_kernel()
+            if cancellation_token is not None and cancellation_token.is_cancelled():
+                outputs.append("Execution cancelled.\n")
+                return 1
+            raise
+        return 0 if reply["content"]["status"] == "ok" else 1
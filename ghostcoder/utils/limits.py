@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder Concurrency Limits
+# Caps the number of LLM calls in flight across every task running in the process.
+# Graph nodes call models from worker threads (sync nodes) and from the event loop
+# (async nodes), so the limiter works for both. Containers are capped separately by
+# the executor pool (coder_config.MAX_CONTAINERS).
+
+import asyncio
+import weakref
+import threading
+from collections import deque
+from typing import Any, Optional
+from contextlib import contextmanager, asynccontextmanager
+
+from ghostcoder.config import ghostcoder_config
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+#######################################
+# CALL LIMITER
+#######################################
+
+class CallLimiter:
+    """
+    Counting limiter shared by threads and event loops.
+
+    Threads wait on an event and coroutines on a future of their own loop, so
+    waiting never ties up a worker thread (the calls themselves may need one).
+    Slots are handed out in arrival order. Unlike a semaphore the limit can be
+    changed while calls are running; a limit of 0 or less means unlimited.
+    """
+
+    def __init__(self, limit: int):
+        """
+        Create a limiter.
+
+        Args:
+            limit (int): Maximum number of concurrent calls, 0 for unlimited.
+        """
+        self.limit = limit
+        self._active = 0
+        self._waiters = deque()  # threading.Event or (loop, future)
+        self._lock = threading.Lock()
+
+    def _has_free_slot(self) -> bool:
+        return self.limit <= 0 or self._active < self.limit
+
+    def _wake(self) -> None:
+        # Hand free slots to waiters, called with the lock held
+        while self._waiters and self._has_free_slot():
+            waiter = self._waiters.popleft()
+            self._active += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: asyncio.Future) -> None:
+        # Runs in the waiter's loop; a waiter cancelled in the meantime gives its slot back
+        if future.cancelled():
+            self.release()
+        elif not future.done():
+            future.set_result(None)
+
+    def acquire(self) -> None:
+        """Block until a call slot is free and take it."""
+        with self._lock:
+            if not self._waiters and self._has_free_slot():
+                self._active += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def aacquire(self) -> None:
+        """Wait until a call slot is free and take it, without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._has_free_slot():
+                self._active += 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # The slot was already granted (else _grant gives it back)
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Give a call slot back."""
+        with self._lock:
+            self._active -= 1
+            self._wake()
+
+    def set_limit(self, limit: int) -> None:
+        """Change the limit, waking waiters if it was raised."""
+        with self._lock:
+            self.limit = limit
+            self._wake()
+
+    @contextmanager
+    def slot(self):
+        """Hold a call slot for the duration of a `with` block."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """Hold a call slot for the duration of an `async with` block."""
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+#######################################
+# LLM CALL LIMITS
+#######################################
+
+class ConcurrencyLimitedModel(Runnable):
+    """
+    Chat model wrapper holding a limiter slot for every call.
+
+    Composes like the wrapped model (`model | JsonOutputParser()`), and other
+    attributes (model_name, ...) are read from the wrapped model. LLM caching is
+    unchanged since the wrapped model still makes the call.
+    """
+
+    def __init__(self, model: Runnable, limiter: CallLimiter):
+        self.model = model
+        self.limiter = limiter
+
+    @property
+    def InputType(self) -> Any:
+        return self.model.InputType
+
+    @property
+    def OutputType(self) -> Any:
+        return self.model.OutputType
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        with self.limiter.slot():
+            return self.model.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        async with self.limiter.aslot():
+            return await self.model.ainvoke(input, config, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+
+# Process-wide LLM limiter and one wrapper per model, so graphs built from the same
+# models keep sharing their compiled graph. Wrappers are held weakly by model id: a live
+# wrapper keeps its model alive, so the id can't be reused by another object, and the
+# entry goes away with the last graph or agent using the wrapper.
+_LLM_LIMITER: Optional[CallLimiter] = None
+_LIMITED_MODELS: "weakref.WeakValueDictionary[int, ConcurrencyLimitedModel]" = weakref.WeakValueDictionary()
+_LIMITS_LOCK = threading.Lock()
+
+#######################################
+# Get the process-wide LLM call limiter
+# Globals:
+#   ghostcoder_config (read for MAX_LLM_CALLS)
+#   _LLM_LIMITER (created on first call)
+# Arguments:
+#   None (uses global configuration)
+# Returns:
+#   CallLimiter: Shared LLM call limiter
+#######################################
+def get_llm_limiter() -> CallLimiter:
+    """
+    Return the process-wide LLM call limiter, created on first use.
+
+    The limit comes from ghostcoder_config.MAX_LLM_CALLS and can be changed with
+    `get_llm_limiter().set_limit(n)`.
+
+    Returns:
+        CallLimiter: Shared limiter.
+    """
+    global _LLM_LIMITER
+    with _LIMITS_LOCK:
+        if _LLM_LIMITER is None:
+            _LLM_LIMITER = CallLimiter(ghostcoder_config.MAX_LLM_CALLS)
+    return _LLM_LIMITER
+
+#######################################
+# Wrap a model so its calls count against the LLM limit
+# Globals:
+#   _LIMITED_MODELS (read and updated)
+# Arguments:
+#   model (Runnable): Chat model, or None
+# Returns:
+#   Runnable: The limited model, or None
+#######################################
+def limit_llm_calls(model: Optional[Runnable]) -> Optional[Runnable]:
+    """
+    Wrap a chat model so that its calls share the process-wide LLM call limit.
+
+    The same model always gets the same wrapper, and already wrapped models are
+    returned as they are.
+
+    Args:
+        model (Runnable): Chat model, or None.
+
+    Returns:
+        Runnable: ConcurrencyLimitedModel around the model, or None if model is None.
+    """
+    if model is None or isinstance(model, ConcurrencyLimitedModel):
+        return model
+    limiter = get_llm_limiter()
+    with _LIMITS_LOCK:
+        limited = _LIMITED_MODELS.get(id(model))
+        if limited is None:
+            limited = ConcurrencyLimitedModel(model, limiter)
+            _LIMITED_MODELS[id(model)] = limited
+    return limited
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder RefCodeDB Builder
+# Incrementally loads RefCodeDB.csv into the vector store. The table is streamed in
+# chunks and every row is compared by content hash with what is already indexed, so
+# only new or edited rows are embedded and written and removed rows are deleted.
+
+import time
+import numpy as np
+from typing import Callable, Optional
+from sqlalchemy import text
+
+from ghostcoder.utils.vectorindex import (
+    LocalVectorIndex,
+    iter_refcodedb_chunks,
+    refcodedb_document_hash,
+)
+
+#######################################
+# SYNC REPORTING
+# Counters and throughput of one RefCodeDB build
+#######################################
+
+#######################################
+# Create an empty build report
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   backend (str): Vector store backend name
+# Returns:
+#   dict: Report with zeroed counters
+#######################################
+def new_sync_report(backend: str) -> dict:
+    """
+    Create the report of a RefCodeDB build.
+
+    Args:
+        backend (str): "local" or "pgvector".
+
+    Returns:
+        dict: Counters of scanned, added, updated, unchanged and deleted rows,
+              elapsed seconds and throughput in rows per second.
+    """
+    return {
+        "backend": backend,
+        "rows": 0,
+        "added": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "deleted": 0,
+        "seconds": 0.0,
+        "rows_per_s": 0.0,
+        "_start": time.perf_counter(),
+    }
+
+#######################################
+# Update elapsed time and throughput of a build report
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   report (dict): Build report
+# Returns:
+#   dict: The same report
+#######################################
+def _update_throughput(report: dict) -> dict:
+    """Refresh `seconds` and `rows_per_s` of a build report."""
+    report["seconds"] = time.perf_counter() - report["_start"]
+    report["rows_per_s"] = report["rows"] / report["seconds"] if report["seconds"] > 0 else 0.0
+    return report
+
+#######################################
+# Format a build report for printing
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   report (dict): Build report
+# Returns:
+#   str: One-line summary
+#######################################
+def format_sync_report(report: dict) -> str:
+    """
+    Format a build report as one line.
+
+    Args:
+        report (dict): Report returned by the sync functions.
+
+    Returns:
+        str: Row counters, elapsed time and throughput.
+    """
+    return (
+        f"{report['rows']} rows scanned: {report['added']} added, {report['updated']} updated, "
+        f"{report['unchanged']} unchanged, {report['deleted']} deleted "
+        f"in {report['seconds']:.1f}s ({report['rows_per_s']:.1f} rows/s)"
+    )
+
+#######################################
+# Compare one chunk with the indexed rows
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   ids (list[str]): Row ids of the chunk
+#   docs (list[Document]): Documents of the chunk
+#   existing (dict): Indexed row id to content hash
+#   seen (set): Row ids already read from the table, updated
+#   embedding_model (str): Name of the embedding model
+#   report (dict): Build report, counters are updated
+# Returns:
+#   list[tuple[str, Document, str, bool]]: (id, document, hash, changed) per kept row
+#######################################
+def _diff_chunk(ids, docs, existing: dict, seen: set, embedding_model: str, report: dict) -> list:
+    """
+    Hash the rows of one chunk and compare them with the indexed rows.
+
+    Returns one (id, document, content hash, changed) tuple per row, where
+    `changed` is True for new or edited rows. Repeated ids are skipped with a
+    warning, the first occurrence wins.
+    """
+    rows = []
+    for row_id, doc in zip(ids, docs):
+        if row_id in seen:
+            print(f"Warning: Duplicate RefCodeDB row id {row_id}, keeping the first row.")
+            continue
+        seen.add(row_id)
+        report["rows"] += 1
+        content_hash = refcodedb_document_hash(doc, embedding_model)
+        if row_id not in existing:
+            report["added"] += 1
+        elif existing[row_id] != content_hash:
+            report["updated"] += 1
+        else:
+            report["unchanged"] += 1
+        rows.append((row_id, doc, content_hash, existing.get(row_id) != content_hash))
+    return rows
+
+#######################################
+# INCREMENTAL BUILDERS
+# One sync function per RefCodeDB backend
+#######################################
+
+#######################################
+# Incrementally sync RefCodeDB.csv into the local vector index
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   emb_model: Embedding model
+#   csv_path (str): Path to RefCodeDB.csv
+#   index_dir (str): Directory of the local index
+#   name (str): Index name
+#   chunksize (int): Rows read per chunk
+#   progress (Callable, optional): Called with the report after each chunk
+# Returns:
+#   tuple[LocalVectorIndex, dict]: The written index and the build report
+#######################################
+def sync_local_refcodedb(
+        emb_model,
+        csv_path: str,
+        index_dir: str,
+        name: str = "RefCodeDB",
+        chunksize: int = 256,
+        progress: Optional[Callable[[dict], None]] = None,
+        ) -> tuple[LocalVectorIndex, dict]:
+    """
+    Bring the local vector index in line with RefCodeDB.csv.
+
+    Rows whose content hash matches the index keep their stored vector; only new
+    or edited rows are embedded. Rows missing from the table are dropped. The index
+    is rewritten once at the end (atomically, see LocalVectorIndex.save).
+
+    Args:
+        emb_model: Embedding model. Changing it re-embeds every row.
+        csv_path (str): RefCodeDB table.
+        index_dir (str): Index directory, created if missing.
+        name (str, optional): Index name. Defaults to "RefCodeDB".
+        chunksize (int, optional): Rows read and embedded per chunk. Defaults to 256.
+        progress (Callable, optional): Called with the running report after every chunk.
+
+    Returns:
+        tuple[LocalVectorIndex, dict]: The index and the build report.
+    """
+    report = new_sync_report("local")
+    embedding_model = str(getattr(emb_model, "model", ""))
+
+    # Index built so far, rows are matched on id and content hash
+    try:
+        current = LocalVectorIndex(index_dir, name)
+    except FileNotFoundError:
+        current = None
+    existing, positions = {}, {}
+    if current is not None:
+        for pos, (row_id, content_hash) in enumerate(zip(current.ids, current.hashes)):
+            existing[row_id] = content_hash
+            positions[row_id] = pos
+
+    ids, docs, hashes, vectors = [], [], [], []
+    seen = set()
+    for chunk_ids, chunk_docs in iter_refcodedb_chunks(csv_path, chunksize):
+        rows = _diff_chunk(chunk_ids, chunk_docs, existing, seen, embedding_model, report)
+        changed = [doc.page_content for _, doc, _, is_changed in rows if is_changed]
+        embedded = iter(emb_model.embed_documents(changed) if changed else [])
+        for row_id, doc, content_hash, is_changed in rows:
+            if is_changed:
+                vectors.append(np.asarray(next(embedded), dtype=np.float32))
+            else:
+                # Unchanged row, reuse the stored (already normalized) vector
+                vectors.append(np.asarray(current.matrix[positions[row_id]], dtype=np.float32))
+            ids.append(row_id)
+            docs.append(doc)
+            hashes.append(content_hash)
+        if progress is not None:
+            progress(_update_throughput(report))
+
+    report["deleted"] = len([row_id for row_id in existing if row_id not in seen])
+
+    index = LocalVectorIndex.save(
+        index_dir, name, ids, docs,
+        np.vstack(vectors) if vectors else [],
+        embedding_model=embedding_model,
+        hashes=hashes,
+        )
+    return index, _update_throughput(report)
+
+#######################################
+# Read the content hashes stored in a PGVector collection
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   engine: SQLAlchemy engine of the vector database
+#   name (str): Collection name
+# Returns:
+#   dict: Row id to content hash (None for rows loaded without a hash)
+#######################################
+def get_pgvector_hashes(engine, name: str) -> dict:
+    """
+    Read the id and content hash of every row of a PGVector collection.
+
+    Args:
+        engine: SQLAlchemy engine of the vector database.
+        name (str): Collection name.
+
+    Returns:
+        dict: Row id to content hash. Rows loaded before hashes were stored
+              (e.g. by the BuildVectorDB notebook) map to None and are re-embedded once.
+    """
+    query = text(
+        "SELECT e.id, e.cmetadata ->> 'content_hash' "
+        "FROM langchain_pg_embedding e "
+        "JOIN langchain_pg_collection c ON e.collection_id = c.uuid "
+        "WHERE c.name = :name"
+    )
+    with engine.connect() as conn:
+        return {str(row_id): content_hash for row_id, content_hash in conn.execute(query, {"name": name})}
+
+#######################################
+# Incrementally sync RefCodeDB.csv into a PGVector collection
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   emb_model: Embedding model
+#   vector_store (PGVector): Target collection
+#   engine: SQLAlchemy engine of the vector database
+#   csv_path (str): Path to RefCodeDB.csv
+#   name (str): Collection name
+#   chunksize (int): Rows read per chunk
+#   progress (Callable, optional): Called with the report after each chunk
+# Returns:
+#   dict: Build report
+#######################################
+def sync_pgvector_refcodedb(
+        emb_model,
+        vector_store,
+        engine,
+        csv_path: str,
+        name: str = "RefCodeDB",
+        chunksize: int = 256,
+        progress: Optional[Callable[[dict], None]] = None,
+        ) -> dict:
+    """
+    Bring a PGVector collection in line with RefCodeDB.csv.
+
+    Each chunk's new or edited rows are embedded and upserted right away, with
+    their content hash stored in metadata; rows missing from the table are
+    deleted at the end.
+
+    Args:
+        emb_model: Embedding model. Changing it re-embeds every row.
+        vector_store (PGVector): Collection to update.
+        engine: SQLAlchemy engine of the vector database.
+        csv_path (str): RefCodeDB table.
+        name (str, optional): Collection name. Defaults to "RefCodeDB".
+        chunksize (int, optional): Rows read and embedded per chunk. Defaults to 256.
+        progress (Callable, optional): Called with the running report after every chunk.
+
+    Returns:
+        dict: Build report.
+    """
+    report = new_sync_report("pgvector")
+    embedding_model = str(getattr(emb_model, "model", ""))
+    existing = get_pgvector_hashes(engine, name)
+
+    seen = set()
+    for chunk_ids, chunk_docs in iter_refcodedb_chunks(csv_path, chunksize):
+        rows = _diff_chunk(chunk_ids, chunk_docs, existing, seen, embedding_model, report)
+        changed = [row for row in rows if row[3]]
+        if changed:
+            texts = [doc.page_content for _, doc, _, _ in changed]
+            metadatas = [
+                {**doc.metadata, "content_hash": content_hash}
+                for _, doc, content_hash, _ in changed
+            ]
+            # PGVector upserts on id, so edited rows replace their old version
+            vector_store.add_embeddings(
+                texts=texts,
+                embeddings=emb_model.embed_documents(texts),
+                metadatas=metadatas,
+                ids=[row_id for row_id, _, _, _ in changed],
+            )
+        if progress is not None:
+            progress(_update_throughput(report))
+
+    removed = [row_id for row_id in existing if row_id not in seen]
+    if removed:
+        vector_store.delete(ids=removed)
+    report["deleted"] = len(removed)
+    return _update_throughput(report)
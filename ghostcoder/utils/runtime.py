@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder Runtime Detection
+# Deterministic language and runtime detection for generated code blocks. Code fence
+# languages, shebangs and import/library statements identify the language, and the
+# imported packages are matched against the docker image profiles, following the same
+# rules as the executor routing prompt. Only ambiguous blocks need the LLM.
+
+import re
+import json
+import hashlib
+import threading
+from typing import Optional
+from collections import OrderedDict
+
+from ghostcoder.docker import load_docker_profiles
+
+#######################################
+# LANGUAGE DETECTION
+#######################################
+
+# Fence tags, shebang interpreters and names normalized to the executor languages
+LANGUAGE_ALIASES = {
+    "python": "python", "python3": "python", "py": "python", "ipython": "python",
+    "r": "R", "rscript": "R",
+    "bash": "bash", "sh": "bash", "shell": "bash", "zsh": "bash", "console": "bash",
+}
+
+# Script file and command per language, as required by the executor routing prompt
+SCRIPT_COMMANDS = {
+    "python": ("script.py", "python script.py"),
+    "R": ("script.R", "Rscript script.R"),
+    "bash": ("script.sh", "bash script.sh"),
+}
+
+_FENCE_PATTERN = re.compile(r"^\s*```\s*\{?\s*([A-Za-z0-9_+-]+)")
+_SHEBANG_PATTERN = re.compile(r"^#!\s*(?:\S*/env\s+)?(?:\S*/)?([A-Za-z]+)")
+_PYTHON_IMPORT = re.compile(r"^\s*(?:import\s+([A-Za-z_][\w.]*)|from\s+([A-Za-z_][\w.]*)\s+import\b)")
+_PYTHON_SIGNALS = [
+    re.compile(r"^\s*def\s+\w+\s*\(.*\)\s*(->.*)?:\s*$"),
+    re.compile(r"^\s*(for|while|if|elif|with)\b.*:\s*$"),
+    re.compile(r"^\s*(else|try|finally)\s*:\s*$"),
+    re.compile(r"\bf\"|\bf'"),
+]
+_R_LIBRARY = re.compile(r"\b(?:library|require|requireNamespace)\s*\(\s*[\"']?([A-Za-z][\w.]*)")
+_R_NAMESPACE = re.compile(r"\b([A-Za-z][\w.]*)::[A-Za-z.]")
+_R_SIGNALS = [
+    re.compile(r"<-"),
+    re.compile(r"\bfunction\s*\("),
+    re.compile(r"%>%|\|>"),
+    re.compile(r"\bc\("),
+]
+_BASH_SIGNALS = re.compile(
+    r"^\s*(echo|cd|ls|mkdir|cp|mv|rm|cat|wget|curl|tar|gzip|gunzip|pip|conda|mamba|apt-get|"
+    r"export|source|samtools|bcftools|bedtools|cellranger|STAR|fastqc|python|Rscript)\b"
+)
+
+#######################################
+# Detect the language and imported packages of a code block
+# Globals:
+#   LANGUAGE_ALIASES (read for language names)
+# Arguments:
+#   code (str): Code block, optionally in a markdown fence
+# Returns:
+#   tuple[Optional[str], set[str]]: Language or None if ambiguous, imported packages
+#######################################
+def detect_code_language(code: str) -> tuple[Optional[str], set[str]]:
+    """
+    Detect the language of a code block without calling an LLM.
+
+    An explicit fence language (```r) or shebang (#!/usr/bin/env python) decides
+    directly. Otherwise Python and R statements are counted, and a block is
+    classified only when one language clearly dominates; shell commands count when
+    neither Python nor R is found.
+
+    Args:
+        code (str): Code block, optionally wrapped in a markdown code fence.
+
+    Returns:
+        tuple[Optional[str], set[str]]: "python", "R", "bash" or None when
+                                        ambiguous, and the lower-cased names of the
+                                        imported packages/libraries.
+    """
+    lines = code.strip().splitlines()
+    explicit = None
+    if lines:
+        for pattern in (_FENCE_PATTERN, _SHEBANG_PATTERN):
+            match = pattern.match(lines[0])
+            if match and match.group(1).lower() in LANGUAGE_ALIASES:
+                explicit = LANGUAGE_ALIASES[match.group(1).lower()]
+                break
+
+    python_score, r_score, bash_score = 0, 0, 0
+    python_packages, r_packages = set(), set()
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#") or stripped.startswith("```"):
+            continue
+        match = _PYTHON_IMPORT.match(line)
+        if match:
+            python_packages.add((match.group(1) or match.group(2)).split(".")[0].lower())
+            python_score += 2
+        elif any(pattern.search(line) for pattern in _PYTHON_SIGNALS):
+            python_score += 1
+        libraries = _R_LIBRARY.findall(line)
+        if libraries:
+            r_packages.update(lib.lower() for lib in libraries)
+            r_score += 2
+        else:
+            namespaces = _R_NAMESPACE.findall(line)
+            r_packages.update(ns.lower() for ns in namespaces)
+            r_score += int(bool(namespaces) or any(pattern.search(line) for pattern in _R_SIGNALS))
+        if _BASH_SIGNALS.match(line):
+            bash_score += 1
+
+    if explicit is not None:
+        language = explicit
+    elif python_score > 0 and r_score == 0:
+        language = "python"
+    elif r_score > 0 and python_score == 0:
+        language = "R"
+    elif python_score >= 3 * r_score > 0:
+        language = "python"
+    elif r_score >= 3 * python_score > 0:
+        language = "R"
+    elif python_score == 0 and r_score == 0 and bash_score > 0:
+        language = "bash"
+    else:
+        language = None
+
+    packages = {"python": python_packages, "R": r_packages}.get(language, set())
+    return language, packages
+
+
+#######################################
+# RUNTIME SELECTION
+#######################################
+
+#######################################
+# List loaded docker images with their languages and packages
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   docker_status (str): Docker status from the env profiles
+# Returns:
+#   list[dict]: Loaded images in profile order
+#######################################
+def get_loaded_docker_images(docker_status: str) -> list[dict]:
+    """
+    List the profiled docker images that are loaded, with their languages and packages.
+
+    Args:
+        docker_status (str): The 'docker status' text of the env profiles, which
+                             names every loaded profiled image.
+
+    Returns:
+        list[dict]: One dict per loaded image, in profile order, with the `image`
+                    ("name:tag"), lower-cased `languages` and `packages` (first word
+                    of every listed package, e.g. "seurat" for "seurat v5").
+    """
+    images = []
+    for profile in load_docker_profiles()["Docker images"]:
+        image = profile["name"] + ":" + profile["tag"]
+        if image not in docker_status:
+            continue
+        images.append({
+            "image": image,
+            "languages": {lang.strip().lower() for lang in profile["languages"].split(",")},
+            "packages": {
+                pkg.strip().split()[0].lower()
+                for pkg in profile["packages"].split(",") if pkg.strip()
+            },
+        })
+    return images
+
+#######################################
+# List the languages installed natively
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   env_profiles (dict): Runtime environment profiles
+# Returns:
+#   set[str]: Lower-cased language names
+#######################################
+def get_native_languages(env_profiles: dict) -> set[str]:
+    """
+    Read the natively installed languages from the env profiles.
+
+    Args:
+        env_profiles (dict): Env profiles. 'native env languages' is either the
+                             {language: version} dict of get_native_env_perception
+                             or the prompt text the file manager builds from it.
+
+    Returns:
+        set[str]: Lower-cased language names, e.g. {"python", "r"}.
+    """
+    native = env_profiles.get('native env languages', {})
+    if isinstance(native, dict):
+        return {str(name).lower() for name in native}
+    # Prompt text embedding the dict, e.g. "...versions are:\n{'Python': 'Python 3.11.7'}"
+    return {name.lower() for name in re.findall(r"['\"]([^'\"]+)['\"]\s*:", str(native))}
+
+#######################################
+# Choose the runtime of a code block without the LLM
+# Globals:
+#   SCRIPT_COMMANDS (read for script names and commands)
+# Arguments:
+#   code (str): Code block
+#   env_profiles (dict): Runtime environment profiles
+# Returns:
+#   Optional[dict]: Executor routing decision, or None when ambiguous
+#######################################
+def detect_runtime(code: str, env_profiles: dict) -> Optional[dict]:
+    """
+    Decide how to run a code block, following the executor routing prompt's rules.
+
+    R always runs in docker, in the loaded R-capable image covering most of the
+    libraries the block loads (ties go to the first profile). Python and shell
+    prefer the native environment and fall back to docker. Code is always wrapped
+    into a script file.
+
+    Args:
+        code (str): Code block, optionally in a markdown fence.
+        env_profiles (dict): Env profiles with 'native env languages' and 'docker status'.
+
+    Returns:
+        Optional[dict]: Decision with the same keys as the LLM router output
+                        (language, use_docker, docker_image, need_wrapped,
+                        script_file, bash_cmd), or None if the language is ambiguous
+                        or no environment fits and the LLM should decide.
+    """
+    language, packages = detect_code_language(code)
+    if language is None:
+        return None
+
+    native = get_native_languages(env_profiles)
+    native_ok = language == "bash" or (language != "R" and language.lower() in native)
+
+    docker_image = None
+    if not native_ok:
+        candidates = [
+            img for img in get_loaded_docker_images(env_profiles.get('docker status', ''))
+            if language.lower() in img["languages"]
+        ]
+        if not candidates:
+            return None
+        # Stable max keeps the first profile on ties
+        docker_image = max(candidates, key=lambda img: len(packages & img["packages"]))["image"]
+
+    script_file, bash_cmd = SCRIPT_COMMANDS[language]
+    return {
+        "language": language,
+        "use_docker": not native_ok,
+        "docker_image": docker_image,
+        "need_wrapped": True,
+        "script_file": script_file,
+        "bash_cmd": bash_cmd,
+    }
+
+
+#######################################
+# ROUTING DECISION CACHE
+# Decisions (detected or from the LLM) per code block and environment
+#######################################
+
+_RUNTIME_CACHE: OrderedDict = OrderedDict()
+_RUNTIME_CACHE_SIZE = 512
+_RUNTIME_LOCK = threading.Lock()
+
+#######################################
+# Build the routing cache key of a code block
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   code (str): Code block
+#   env_profiles (dict): Runtime environment profiles
+# Returns:
+#   str: Hex SHA-256 digest
+#######################################
+def runtime_cache_key(code: str, env_profiles: dict) -> str:
+    """
+    Hash a code block together with the environments it can be routed to.
+
+    Args:
+        code (str): Code block.
+        env_profiles (dict): Env profiles, only the native languages and docker
+                             status are part of the key.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    environment = json.dumps(
+        [sorted(get_native_languages(env_profiles)), env_profiles.get('docker status', '')]
+    )
+    hasher = hashlib.sha256(code.encode("utf-8"))
+    hasher.update(b"\x00" + environment.encode("utf-8"))
+    return hasher.hexdigest()
+
+def get_cached_runtime(key: str) -> Optional[dict]:
+    """Return the cached routing decision of a key, or None."""
+    with _RUNTIME_LOCK:
+        decision = _RUNTIME_CACHE.get(key)
+        if decision is not None:
+            _RUNTIME_CACHE.move_to_end(key)
+            return dict(decision)
+    return None
+
+def put_cached_runtime(key: str, decision: dict) -> None:
+    """Cache a routing decision, dropping the least recently used ones above the size cap."""
+    with _RUNTIME_LOCK:
+        _RUNTIME_CACHE[key] = dict(decision)
+        _RUNTIME_CACHE.move_to_end(key)
+        while len(_RUNTIME_CACHE) > _RUNTIME_CACHE_SIZE:
+            _RUNTIME_CACHE.popitem(last=False)
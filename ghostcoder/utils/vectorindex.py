@@ -0,0 +1,742 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# BIA-Ghostcoder Local Vector Index
+# Provides an embedded vector index for RefCodeDB that needs no database server.
+# Embeddings live in a memory-mapped NumPy matrix with a JSON sidecar for documents
+# and metadata; exact cosine search and MMR selection are done with vectorized NumPy.
+# A BM25 inverted index over the task, tools and description adds lexical matching,
+# fused with the vector ranking, and metadata filters narrow the candidate rows.
+
+import os
+import re
+import json
+import math
+import codecs
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Any, Iterator, Optional
+
+# LangChain components for documents and retrievers
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from pydantic import ConfigDict
+
+#######################################
+# REFCODEDB TABLE LOADING
+# Functions converting RefCodeDB rows into LangChain documents
+#######################################
+
+# RefCodeDB columns kept as document metadata, the description is embedded
+REFCODEDB_METADATA_COLUMNS = ["CodeBlock", "Omics", "Task", "Tools", "Language", "Source"]
+
+#######################################
+# Convert one RefCodeDB row into a document
+# Globals:
+#   REFCODEDB_METADATA_COLUMNS (read for metadata columns)
+# Arguments:
+#   row (pd.Series or dict): One RefCodeDB row
+# Returns:
+#   Document: Document embedding the description with the code block in metadata
+#######################################
+def refcodedb_row_to_document(row) -> Document:
+    """
+    Convert one RefCodeDB row into a LangChain document.
+
+    The description is used as page content (it is what gets embedded) and the
+    reference code block and its annotations are kept in metadata, matching the
+    layout used when loading RefCodeDB into PGVector.
+
+    Args:
+        row (pd.Series or dict): One row of RefCodeDB.csv.
+
+    Returns:
+        Document: Document with the description as content and the code block,
+                  omics, task, tools, language and source columns as metadata.
+    """
+    metadata = {}
+    for col in REFCODEDB_METADATA_COLUMNS:
+        value = row[col] if col in row else ""
+        metadata[col] = "" if pd.isna(value) else str(value)
+    return Document(page_content=str(row["Description"]), metadata=metadata)
+
+#######################################
+# Compute the content hash of a RefCodeDB document
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   doc (Document): RefCodeDB document
+#   embedding_model (str): Name of the embedding model
+# Returns:
+#   str: Hex SHA-256 digest
+#######################################
+def refcodedb_document_hash(doc: Document, embedding_model: str = "") -> str:
+    """
+    Hash a RefCodeDB document to detect new or edited rows.
+
+    The embedding model name is part of the hash, so switching models marks every
+    row as changed and the whole database is re-embedded.
+
+    Args:
+        doc (Document): Document built by refcodedb_row_to_document.
+        embedding_model (str, optional): Embedding model the row is indexed with.
+
+    Returns:
+        str: Hex SHA-256 digest of the model name, content and metadata.
+    """
+    metadata = {key: value for key, value in doc.metadata.items() if key != "content_hash"}
+    payload = json.dumps(
+        [embedding_model, doc.page_content, metadata],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+#######################################
+# Detect the text encoding of a CSV file
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   csv_path (str): Path to the CSV file
+# Returns:
+#   str: "utf-8" or "cp1252"
+#######################################
+def detect_csv_encoding(csv_path: str) -> str:
+    """
+    Detect whether a CSV file is UTF-8 or cp1252 encoded.
+
+    The file is decoded block by block, so large tables are never held in memory.
+
+    Args:
+        csv_path (str): Path to the CSV file.
+
+    Returns:
+        str: "utf-8" if the whole file decodes as UTF-8, otherwise "cp1252"
+             (tables saved from Excel on Windows).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(csv_path, 'rb') as f:
+        try:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return 'cp1252'
+    return 'utf-8'
+
+#######################################
+# Stream RefCodeDB table as documents in chunks
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   csv_path (str): Path to RefCodeDB.csv
+#   chunksize (int): Rows per chunk
+# Returns:
+#   Iterator[tuple[list[str], list[Document]]]: Row ids and documents, per chunk
+#######################################
+def iter_refcodedb_chunks(
+        csv_path: str,
+        chunksize: int = 256,
+        ) -> Iterator[tuple[list[str], list[Document]]]:
+    """
+    Read RefCodeDB.csv in chunks and convert every row into a document.
+
+    Args:
+        csv_path (str): Path to the RefCodeDB CSV table. The unnamed first column
+                        (the saved DataFrame index) is used as the row id.
+        chunksize (int, optional): Rows read per chunk. Defaults to 256.
+
+    Yields:
+        tuple[list[str], list[Document]]: Row ids as strings and the matching
+                                          documents of one chunk.
+    """
+    encoding = detect_csv_encoding(csv_path)
+    for table in pd.read_csv(csv_path, index_col=0, encoding=encoding, chunksize=chunksize):
+        ids = [str(idx) for idx in table.index]
+        docs = [refcodedb_row_to_document(row) for _, row in table.iterrows()]
+        yield ids, docs
+
+#######################################
+# Load RefCodeDB table as documents
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   csv_path (str): Path to RefCodeDB.csv
+# Returns:
+#   tuple[list[str], list[Document]]: Row ids and their documents
+#######################################
+def load_refcodedb_documents(csv_path: str) -> tuple[list[str], list[Document]]:
+    """
+    Load RefCodeDB.csv and convert every row into a document.
+
+    Args:
+        csv_path (str): Path to the RefCodeDB CSV table. The unnamed first column
+                        (the saved DataFrame index) is used as the row id.
+
+    Returns:
+        tuple[list[str], list[Document]]: Row ids as strings and the matching documents.
+
+    Note:
+        Tables saved from Excel on Windows are cp1252-encoded, so cp1252 is used
+        when the file is not valid UTF-8.
+    """
+    ids, docs = [], []
+    for chunk_ids, chunk_docs in iter_refcodedb_chunks(csv_path):
+        ids.extend(chunk_ids)
+        docs.extend(chunk_docs)
+    return ids, docs
+
+
+#######################################
+# VECTORIZED SEARCH PRIMITIVES
+# Exact cosine similarity and maximal marginal relevance on normalized matrices
+#######################################
+
+#######################################
+# L2-normalize rows of a matrix
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   vectors (np.ndarray): 1D vector or 2D matrix of vectors
+# Returns:
+#   np.ndarray: float32 copy with unit-length rows
+#######################################
+def normalize_vectors(vectors) -> np.ndarray:
+    """
+    L2-normalize a vector or each row of a matrix, so dot products are cosine similarities.
+
+    Args:
+        vectors (array-like): A 1D vector or a 2D matrix with one vector per row.
+
+    Returns:
+        np.ndarray: float32 array of the same shape with unit-length rows. Zero
+                    vectors are left as zeros.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+#######################################
+# Select diverse results by maximal marginal relevance
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   query_sims (np.ndarray): Cosine similarity of each candidate to the query
+#   candidates (np.ndarray): Normalized candidate vectors, one per row
+#   k (int): Number of results to select
+#   lambda_mult (float): Trade-off between relevance (1) and diversity (0)
+# Returns:
+#   list[int]: Positions of the selected candidates, in selection order
+#######################################
+def mmr_select(
+        query_sims: np.ndarray,
+        candidates: np.ndarray,
+        k: int,
+        lambda_mult: float = 0.5,
+        ) -> list[int]:
+    """
+    Select up to k candidates by maximal marginal relevance.
+
+    The candidate-candidate similarity matrix is computed once; each step then only
+    updates the running maximum similarity to the already selected set, so the whole
+    selection is O(k * n) vector operations.
+
+    Args:
+        query_sims (np.ndarray): Cosine similarity of each candidate to the query.
+        candidates (np.ndarray): Normalized candidate vectors, one per row.
+        k (int): Number of results to select.
+        lambda_mult (float, optional): 1 favours relevance only, 0 diversity only.
+                                       Defaults to 0.5.
+
+    Returns:
+        list[int]: Positions (rows of `candidates`) of the selected items.
+    """
+    n = len(query_sims)
+    if n == 0 or k <= 0:
+        return []
+    pairwise = candidates @ candidates.T
+    first = int(np.argmax(query_sims))
+    selected = [first]
+    max_sim = pairwise[first].copy()
+    is_selected = np.zeros(n, dtype=bool)
+    is_selected[first] = True
+    while len(selected) < min(k, n):
+        scores = lambda_mult * query_sims - (1 - lambda_mult) * max_sim
+        scores[is_selected] = -np.inf
+        nxt = int(np.argmax(scores))
+        selected.append(nxt)
+        is_selected[nxt] = True
+        np.maximum(max_sim, pairwise[nxt], out=max_sim)
+    return selected
+
+
+#######################################
+# LEXICAL SEARCH, FILTERS AND RANK FUSION
+# BM25 inverted index, metadata pre-filters and reciprocal rank fusion
+#######################################
+
+# Lower-cased words, keeping tool names such as "scRNA-seq", "monocle3" or "sc.pp" whole
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+#######################################
+# Split text into lexical search tokens
+# Globals:
+#   _TOKEN_PATTERN (read for token pattern)
+# Arguments:
+#   text (str): Text to tokenize
+# Returns:
+#   list[str]: Lower-cased tokens
+#######################################
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lower-cased tokens for BM25.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        list[str]: Tokens, in order of appearance.
+    """
+    return _TOKEN_PATTERN.findall(str(text).lower())
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 inverted index.
+
+    Each term maps to the rows containing it and its term frequencies, so scoring a
+    query only touches the postings of the query terms.
+    """
+
+    def __init__(self, texts: list[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Index a list of texts, one row per text.
+
+        Args:
+            texts (list[str]): Texts to index.
+            k1 (float, optional): Term frequency saturation. Defaults to 1.5.
+            b (float, optional): Document length normalization. Defaults to 0.75.
+        """
+        self.k1 = k1
+        self.b = b
+        self.n_rows = len(texts)
+        postings = {}
+        doc_len = np.zeros(self.n_rows, dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_len[row] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(row)
+                postings[token][1].append(count)
+
+        avg_len = float(doc_len.mean()) if self.n_rows else 0.0
+        # Per-row length normalization, shared by all terms
+        self._norm = k1 * (1 - b + b * doc_len / avg_len) if avg_len > 0 else np.full(self.n_rows, k1, dtype=np.float32)
+        self.postings = {}
+        for token, (rows, counts) in postings.items():
+            df = len(rows)
+            idf = math.log(1 + (self.n_rows - df + 0.5) / (df + 0.5))
+            self.postings[token] = (
+                np.asarray(rows, dtype=np.int64),
+                np.asarray(counts, dtype=np.float32),
+                idf,
+            )
+
+    def score(self, query: str) -> np.ndarray:
+        """
+        Score every row against a query.
+
+        Args:
+            query (str): Query text.
+
+        Returns:
+            np.ndarray: BM25 score per row, 0 for rows sharing no term with the query.
+        """
+        scores = np.zeros(self.n_rows, dtype=np.float32)
+        for token in set(tokenize(query)):
+            if token not in self.postings:
+                continue
+            rows, tf, idf = self.postings[token]
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + self._norm[rows])
+        return scores
+
+#######################################
+# Normalize RefCodeDB metadata filters
+# Globals:
+#   REFCODEDB_METADATA_COLUMNS (read for column names)
+# Arguments:
+#   filters (dict): Column to value or list of values
+# Returns:
+#   dict: Metadata column to list of lower-cased values
+#######################################
+def normalize_refcodedb_filters(filters: Optional[dict]) -> dict:
+    """
+    Normalize metadata filters such as {"language": "R", "omics": "scRNA-seq"}.
+
+    Column names are matched case-insensitively against the RefCodeDB metadata
+    columns, and single values are turned into lists.
+
+    Args:
+        filters (dict, optional): Column name to one value or a list of accepted values.
+
+    Returns:
+        dict: Metadata column name to list of lower-cased accepted values. Empty
+              values are dropped.
+
+    Raises:
+        ValueError: If a filter names an unknown column.
+    """
+    columns = {col.lower(): col for col in REFCODEDB_METADATA_COLUMNS}
+    normalized = {}
+    for key, values in (filters or {}).items():
+        if key.lower() not in columns:
+            raise ValueError(f"Unknown RefCodeDB filter column: {key}")
+        if isinstance(values, str):
+            values = [values]
+        values = [str(v).strip().lower() for v in values if str(v).strip()]
+        if values:
+            normalized[columns[key.lower()]] = values
+    return normalized
+
+#######################################
+# Fuse several rankings by reciprocal rank fusion
+# Globals:
+#   None (uses local variables only)
+# Arguments:
+#   rankings (list[list[int]]): Row positions, best first, per ranking
+#   k (int): Rank smoothing constant
+# Returns:
+#   list[tuple[int, float]]: Rows and fused scores, best first
+#######################################
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list[tuple[int, float]]:
+    """
+    Fuse rankings with reciprocal rank fusion, score(row) = sum 1 / (k + rank).
+
+    RRF only uses ranks, so BM25 and cosine scores need no calibration against
+    each other.
+
+    Args:
+        rankings (list[list[int]]): One list of row positions per ranking, best first.
+        k (int, optional): Smoothing constant, larger values flatten the rank
+                           contribution. Defaults to 60.
+
+    Returns:
+        list[tuple[int, float]]: Row positions with their fused score, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+#######################################
+# LOCAL VECTOR INDEX
+# Memory-mapped embedding matrix with a JSON metadata sidecar
+#######################################
+
+class LocalVectorIndex:
+    """
+    Embedded vector index stored as `<name>.npy` (normalized float32 embeddings)
+    and `<name>.meta.json` (ids, documents and the embedding model name).
+
+    The matrix is opened memory-mapped, so loading only reads the sidecar and the
+    pages of the matrix actually touched by a search.
+    """
+
+    def __init__(self, index_dir: str, name: str = "RefCodeDB"):
+        """
+        Open an existing index.
+
+        Args:
+            index_dir (str): Directory containing the index files.
+            name (str, optional): Index name, the file prefix. Defaults to "RefCodeDB".
+
+        Raises:
+            FileNotFoundError: If the index files do not exist.
+        """
+        self.index_dir = index_dir
+        self.name = name
+        matrix_path, meta_path = self.index_paths(index_dir, name)
+        if not os.path.exists(matrix_path) or not os.path.exists(meta_path):
+            raise FileNotFoundError(f"Local vector index '{name}' not found in {index_dir}")
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.embedding_model = meta.get("embedding_model", "")
+        self.ids = meta["ids"]
+        self.documents = [
+            Document(page_content=rec["page_content"], metadata=rec["metadata"])
+            for rec in meta["documents"]
+        ]
+        # Content hash per row, used by incremental rebuilds
+        self.hashes = meta.get("hashes") or [
+            refcodedb_document_hash(doc, self.embedding_model) for doc in self.documents
+        ]
+        self.matrix = np.load(matrix_path, mmap_mode='r')
+        self._bm25 = None  # Built on first lexical search
+
+    @staticmethod
+    def index_paths(index_dir: str, name: str) -> tuple[str, str]:
+        """Return the paths of the embedding matrix and the metadata sidecar."""
+        return (
+            os.path.join(index_dir, name + ".npy"),
+            os.path.join(index_dir, name + ".meta.json"),
+        )
+
+    @classmethod
+    def save(
+            cls,
+            index_dir: str,
+            name: str,
+            ids: list[str],
+            documents: list[Document],
+            embeddings,
+            embedding_model: str = "",
+            hashes: Optional[list[str]] = None,
+            ) -> "LocalVectorIndex":
+        """
+        Write an index to disk and open it.
+
+        Files are written to temporary names and moved into place, so readers never
+        see a half-written index.
+
+        Args:
+            index_dir (str): Directory for the index files. Created if missing.
+            name (str): Index name, the file prefix.
+            ids (list[str]): Row ids, one per document.
+            documents (list[Document]): Documents to index.
+            embeddings (array-like): One embedding per document.
+            embedding_model (str, optional): Name of the embedding model, recorded so a
+                                             mismatching query model can be detected.
+            hashes (list[str], optional): Content hash per document, see
+                                          refcodedb_document_hash. Computed if omitted.
+
+        Returns:
+            LocalVectorIndex: The freshly written index.
+        """
+        if not (len(ids) == len(documents) == len(embeddings)):
+            raise ValueError("ids, documents and embeddings must have the same length.")
+        os.makedirs(index_dir, exist_ok=True)
+        matrix_path, meta_path = cls.index_paths(index_dir, name)
+        if len(embeddings):
+            matrix = normalize_vectors(embeddings)
+        else:
+            # Keep the embedding width of an empty build when it is known
+            dim = np.shape(embeddings)[1] if np.ndim(embeddings) == 2 else 0
+            matrix = np.zeros((0, dim), dtype=np.float32)
+        if hashes is None:
+            hashes = [refcodedb_document_hash(doc, embedding_model) for doc in documents]
+        meta = {
+            "embedding_model": embedding_model,
+            "ids": [str(i) for i in ids],
+            "hashes": list(hashes),
+            "documents": [
+                {"page_content": doc.page_content, "metadata": doc.metadata}
+                for doc in documents
+            ],
+        }
+        with open(matrix_path + ".tmp", 'wb') as f:
+            np.save(f, matrix)
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(matrix_path + ".tmp", matrix_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        return cls(index_dir, name)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def similarity_search(
+            self,
+            query_vector,
+            k: int = 5,
+            candidates: Optional[np.ndarray] = None,
+            ) -> list[tuple[Document, float]]:
+        """
+        Exact cosine similarity search.
+
+        Args:
+            query_vector (array-like): Query embedding.
+            k (int, optional): Number of results. Defaults to 5.
+            candidates (np.ndarray, optional): Row positions to restrict the search to.
+
+        Returns:
+            list[tuple[Document, float]]: Documents with their cosine similarity,
+                                          best first.
+        """
+        rows, sims = self._score(query_vector, candidates)
+        if len(rows) == 0:
+            return []
+        k = min(k, len(rows))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(self.documents[rows[i]], float(sims[i])) for i in top]
+
+    def max_marginal_relevance_search(
+            self,
+            query_vector,
+            k: int = 5,
+            fetch_k: int = 20,
+            lambda_mult: float = 0.5,
+            candidates: Optional[np.ndarray] = None,
+            ) -> list[Document]:
+        """
+        Maximal marginal relevance search over the `fetch_k` most similar rows.
+
+        Args:
+            query_vector (array-like): Query embedding.
+            k (int, optional): Number of results. Defaults to 5.
+            fetch_k (int, optional): Number of most similar rows MMR chooses from. Defaults to 20.
+            lambda_mult (float, optional): 1 favours relevance only, 0 diversity only.
+            candidates (np.ndarray, optional): Row positions to restrict the search to.
+
+        Returns:
+            list[Document]: Selected documents in selection order.
+        """
+        rows, sims = self._score(query_vector, candidates)
+        if len(rows) == 0:
+            return []
+        fetch_k = min(max(fetch_k, k), len(rows))
+        top = np.argpartition(-sims, fetch_k - 1)[:fetch_k]
+        top_rows = rows[top]
+        picked = mmr_select(sims[top], np.asarray(self.matrix[top_rows]), k, lambda_mult)
+        return [self.documents[top_rows[i]] for i in picked]
+
+    @property
+    def bm25(self) -> BM25Index:
+        """BM25 index over the task, tools and description of every row, built on first use."""
+        if self._bm25 is None:
+            self._bm25 = BM25Index([
+                " ".join([doc.metadata.get("Task", ""), doc.metadata.get("Tools", ""), doc.page_content])
+                for doc in self.documents
+            ])
+        return self._bm25
+
+    def filter_rows(self, filters: Optional[dict] = None) -> Optional[np.ndarray]:
+        """
+        Find the rows matching metadata filters.
+
+        A row matches when, for every filtered column, one of its comma-separated
+        values equals one of the accepted values (case-insensitive), e.g.
+        {"Language": "python"} matches a row with Language "python, bash".
+
+        Args:
+            filters (dict, optional): Column name to one value or a list of accepted values.
+
+        Returns:
+            Optional[np.ndarray]: Matching row positions, or None without filters
+                                  (every row is a candidate).
+        """
+        filters = normalize_refcodedb_filters(filters)
+        if not filters:
+            return None
+        rows = []
+        for row, doc in enumerate(self.documents):
+            for col, accepted in filters.items():
+                values = {v.strip().lower() for v in str(doc.metadata.get(col, "")).split(",")}
+                if values.isdisjoint(accepted):
+                    break
+            else:
+                rows.append(row)
+        return np.asarray(rows, dtype=np.int64)
+
+    def hybrid_search(
+            self,
+            query: str,
+            query_vector,
+            k: int = 5,
+            fetch_k: int = 20,
+            rrf_k: int = 60,
+            candidates: Optional[np.ndarray] = None,
+            ) -> list[tuple[Document, float]]:
+        """
+        Hybrid search fusing the BM25 and cosine rankings by reciprocal rank fusion.
+
+        Args:
+            query (str): Query text, for BM25.
+            query_vector (array-like): Query embedding.
+            k (int, optional): Number of results. Defaults to 5.
+            fetch_k (int, optional): Rows taken from each ranking before fusion. Defaults to 20.
+            rrf_k (int, optional): RRF smoothing constant. Defaults to 60.
+            candidates (np.ndarray, optional): Row positions to restrict the search to.
+
+        Returns:
+            list[tuple[Document, float]]: Documents with their fused score, best first.
+        """
+        rows, sims = self._score(query_vector, candidates)
+        if len(rows) == 0:
+            return []
+        fetch_k = min(max(fetch_k, k), len(rows))
+        vector_top = np.argpartition(-sims, fetch_k - 1)[:fetch_k]
+        vector_ranking = rows[vector_top[np.argsort(-sims[vector_top])]]
+
+        lexical = self.bm25.score(query)[rows]
+        matched = np.flatnonzero(lexical > 0)
+        lexical_top = matched[np.argsort(-lexical[matched])[:fetch_k]]
+        lexical_ranking = rows[lexical_top]
+
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking], k=rrf_k)
+        return [(self.documents[row], score) for row, score in fused[:k]]
+
+    def _score(self, query_vector, candidates: Optional[np.ndarray] = None):
+        """Return candidate row positions and their cosine similarity to the query."""
+        query = normalize_vectors(query_vector)
+        if len(self.ids) == 0:
+            # Empty index, also ones saved before empty builds kept their width
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if candidates is None:
+            rows = np.arange(len(self.ids))
+            sims = np.asarray(self.matrix @ query)
+        else:
+            rows = np.asarray(candidates, dtype=np.int64)
+            sims = np.asarray(self.matrix[rows] @ query) if len(rows) else np.zeros(0, dtype=np.float32)
+        return rows, sims
+
+
+class LocalVectorRetriever(BaseRetriever):
+    """
+    LangChain retriever over a LocalVectorIndex, a drop-in replacement for the
+    PGVector retriever returned by `vector_store.as_retriever`.
+
+    `search_type` is "hybrid" (BM25 fused with cosine similarity), "mmr" or
+    "similarity". Metadata `filters` (see LocalVectorIndex.filter_rows) restrict
+    the candidate rows before any scoring; they can also be passed per call with
+    `retriever.invoke(query, filters={...})`.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: Any
+    emb_model: Any
+    search_type: str = "mmr"
+    k: int = 5
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+    rrf_k: int = 60
+    filters: dict = {}
+
+    def _get_relevant_documents(
+            self,
+            query: str,
+            *,
+            run_manager: CallbackManagerForRetrieverRun,
+            filters: Optional[dict] = None,
+            ) -> list[Document]:
+        candidates = self.index.filter_rows(filters if filters is not None else self.filters)
+        if candidates is not None and len(candidates) == 0:
+            return []
+        query_vector = self.emb_model.embed_query(query)
+        if self.search_type == "hybrid":
+            return [doc for doc, _ in self.index.hybrid_search(
+                query, query_vector, k=self.k, fetch_k=self.fetch_k, rrf_k=self.rrf_k, candidates=candidates)]
+        if self.search_type == "mmr":
+            return self.index.max_marginal_relevance_search(
+                query_vector, k=self.k, fetch_k=self.fetch_k, lambda_mult=self.lambda_mult, candidates=candidates)
+        return [doc for doc, _ in self.index.similarity_search(query_vector, k=self.k, candidates=candidates)]